@@ -1,11 +1,12 @@
 from models import Usuario, Obra
 from core import Acervo
-from database import salvar_usuario, limpar_tabelas, buscar_obra_por_dados, listar_todas_obras, buscar_usuario_por_email
+from database import criar_tabelas, salvar_usuario, limpar_tabelas, buscar_obra_por_dados, listar_todas_obras, buscar_usuario_por_email
 from datetime import date
 from rich.console import Console
 import time
 
 def executar_demo():
+    criar_tabelas()
     acervo = Acervo()
 
     # criar usuario
@@ -60,4 +61,5 @@ def executar_demo():
     console.print(acervo.historico_usuario(usuario))
 
 
-executar_demo()
+if __name__ == "__main__":
+    executar_demo()
@@ -0,0 +1,85 @@
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+from database import arquivar_emprestimos, compactar_mudancas, criar_tabelas
+
+IDADE_DIAS = int(os.environ.get("ACERVO_ARQUIVAR_APOS_DIAS", "365"))
+TAMANHO_LOTE = int(os.environ.get("ACERVO_ARQUIVAR_LOTE", "1000"))
+
+logger = logging.getLogger("acervo.arquivamento")
+
+
+def arquivar(idade_dias=IDADE_DIAS, tamanho_lote=TAMANHO_LOTE, pausa=0.01, data_ref=None):
+    """
+    Move para emprestimos_arquivo os empréstimos devolvidos há mais de idade_dias.
+
+    Trabalha em lotes curtos, cada um em sua própria transação, com uma pausa
+    entre eles para não segurar o lock de escrita durante empréstimos e devoluções.
+
+    :param idade_dias: Idade mínima (desde a devolução) para arquivar.
+    :param tamanho_lote: Empréstimos movidos por transação.
+    :param pausa: Segundos de espera entre lotes.
+    :param data_ref: Data de referência (padrão: hoje).
+    :return: Total de empréstimos arquivados.
+    """
+    limite = (data_ref or date.today()) - timedelta(days=idade_dias)
+    total = 0
+    while True:
+        movidos = arquivar_emprestimos(limite, tamanho_lote)
+        total += movidos
+        if movidos < tamanho_lote:
+            return total
+        time.sleep(pausa)
+
+
+def iniciar_em_segundo_plano(intervalo_segundos, **parametros):
+    """
+    Roda arquivar() periodicamente em uma thread daemon, compactando também o
+    registro de mudanças.
+
+    :param intervalo_segundos: Intervalo entre execuções.
+    :param parametros: Repassados para arquivar().
+    :return: threading.Event que, quando sinalizado, encerra a thread.
+    """
+    parar = threading.Event()
+
+    def executar():
+        while not parar.wait(intervalo_segundos):
+            try:
+                total = arquivar(**parametros)
+                if total:
+                    logger.info("%d empréstimos arquivados", total)
+                compactadas = compactar_mudancas()
+                if compactadas:
+                    logger.info("%d mudanças superadas removidas", compactadas)
+            except Exception:
+                logger.exception("falha ao arquivar empréstimos")
+
+    threading.Thread(target=executar, name="acervo-arquivamento", daemon=True).start()
+    return parar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Arquiva empréstimos devolvidos há muito tempo e compacta o registro de mudanças."
+    )
+    parser.add_argument("--dias", type=int, default=IDADE_DIAS, help="Idade mínima desde a devolução")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Empréstimos por transação")
+    parser.add_argument("--so-compactar", action="store_true", help="Só compacta o registro de mudanças, sem arquivar")
+    args = parser.parse_args(argv)
+
+    criar_tabelas()
+    if not args.so_compactar:
+        inicio = time.perf_counter()
+        total = arquivar(args.dias, args.lote)
+        print(f"{total} empréstimos arquivados em {time.perf_counter() - inicio:.2f}s")
+    inicio = time.perf_counter()
+    compactadas = compactar_mudancas()
+    print(f"{compactadas} mudanças superadas removidas em {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Mede a latência da busca textual (GET /obras/busca) sobre um acervo sintético.
+
+Uso: python -m benchmarks.busca [--obras N] [--consultas N]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+import database
+
+SILABAS = "ba be bi bo bu ca ce ci co cu da de di do du la le li lo lu ma me mi mo mu na ne ni no nu ra re ri ro ru sa se si so su ta te ti to tu".split()
+NOMES = "maria jose ana joao clarice jorge machado cecilia graciliano rachel".split()
+SOBRENOMES = "silva souza lispector amado assis meireles ramos queiroz costa lima".split()
+
+
+def _vocabulario(tamanho, aleatorio):
+    palavras = set()
+    while len(palavras) < tamanho:
+        palavras.add("".join(aleatorio.choice(SILABAS) for _ in range(aleatorio.randint(2, 4))))
+    palavras = sorted(palavras)
+    aleatorio.shuffle(palavras)  # a frequência não deve seguir a ordem alfabética
+    return palavras
+
+
+def _gerar_obras(n, vocabulario, acumulados, semente=42):
+    aleatorio = random.Random(semente)
+    for _ in range(n):
+        # Frequência das palavras segue uma distribuição de Zipf, como em títulos reais
+        titulo = " ".join(aleatorio.choices(vocabulario, cum_weights=acumulados, k=aleatorio.randint(2, 5)))
+        autor = f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}"
+        yield (uuid.uuid4(), titulo, autor, aleatorio.randint(1800, 2024), "Livro", 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obras", type=int, default=1_000_000)
+    parser.add_argument("--consultas", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar(caminho=os.path.join(pasta, "bench.db"))
+        database.criar_tabelas()
+        from core import Acervo
+
+        aleatorio = random.Random(7)
+        vocabulario = _vocabulario(20_000, aleatorio)
+        acumulados = list(itertools.accumulate(1 / posicao for posicao in range(1, len(vocabulario) + 1)))
+
+        inicio = time.perf_counter()
+        with database.transacao() as conn:
+            # Títulos sintéticos podem se repetir; OR IGNORE respeita o índice único de obras
+            conn.executemany("INSERT OR IGNORE INTO obras VALUES (?, ?, ?, ?, ?, ?)",
+                             _gerar_obras(args.obras, vocabulario, acumulados))
+        total = database.conectar().execute("SELECT COUNT(*) FROM obras").fetchone()[0]
+        print(f"{total} obras carregadas e indexadas em {time.perf_counter() - inicio:.1f}s")
+
+        acervo = Acervo()
+
+        def palavra():
+            return aleatorio.choices(vocabulario, cum_weights=acumulados)[0]
+
+        consultas = {
+            "palavra inteira": palavra,
+            "prefixo": lambda: palavra()[:4],
+            "duas palavras": lambda: f"{palavra()} {palavra()}",
+            "título + autor": lambda: f"{palavra()[:4]} {aleatorio.choice(SOBRENOMES)[:4]}",
+        }
+        for nome, gerar in consultas.items():
+            tempos = []
+            for _ in range(args.consultas):
+                texto = gerar()
+                t0 = time.perf_counter()
+                acervo.buscar_obras(texto, limite=20)
+                tempos.append((time.perf_counter() - t0) * 1000)
+            quantis = statistics.quantiles(tempos, n=100)
+            print(f"{nome:16} p50={quantis[49]:7.2f}ms  p95={quantis[94]:7.2f}ms  p99={quantis[98]:7.2f}ms")
+        database.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
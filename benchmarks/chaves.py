@@ -0,0 +1,107 @@
+"""
+Tamanho do banco e latência das buscas por chave com IDs em texto (36
+caracteres) e em BLOB (16 bytes).
+
+Gera os dados no esquema anterior, mede, migra o mesmo arquivo no lugar
+(aplicar_migracoes) e mede de novo:
+
+    python -m benchmarks.chaves --obras 20000 --usuarios 5000 --emprestimos 200000
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import database
+from benchmarks.dados import gerar_dados
+from benchmarks.suite import medir
+
+_TABELAS = ("obras", "usuarios", "emprestimos")
+
+
+def _tamanhos(conn):
+    # Bytes ocupados por tabela, contando seus índices (dbstat)
+    paginas = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+    indices = conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'").fetchall()
+    tamanhos = {tabela: paginas.get(tabela, 0) for tabela in _TABELAS}
+    for indice, tabela in indices:
+        if tabela in tamanhos:
+            tamanhos[tabela] += paginas.get(indice, 0)
+    tamanhos["arquivo"] = os.path.getsize(database.CAMINHO_BANCO)
+    return tamanhos
+
+
+def _medir_buscas(conn, ids, chave, repeticoes):
+    aleatorio = random.Random(1)
+    obras = itertools.cycle(chave(i) for i in aleatorio.sample(ids["obras"], min(len(ids["obras"]), 1000)))
+    usuarios = itertools.cycle(chave(i) for i in aleatorio.sample(ids["usuarios"], min(len(ids["usuarios"]), 1000)))
+    # As variantes "só colunas" não devolvem IDs: medem a busca sem o custo do conversor
+    return {
+        "obra por id (só colunas)": medir(
+            lambda: conn.execute("SELECT titulo, quantidade FROM obras WHERE id = ?", (next(obras),)).fetchone(),
+            repeticoes
+        ),
+        "historico (só colunas)": medir(
+            lambda: conn.execute("""
+                SELECT e.data_emprestimo, o.titulo FROM emprestimos e JOIN obras o ON o.id = e.obra_id
+                WHERE e.usuario_id = ?
+            """, (next(usuarios),)).fetchall(),
+            repeticoes
+        ),
+        "obra por id": medir(
+            lambda: conn.execute("SELECT * FROM obras WHERE id = ?", (next(obras),)).fetchone(), repeticoes
+        ),
+        "historico com obras": medir(
+            lambda: conn.execute("""
+                SELECT e.id, o.titulo FROM emprestimos e JOIN obras o ON o.id = e.obra_id
+                WHERE e.usuario_id = ?
+            """, (next(usuarios),)).fetchall(),
+            repeticoes
+        ),
+    }
+
+
+def _compactar(conn):
+    conn.execute("VACUUM")
+    # O VACUUM pode renumerar os rowids de obras, dos quais a busca textual depende
+    database.reconstruir_busca()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obras", type=int, default=20_000)
+    parser.add_argument("--usuarios", type=int, default=5_000)
+    parser.add_argument("--emprestimos", type=int, default=200_000)
+    parser.add_argument("--repeticoes", type=int, default=2_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar(caminho=os.path.join(pasta, "bench.db"))
+        database.criar_tabelas(ate=len(database.MIGRACOES) - 1)
+        ids = gerar_dados(args.obras, args.usuarios, args.emprestimos, ids_em_texto=True)
+        conn = database.conectar()
+        _compactar(conn)
+        texto = {"tamanhos": _tamanhos(conn), "buscas": _medir_buscas(conn, ids, str, args.repeticoes)}
+
+        inicio = time.perf_counter()
+        database.aplicar_migracoes()
+        migracao = time.perf_counter() - inicio
+        _compactar(conn)
+        blob = {"tamanhos": _tamanhos(conn), "buscas": _medir_buscas(conn, ids, uuid.UUID, args.repeticoes)}
+        database.fechar_conexoes()
+
+    print(f"migração no lugar: {migracao:.2f}s")
+    for nome in (*_TABELAS, "arquivo"):
+        antes, depois = texto["tamanhos"][nome], blob["tamanhos"][nome]
+        print(f"{nome:26} texto {antes / 2**20:8.2f} MiB  blob {depois / 2**20:8.2f} MiB  ({depois / antes:.0%})")
+    for nome in texto["buscas"]:
+        antes, depois = texto["buscas"][nome], blob["buscas"][nome]
+        print(f"{nome:26} texto p50 {antes['p50_ms']:7.3f} ms  blob p50 {depois['p50_ms']:7.3f} ms  "
+              f"p99 {antes['p99_ms']:7.3f} -> {depois['p99_ms']:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Gerador de dados sintéticos para os benchmarks: obras, usuários e um
+histórico de empréstimos, gravados direto no banco configurado.
+"""
+import random
+import uuid
+from datetime import date, timedelta
+
+import database
+
+CATEGORIAS = ("Livro", "Revista", "Ficção", "Romance", "Didático", "Poesia")
+PALAVRAS = (
+    "amor guerra noite mar sombra cidade tempo casa rio vento fogo pedra jardim memorias "
+    "viagem segredo silencio historia reino sertao estrela caminho livro ilha luz"
+).split()
+
+
+def gerar_dados(obras, usuarios, emprestimos, semente=42, quantidade_por_obra=1_000, ids_em_texto=False):
+    """
+    Popula o banco com dados sintéticos reprodutíveis.
+
+    Os empréstimos históricos ficam espalhados pelo último ano; cerca de 10%
+    continuam em aberto.
+
+    :param obras: Quantidade de obras.
+    :param usuarios: Quantidade de usuários.
+    :param emprestimos: Quantidade de empréstimos históricos.
+    :param semente: Semente do gerador aleatório.
+    :param quantidade_por_obra: Exemplares de cada obra.
+    :param ids_em_texto: Grava os IDs como texto, como no esquema anterior às chaves em BLOB.
+    :return: Dicionário com as listas de IDs de "obras" e "usuarios".
+    """
+    aleatorio = random.Random(semente)
+    ids_obras = [str(uuid.UUID(int=aleatorio.getrandbits(128), version=4)) for _ in range(obras)]
+    ids_usuarios = [str(uuid.UUID(int=aleatorio.getrandbits(128), version=4)) for _ in range(usuarios)]
+    hoje = date.today()
+    chave = str if ids_em_texto else uuid.UUID
+
+    def linhas_emprestimos():
+        for _ in range(emprestimos):
+            inicio = hoje - timedelta(days=aleatorio.randint(0, 365))
+            previsao = inicio + timedelta(days=7)
+            devolucao = None
+            if aleatorio.random() > 0.1:
+                devolucao = (inicio + timedelta(days=aleatorio.randint(1, 14))).isoformat()
+            yield (
+                chave(str(uuid.UUID(int=aleatorio.getrandbits(128), version=4))),
+                chave(aleatorio.choice(ids_obras)),
+                chave(aleatorio.choice(ids_usuarios)),
+                inicio.isoformat(),
+                previsao.isoformat(),
+                devolucao,
+            )
+
+    with database.transacao() as conn:
+        conn.executemany(
+            "INSERT INTO obras (id, titulo, autor, ano, categoria, quantidade) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (chave(id_obra), f"{' '.join(aleatorio.sample(PALAVRAS, 3))} {i}", f"Autor {i % 500}",
+                 aleatorio.randint(1900, 2024), aleatorio.choice(CATEGORIAS), quantidade_por_obra)
+                for i, id_obra in enumerate(ids_obras)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO usuarios (id, nome, email, divida) VALUES (?, ?, ?, 0)",
+            ((chave(id_usuario), f"Usuário {i}", f"usuario{i}@bench") for i, id_usuario in enumerate(ids_usuarios)),
+        )
+        conn.executemany(
+            """INSERT INTO emprestimos (id, obra_id, usuario_id, data_emprestimo, data_prevista, data_devolucao)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            linhas_emprestimos(),
+        )
+    return {"obras": ids_obras, "usuarios": ids_usuarios}
@@ -0,0 +1,59 @@
+"""
+Compara memória e tempo de construção das entidades de models.py com uma
+réplica das classes antigas (sem __slots__, sempre gerando data de criação).
+
+Uso: python -m benchmarks.entidades [--objetos N]
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from models import Obra
+
+
+class _ObraAntiga:
+    # Réplica da Obra antes dos __slots__, para comparação
+    def __init__(self, titulo, autor, ano, categoria, quantidade=1, id=None):
+        self.id = id or uuid.uuid4()
+        self.data_criacao = datetime.now()
+        self.titulo = titulo
+        self.autor = autor
+        self.ano = ano
+        self.categoria = categoria
+        self.quantidade = quantidade
+
+
+def _linhas(n):
+    return [(str(uuid.uuid4()), f"Livro {i}", "Autor", 2000, "Livro", 1) for i in range(n)]
+
+
+def _medir(nome, construir, linhas):
+    inicio = time.perf_counter()
+    objetos = [construir(row) for row in linhas]
+    segundos = time.perf_counter() - inicio
+    del objetos
+
+    # Memória medida em uma segunda passada: o tracemalloc deixa a construção mais lenta
+    tracemalloc.start()
+    objetos = [construir(row) for row in linhas]
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nome:30} {len(linhas) / segundos:12,.0f} obj/s  {memoria / len(objetos):7.0f} bytes/obj")
+    return objetos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objetos", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    linhas = _linhas(args.objetos)
+    _medir("antiga (dict, __init__)", lambda r: _ObraAntiga(r[1], r[2], r[3], r[4], r[5], id=r[0]), linhas)
+    _medir("__slots__, __init__", lambda r: Obra(r[1], r[2], r[3], r[4], r[5], id=r[0]), linhas)
+    _medir("__slots__, Obra.de_row", Obra.de_row, linhas)
+
+
+if __name__ == "__main__":
+    main()
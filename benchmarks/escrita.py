@@ -0,0 +1,82 @@
+"""
+Vazão de escrita com e sem o escritor único (commit em grupo).
+
+Várias threads fazem empréstimos ao mesmo tempo, como os handlers de
+requisições concorrentes: no modo direto cada uma disputa o lock de escrita
+do SQLite com sua própria transação; no modo em grupo todas enfileiram no
+escritor, que confirma várias operações por COMMIT.
+
+    python -m benchmarks.escrita --threads 16 --operacoes 500
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import database
+from benchmarks.dados import gerar_dados
+from core import Acervo
+from escrita import EscritorEmGrupo
+
+
+def _rodar(threads, operacoes, ids, escritor=None):
+    acervo = Acervo()
+    erros = []
+    barreira = threading.Barrier(threads + 1)
+
+    def trabalhador(n):
+        barreira.wait()
+        for i in range(operacoes):
+            id_obra = ids["obras"][(n * operacoes + i) % len(ids["obras"])]
+            id_usuario = ids["usuarios"][(n * operacoes + i) % len(ids["usuarios"])]
+            try:
+                if escritor is None:
+                    acervo.emprestar_por_id(id_obra, id_usuario)
+                else:
+                    escritor.executar(acervo.emprestar_por_id, id_obra, id_usuario)
+            except sqlite3.OperationalError as e:
+                erros.append(e)
+
+    grupo = [threading.Thread(target=trabalhador, args=(n,)) for n in range(threads)]
+    for thread in grupo:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in grupo:
+        thread.join()
+    segundos = time.perf_counter() - inicio
+    total = threads * operacoes
+    return {"operacoes_por_segundo": round((total - len(erros)) / segundos, 1), "erros": len(erros)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--operacoes", type=int, default=500, help="Empréstimos por thread")
+    parser.add_argument("--lote", type=int, default=64)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--synchronous", choices=("NORMAL", "FULL"), default="NORMAL")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar(caminho=os.path.join(pasta, "bench.db"), sincronizacao=args.synchronous)
+        database.criar_tabelas()
+        ids = gerar_dados(5_000, 1_000, 0, quantidade_por_obra=10_000)
+
+        direto = _rodar(args.threads, args.operacoes, ids)
+        escritor = EscritorEmGrupo(tamanho_lote=args.lote, latencia=args.latencia_ms / 1000)
+        em_grupo = _rodar(args.threads, args.operacoes, ids, escritor)
+        escritor.parar()
+        database.configurar(sincronizacao="NORMAL")
+
+    print(f"{args.threads} threads x {args.operacoes} empréstimos, synchronous={args.synchronous}")
+    print(f"{'direto':12} {direto['operacoes_por_segundo']:10.1f} ops/s  erros: {direto['erros']}")
+    print(f"{'em grupo':12} {em_grupo['operacoes_por_segundo']:10.1f} ops/s  erros: {em_grupo['erros']}  "
+          f"média por lote: {escritor.estatisticas()['media_por_lote']:.1f}")
+    print(f"ganho: {em_grupo['operacoes_por_segundo'] / direto['operacoes_por_segundo']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
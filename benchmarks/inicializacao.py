@@ -0,0 +1,66 @@
+"""
+Tempo de inicialização a frio de um worker da API, medido com
+`python -X importtime`: cada repetição é um processo novo que importa main.
+
+Para comparação, mede também o import de main seguido do módulo de
+relatórios com o Rich, o que antes todo worker pagava ao importar core.
+
+    python -m benchmarks.inicializacao --repeticoes 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+CENARIOS = {
+    "api (import main)": "import main",
+    "api + relatórios com Rich": "import main, relatorios, rich.table",
+}
+# Módulos mostrados no detalhamento
+PACOTES = ("fastapi", "pydantic", "database", "core", "relatorios", "rich.table")
+
+
+def _importtime(codigo):
+    """
+    Roda o código em um processo novo com -X importtime.
+
+    :return: (segundos de relógio do processo, {módulo: microssegundos acumulados})
+    """
+    inicio = time.perf_counter()
+    processo = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                              capture_output=True, text=True, check=True)
+    segundos = time.perf_counter() - inicio
+    acumulados = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, acumulado, modulo = linha[len("import time:"):].split("|")
+        nome = modulo.strip()
+        # Um módulo aparece uma vez por processo; fica a primeira (a do import de fato)
+        acumulados.setdefault(nome, int(acumulado))
+    return segundos, acumulados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    for nome, codigo in CENARIOS.items():
+        processos, imports, pacotes = [], [], {pacote: [] for pacote in PACOTES}
+        for _ in range(args.repeticoes):
+            segundos, acumulados = _importtime(codigo)
+            processos.append(segundos * 1000)
+            imports.append(sum(acumulados.get(modulo, 0) for modulo in codigo[len("import "):].split(", ")) / 1000)
+            for pacote in PACOTES:
+                pacotes[pacote].append(acumulados.get(pacote, 0) / 1000)
+        print(f"{nome}: processo p50 {statistics.median(processos):7.1f} ms, "
+              f"imports p50 {statistics.median(imports):7.1f} ms")
+        for pacote, tempos in pacotes.items():
+            if any(tempos):
+                print(f"    {pacote:12} {statistics.median(tempos):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
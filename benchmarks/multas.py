@@ -0,0 +1,59 @@
+"""
+Mede o cálculo de multas em lote (Acervo.aplicar_multas_em_lote) sobre
+empréstimos em aberto sintéticos.
+
+Uso: python -m benchmarks.multas [--emprestimos N] [--usuarios N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+import database
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emprestimos", type=int, default=1_000_000)
+    parser.add_argument("--usuarios", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar(caminho=os.path.join(pasta, "bench.db"))
+        database.criar_tabelas()
+        from core import Acervo
+
+        aleatorio = random.Random(42)
+        hoje = date.today()
+        usuarios = [uuid.uuid4() for _ in range(args.usuarios)]
+        with database.transacao() as conn:
+            conn.executemany("INSERT INTO usuarios VALUES (?, ?, ?, 0)",
+                             ((u, f"Usuário {i}", f"u{i}@bench") for i, u in enumerate(usuarios)))
+            conn.execute("INSERT INTO obras VALUES ('obra', 'Livro', 'Autor', 2000, 'Livro', 0)")
+
+            def emprestimos():
+                for _ in range(args.emprestimos):
+                    inicio = hoje - timedelta(days=aleatorio.randint(0, 60))
+                    yield (uuid.uuid4(), "obra", aleatorio.choice(usuarios), inicio.isoformat(),
+                           (inicio + timedelta(days=14)).isoformat())
+            conn.executemany("""
+                INSERT INTO emprestimos (id, obra_id, usuario_id, data_emprestimo, data_prevista)
+                VALUES (?, ?, ?, ?, ?)
+            """, emprestimos())
+
+        acervo = Acervo()
+        for rotulo, data_ref in (("primeira execução", hoje), ("repetição (mesmo dia)", hoje),
+                                 ("dia seguinte", hoje + timedelta(days=1))):
+            inicio = time.perf_counter()
+            resumo = acervo.aplicar_multas_em_lote(data_ref)
+            segundos = time.perf_counter() - inicio
+            cobrados = sum(item["emprestimos"] for item in resumo.values())
+            print(f"{rotulo:22} {segundos:6.2f}s  {cobrados} empréstimos multados, {len(resumo)} usuários")
+        database.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
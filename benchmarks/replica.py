@@ -0,0 +1,109 @@
+"""
+Latência das leituras do catálogo com e sem a réplica em memória, em repouso,
+durante uma rajada de empréstimos feita por outros processos (como outros
+workers do uvicorn escrevendo no mesmo banco) e com outra thread lendo o
+catálogo inteiro sem parar.
+
+    python -m benchmarks.replica --obras 20000 --escritores 4
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import tempfile
+import threading
+
+import database
+from benchmarks.dados import gerar_dados
+from benchmarks.suite import medir
+from core import Acervo
+
+
+def _medir_leituras(acervo, repeticoes):
+    consultas = itertools.cycle(("amor", "noite mar", "cidade", "historia rei"))
+    return {
+        "paginar_obras(100)": medir(lambda: acervo.paginar_obras(limite=100), repeticoes),
+        "buscar_obras": medir(lambda: acervo.buscar_obras(next(consultas)), repeticoes),
+    }
+
+
+def _escrever(caminho, ids_obras, ids_usuarios, pronto, parar):
+    database.configurar(caminho=caminho)
+    acervo = Acervo()
+    obras = itertools.cycle(ids_obras)
+    usuarios = itertools.cycle(ids_usuarios)
+    pronto.set()
+    while not parar.is_set():
+        acervo.emprestar_por_id(next(obras), next(usuarios))
+
+
+def _com_rajada(ids, escritores, funcao):
+    contexto = multiprocessing.get_context("spawn")
+    parar = contexto.Event()
+    processos = []
+    for n in range(escritores):
+        pronto = contexto.Event()
+        processo = contexto.Process(
+            target=_escrever, args=(database.CAMINHO_BANCO, ids["obras"][n::escritores], ids["usuarios"], pronto, parar)
+        )
+        processo.start()
+        pronto.wait()
+        processos.append(processo)
+    try:
+        return funcao()
+    finally:
+        parar.set()
+        for processo in processos:
+            processo.join()
+
+
+def _com_leitura_longa(acervo, funcao):
+    # Outra thread lendo o catálogo inteiro sem parar (ex: um relatório de inventário)
+    parar = threading.Event()
+
+    def ler():
+        while not parar.is_set():
+            acervo.listar_obras()
+
+    leitor = threading.Thread(target=ler)
+    leitor.start()
+    try:
+        return funcao()
+    finally:
+        parar.set()
+        leitor.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obras", type=int, default=20_000)
+    parser.add_argument("--usuarios", type=int, default=1_000)
+    parser.add_argument("--emprestimos", type=int, default=100_000)
+    parser.add_argument("--escritores", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar(caminho=os.path.join(pasta, "bench.db"))
+        database.criar_tabelas()
+        ids = gerar_dados(args.obras, args.usuarios, args.emprestimos)
+        acervo = Acervo()
+
+        for replica in (False, True):
+            database.configurar(replica=replica)
+            modo = "réplica" if replica else "primário"
+            resultados = {
+                "repouso": _medir_leituras(acervo, args.repeticoes),
+                "rajada": _com_rajada(ids, args.escritores, lambda: _medir_leituras(acervo, args.repeticoes)),
+                "leitura longa": _com_leitura_longa(acervo, lambda: _medir_leituras(acervo, args.repeticoes)),
+            }
+            for cenario, medicoes in resultados.items():
+                for nome, medicao in medicoes.items():
+                    print(f"{modo:9} {cenario:13} {nome:20} p50 {medicao['p50_ms']:7.3f} ms  "
+                          f"p95 {medicao['p95_ms']:7.3f} ms  p99 {medicao['p99_ms']:7.3f} ms")
+        database.configurar(replica=False)
+        database.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
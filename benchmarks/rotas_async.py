@@ -0,0 +1,96 @@
+"""
+Compara requisições por segundo das rotas síncronas (como eram antes, em
+threads do servidor) com as rotas assíncronas de main.py.
+
+Uso: python -m benchmarks.rotas_async [--requisicoes N] [--concorrencia C]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Optional
+from uuid import UUID
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+import database
+
+
+def _app_sincrono(acervo, EmprestimoInput, DevolucaoInput):
+    app = FastAPI()
+
+    @app.get("/obras/")
+    def listar_obras(limit: int = 100, after: Optional[UUID] = None):
+        return acervo.paginar_obras(limite=limit, depois=after)["obras"]
+
+    @app.post("/emprestar/")
+    def emprestar_obra(dados: EmprestimoInput):
+        try:
+            emprestimo = acervo.emprestar_por_id(dados.id_obra, dados.id_usuario, dados.dias)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"id": str(emprestimo.id)}
+
+    @app.post("/devolver/")
+    def devolver_obra(dados: DevolucaoInput):
+        emprestimo = acervo.devolver_por_id(dados.emprestimo_id, dados.data_devolucao)
+        return {"obra": emprestimo.obra.titulo}
+
+    return app
+
+
+async def _medir(app, usuarios, obras, requisicoes, concorrencia):
+    limite = asyncio.Semaphore(concorrencia)
+    transporte = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as client:
+        async def ciclo(i):
+            # Um ciclo = listagem + empréstimo + devolução (3 requisições)
+            async with limite:
+                await client.get("/obras/", params={"limit": 50})
+                resposta = await client.post("/emprestar/", json={
+                    "id_usuario": usuarios[i % len(usuarios)], "id_obra": obras[i % len(obras)]
+                })
+                await client.post("/devolver/", json={"emprestimo_id": resposta.json()["id"]})
+
+        ciclos = requisicoes // 3
+        inicio = time.perf_counter()
+        await asyncio.gather(*(ciclo(i) for i in range(ciclos)))
+        return ciclos * 3 / (time.perf_counter() - inicio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=3000)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar(caminho=os.path.join(pasta, "bench.db"))
+        import main as api
+        from models import Obra, Usuario
+
+        database.criar_tabelas()
+        usuarios, obras = [], []
+        for i in range(50):
+            usuario = Usuario(f"Usuário {i}", f"usuario{i}@bench")
+            api.acervo.cadastrar_usuario(usuario)
+            usuarios.append(str(usuario.id))
+        for i in range(200):
+            obra = Obra(f"Livro {i}", "Autor", 2000, "Livro", quantidade=10_000)
+            api.acervo.adicionar(obra)
+            obras.append(str(obra.id))
+
+        app_sincrono = _app_sincrono(api.acervo, api.EmprestimoInput, api.DevolucaoInput)
+        antes = asyncio.run(_medir(app_sincrono, usuarios, obras, args.requisicoes, args.concorrencia))
+        depois = asyncio.run(_medir(api.app, usuarios, obras, args.requisicoes, args.concorrencia))
+        database.fechar_conexoes()
+
+    print(f"rotas síncronas:   {antes:8.1f} req/s")
+    print(f"rotas assíncronas: {depois:8.1f} req/s ({depois / antes:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Suíte de benchmarks do caminho quente de empréstimo/devolução e das leituras
+do acervo, tanto pelos métodos do Acervo quanto pelas rotas da API (via
+cliente ASGI em processo).
+
+Cada medição reporta operações por segundo e latências p50/p95/p99. Os
+resultados podem ser salvos em JSON e comparados com uma execução anterior:
+
+    python -m benchmarks.suite --saida baseline.json
+    python -m benchmarks.suite --comparar baseline.json
+
+A comparação termina com código 1 se alguma medição regredir além da tolerância.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import httpx
+
+import database
+from benchmarks.dados import gerar_dados
+
+
+def _resumir(tempos, total_segundos):
+    quantis = statistics.quantiles(tempos, n=100) if len(tempos) > 1 else tempos * 99
+    return {
+        "repeticoes": len(tempos),
+        "operacoes_por_segundo": round(len(tempos) / total_segundos, 1),
+        "p50_ms": round(quantis[49] * 1000, 3),
+        "p95_ms": round(quantis[94] * 1000, 3),
+        "p99_ms": round(quantis[98] * 1000, 3),
+    }
+
+
+def medir(funcao, repeticoes, aquecimento=3):
+    """
+    Mede uma função síncrona chamada repetidamente.
+
+    :param funcao: Função sem argumentos a medir.
+    :param repeticoes: Quantidade de chamadas medidas.
+    :param aquecimento: Chamadas descartadas antes da medição.
+    :return: Dicionário com operações por segundo e latências.
+    """
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - t0)
+    return _resumir(tempos, time.perf_counter() - inicio)
+
+
+async def medir_async(corrotina, repeticoes, aquecimento=3):
+    """Versão de medir() para funções assíncronas (ex: requisições ASGI)."""
+    for _ in range(aquecimento):
+        await corrotina()
+    tempos = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        await corrotina()
+        tempos.append(time.perf_counter() - t0)
+    return _resumir(tempos, time.perf_counter() - inicio)
+
+
+def _benchmarks_acervo(acervo, ids, repeticoes):
+    from models import Obra, Usuario
+
+    obras = itertools.cycle(ids["obras"])
+    usuarios = itertools.cycle(ids["usuarios"])
+    sequencia = itertools.count()
+    abertos = []
+
+    def adicionar():
+        n = next(sequencia)
+        acervo.adicionar(Obra(f"Obra nova {n}", "Autor", 2024, "Livro", quantidade=1))
+
+    def emprestar():
+        obra = acervo.encontrar_obra(next(obras))
+        usuario = acervo.encontrar_usuario(next(usuarios))
+        abertos.append(acervo.emprestar(obra, usuario).id)
+
+    def devolver_por_id():
+        acervo.devolver_por_id(abertos.pop(), date.today())
+
+    usuario_historico = Usuario.de_row(database.buscar_usuario(ids["usuarios"][0]))
+    leituras = max(repeticoes // 10, 10)
+    resultados = {
+        "acervo.adicionar": medir(adicionar, repeticoes),
+        "acervo.emprestar": medir(emprestar, repeticoes),
+    }
+    # devolver_por_id consome os empréstimos abertos acima (inclusive os de aquecimento)
+    resultados["acervo.devolver_por_id"] = medir(devolver_por_id, repeticoes)
+    resultados["acervo.listar_obras"] = medir(acervo.listar_obras, leituras)
+    resultados["acervo.historico_usuario"] = medir(lambda: acervo.historico_usuario(usuario_historico), repeticoes)
+    resultados["acervo.populares"] = medir(lambda: acervo.populares("30d"), leituras)
+    resultados["acervo.relatorio_inventario"] = medir(acervo.relatorio_inventario, leituras)
+    return resultados
+
+
+async def _benchmarks_api(app, ids, repeticoes):
+    obras = itertools.cycle(ids["obras"])
+    usuarios = itertools.cycle(ids["usuarios"])
+    abertos = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def listar():
+            (await client.get("/obras/", params={"limit": 100})).raise_for_status()
+
+        async def buscar():
+            (await client.get("/obras/busca", params={"q": "amor"})).raise_for_status()
+
+        async def emprestar():
+            resposta = await client.post("/emprestar/", json={"id_obra": next(obras), "id_usuario": next(usuarios)})
+            resposta.raise_for_status()
+            abertos.append(resposta.json()["id"])
+
+        async def devolver():
+            (await client.post("/devolver/", json={"emprestimo_id": abertos.pop()})).raise_for_status()
+
+        return {
+            "api.GET /obras/": await medir_async(listar, repeticoes),
+            "api.GET /obras/busca": await medir_async(buscar, repeticoes),
+            "api.POST /emprestar/": await medir_async(emprestar, repeticoes),
+            "api.POST /devolver/": await medir_async(devolver, repeticoes),
+        }
+
+
+def executar(obras, usuarios, emprestimos, repeticoes, semente=42):
+    """
+    Gera um banco sintético temporário e roda todas as medições.
+
+    :return: Dicionário com metadados ("ambiente", "parametros") e "resultados".
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar(caminho=os.path.join(pasta, "bench.db"))
+        database.criar_tabelas()
+        import main as api
+
+        ids = gerar_dados(obras, usuarios, emprestimos, semente=semente)
+        # Os usuários sintéticos acumulam muitos empréstimos em aberto: o limite
+        # continua sendo verificado, mas alto o bastante para nunca recusar
+        api.acervo.max_emprestimos_abertos = emprestimos + repeticoes * 10
+        resultados = _benchmarks_acervo(api.acervo, ids, repeticoes)
+        resultados.update(asyncio.run(_benchmarks_api(api.app, ids, repeticoes)))
+        database.fechar_conexoes()
+
+    return {
+        "ambiente": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+        },
+        "parametros": {
+            "obras": obras, "usuarios": usuarios, "emprestimos": emprestimos,
+            "repeticoes": repeticoes, "semente": semente,
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(atual, base, tolerancia):
+    """
+    Compara duas execuções da suíte.
+
+    Uma medição regride se as operações por segundo caírem, ou o p95 subir,
+    mais do que a tolerância (fração, ex: 0.2 = 20%).
+
+    :return: Lista de (nome, ops/s base, ops/s atual, p95 base, p95 atual, regrediu).
+    """
+    linhas = []
+    for nome, medicao in atual["resultados"].items():
+        anterior = base["resultados"].get(nome)
+        if anterior is None:
+            continue
+        regrediu = (
+            medicao["operacoes_por_segundo"] < anterior["operacoes_por_segundo"] * (1 - tolerancia)
+            or medicao["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia)
+        )
+        linhas.append((nome, anterior["operacoes_por_segundo"], medicao["operacoes_por_segundo"],
+                       anterior["p95_ms"], medicao["p95_ms"], regrediu))
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obras", type=int, default=5_000)
+    parser.add_argument("--usuarios", type=int, default=1_000)
+    parser.add_argument("--emprestimos", type=int, default=50_000)
+    parser.add_argument("--repeticoes", type=int, default=500)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="Salva os resultados neste arquivo JSON")
+    parser.add_argument("--comparar", help="Arquivo JSON de uma execução anterior (baseline)")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    atual = executar(args.obras, args.usuarios, args.emprestimos, args.repeticoes, args.semente)
+
+    print(f"{'medição':30} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for nome, medicao in atual["resultados"].items():
+        print(f"{nome:30} {medicao['operacoes_por_segundo']:10.1f} {medicao['p50_ms']:9.3f} "
+              f"{medicao['p95_ms']:9.3f} {medicao['p99_ms']:9.3f}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+        if base.get("parametros") != atual["parametros"]:
+            print("\naviso: parâmetros diferentes da execução base, a comparação pode não ser justa")
+        print(f"\n{'comparação':30} {'ops/s base':>10} {'ops/s':>10} {'p95 base':>9} {'p95':>9}")
+        regressoes = 0
+        for nome, ops_base, ops, p95_base, p95, regrediu in comparar(atual, base, args.tolerancia):
+            regressoes += regrediu
+            marca = "  REGRESSÃO" if regrediu else ""
+            print(f"{nome:30} {ops_base:10.1f} {ops:10.1f} {p95_base:9.3f} {p95:9.3f}{marca}")
+        if regressoes:
+            print(f"\n{regressoes} medição(ões) regrediram mais de {args.tolerancia:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ATIVO = os.environ.get("ACERVO_CACHE", "1") != "0"
+CAPACIDADE = int(os.environ.get("ACERVO_CACHE_TAMANHO", "10000"))
+TTL = float(os.environ.get("ACERVO_CACHE_TTL", "5.0"))
+CAPACIDADE_RESPOSTAS = int(os.environ.get("ACERVO_CACHE_RESPOSTAS", "256"))
+
+
+class CacheLRU:
+    """
+    Cache em memória, limitado em tamanho (LRU) e com tempo de vida por entrada.
+
+    Guarda entidades já montadas (Obra, Usuario) e devolve cópias, para que
+    alterações feitas por quem leu não contaminem o cache.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE, ttl=TTL, ativo=ATIVO):
+        """
+        :param capacidade: Quantidade máxima de entradas.
+        :param ttl: Tempo de vida de cada entrada, em segundos.
+        :param ativo: Se False, o cache nunca guarda nada.
+        """
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.ativo = ativo
+        self.acertos = 0
+        self.falhas = 0
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._versao = 0
+
+    def versao(self):
+        """
+        Retorna a versão atual do cache, que muda a cada invalidação.
+
+        Deve ser lida antes de consultar o banco e repassada a guardar(), para
+        que um valor lido antes de uma escrita concorrente não seja guardado.
+        """
+        return self._versao
+
+    def obter(self, chave):
+        """
+        Busca uma entrada válida.
+
+        :param chave: Chave da entrada (ID como string).
+        :return: Cópia do valor guardado ou None.
+        """
+        if not self.ativo:
+            return None
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None or entrada[0] < time.monotonic():
+                self.falhas += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return copy.copy(entrada[1])
+
+    def guardar(self, chave, valor, versao):
+        """
+        Guarda uma entrada, descartando a menos usada se o cache estiver cheio.
+
+        :param chave: Chave da entrada.
+        :param valor: Valor a guardar (uma cópia é armazenada).
+        :param versao: Valor de versao() lido antes da consulta ao banco.
+        """
+        if not self.ativo:
+            return
+        with self._lock:
+            if versao != self._versao:
+                return
+            self._dados[chave] = (time.monotonic() + self.ttl, copy.copy(valor))
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+
+    def invalidar(self, chave):
+        """Remove uma entrada após uma escrita no banco."""
+        with self._lock:
+            self._versao += 1
+            self._dados.pop(chave, None)
+
+    def limpar(self):
+        """Remove todas as entradas."""
+        with self._lock:
+            self._versao += 1
+            self._dados.clear()
+
+    def estatisticas(self):
+        """
+        :return: Dicionário com acertos, falhas e tamanho atual.
+        """
+        return {"acertos": self.acertos, "falhas": self.falhas, "tamanho": len(self._dados)}
+
+
+cache_obras = CacheLRU()
+cache_usuarios = CacheLRU()
+# Corpos JSON já serializados das rotas de leitura, com a versão dos dados na chave
+cache_respostas = CacheLRU(capacidade=CAPACIDADE_RESPOSTAS, ttl=60.0)
+
+
+def configurar(ativo=None, capacidade=None, ttl=None):
+    """
+    Altera a configuração dos caches, esvaziando-os.
+
+    :param ativo: Liga ou desliga os caches.
+    :param capacidade: Quantidade máxima de entradas por cache.
+    :param ttl: Tempo de vida das entradas, em segundos.
+    """
+    for cache in (cache_obras, cache_usuarios, cache_respostas):
+        if ativo is not None:
+            cache.ativo = ativo
+        if capacidade is not None:
+            cache.capacidade = capacidade
+        if ttl is not None:
+            cache.ttl = ttl
+        cache.limpar()
+
+
+def estatisticas():
+    """
+    :return: Estatísticas de acertos e falhas de cada cache.
+    """
+    return {
+        "obras": cache_obras.estatisticas(),
+        "usuarios": cache_usuarios.estatisticas(),
+        "respostas": cache_respostas.estatisticas(),
+    }
@@ -0,0 +1,10 @@
+import pytest
+import database
+
+
+@pytest.fixture(autouse=True)
+def banco_temporario(tmp_path):
+    database.configurar(caminho=tmp_path / "acervo.db")
+    database.criar_tabelas()
+    yield
+    database.fechar_conexoes()
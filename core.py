@@ -1,13 +1,27 @@
 from models import BaseEntity, Usuario, Obra, Emprestimo
 from datetime import datetime, timedelta, date
 from database import (
-    salvar_emprestimo, registrar_devolucao, atualizar_usuario, salvar_obra,
+    salvar_emprestimo, registrar_devolucao, salvar_obra,
     atualizar_quantidade_obra, buscar_obra, buscar_usuario, listar_todas_obras,
-    buscar_emprestimo, listar_usuarios_com_divida, buscar_emprestimos_por_usuario, buscar_obra_por_dados, ajustar_quantidade_obra
+    buscar_obra_por_dados, ajustar_quantidade_obra,
+    transacao, decrementar_estoque_obra, listar_obras_pagina, iterar_obras, salvar_usuario,
+    executar, em_transacao, buscar_emprestimo_completo, buscar_emprestimos_completos,
+    buscar_emprestimos_completos_por_usuario, buscar_obras_por_texto, aplicar_multas,
+    listar_emprestimos_atrasados, buscar_obras_por_ids, decrementar_estoque_obras, salvar_emprestimos,
+    listar_mudancas, buscar_resumo_usuario, contar_emprestimos_atrasados_usuario,
+    listar_obras_populares, listar_categorias_populares
 )
-from rich.table import Table
+from cache import cache_obras, cache_usuarios
+from escrita import executar_escrita
+import json
+import re
 import uuid
 
+MULTA_POR_DIA = 1
+
+# Marca, em emprestar_lote, os itens que o limite de empréstimos impediu de tentar
+_NAO_TENTADO = object()
+
 
 class Acervo:
     """
@@ -15,9 +29,13 @@ class Acervo:
     Fornece funcionalidades para adicionar/remover obras, emprestar, devolver e gerar relatórios.
     """
 
-    def __init__(self):
-        """Inicializa uma instância do acervo."""
-        pass
+    def __init__(self, max_emprestimos_abertos=None):
+        """
+        Inicializa uma instância do acervo.
+
+        :param max_emprestimos_abertos: Limite de empréstimos em aberto por usuário (None para não limitar).
+        """
+        self.max_emprestimos_abertos = max_emprestimos_abertos
 
     def __iadd__(self, obra):
         """
@@ -65,6 +83,10 @@ class Acervo:
         self.__valida_obra(obra)
         self -= obra
 
+    def cadastrar_usuario(self, usuario):
+        """Salva um novo usuário no banco."""
+        salvar_usuario(usuario)
+
     # Busca
     def encontrar_usuario(self, id_usuario):
         """
@@ -73,9 +95,16 @@ class Acervo:
         :param id_usuario: UUID do usuário.
         :return: Instância de Usuario ou None.
         """
+        usuario = cache_usuarios.obter(str(id_usuario))
+        if usuario:
+            return usuario
+
+        versao = cache_usuarios.versao()
         row = buscar_usuario(id_usuario)
         if row:
-            usuario = Usuario(row[1], row[2], row[3], id=row[0])
+            usuario = Usuario.de_row(row)
+            if not em_transacao():  # não guarda dados ainda não confirmados
+                cache_usuarios.guardar(str(id_usuario), usuario, versao)
             return usuario
         return None
         
@@ -86,9 +115,16 @@ class Acervo:
         :param id_obra: UUID da obra.
         :return: Instância de Obra ou None.
         """
+        obra = cache_obras.obter(str(id_obra))
+        if obra:
+            return obra
+
+        versao = cache_obras.versao()
         row = buscar_obra(id_obra)
         if row:
-            obra = Obra(row[1], row[2], row[3], row[4], row[5], id=row[0])
+            obra = Obra.de_row(row)
+            if not em_transacao():  # não guarda dados ainda não confirmados
+                cache_obras.guardar(str(id_obra), obra, versao)
             return obra
         return None
     
@@ -99,16 +135,40 @@ class Acervo:
         :param id_emprestimo: UUID do empréstimo.
         :return: Instância de Emprestimo ou None.
         """
-        row = buscar_emprestimo(id_emprestimo)
+        row = buscar_emprestimo_completo(id_emprestimo)
         if row:
-            obra = self.encontrar_obra(row[1])
-            usuario = self.encontrar_usuario(row[2])
-            emprestimo = Emprestimo(obra, usuario, row[3], row[4], id=row[0])
-            if row[5]:  # data_devolucao
-                emprestimo.marcar_devolucao(row[5])
-            return emprestimo
+            return self._emprestimo_de_row(row)
         return None
 
+    def encontrar_emprestimos(self, ids_emprestimos):
+        """
+        Busca vários empréstimos de uma vez, já com obra e usuário.
+
+        :param ids_emprestimos: Iterável de UUIDs de empréstimos.
+        :return: Lista de Emprestimo (IDs inexistentes são ignorados).
+        """
+        return [self._emprestimo_de_row(row) for row in buscar_emprestimos_completos(ids_emprestimos)]
+
+    def emprestimos_do_usuario(self, id_usuario, completo=False):
+        """
+        Lista os empréstimos de um usuário, do mais recente ao mais antigo.
+
+        :param id_usuario: UUID do usuário.
+        :param completo: Se True, inclui os empréstimos já arquivados.
+        :return: Lista de Emprestimo.
+        """
+        rows = buscar_emprestimos_completos_por_usuario(id_usuario, completo=completo)
+        return [self._emprestimo_de_row(row) for row in rows]
+
+    @staticmethod
+    def _emprestimo_de_row(row):
+        """
+        Monta um Emprestimo a partir de uma linha de database._SELECT_EMPRESTIMO_COMPLETO.
+        """
+        obra = Obra.de_row((row[1],) + row[6:11]) if row[6] is not None else None
+        usuario = Usuario.de_row((row[2],) + row[11:14]) if row[11] is not None else None
+        return Emprestimo.de_row(row, obra, usuario)
+
     # Empréstimo
     def emprestar(self, obra, usuario, dias=7):
         """
@@ -121,24 +181,27 @@ class Acervo:
         """
         self.__valida_obra(obra)
 
-        row = self.encontrar_obra(obra.id)
-        if not row:
-            raise ValueError("Obra não existe, tente outra.")
-        elif row.quantidade < 0:
-            raise ValueError("Obra não tem estoque")
-
-        atualizar_quantidade_obra(obra.id, (row.quantidade - 1))
+        with transacao():
+            if self._vagas_de_emprestimo(usuario.id) == 0:
+                raise ValueError("Usuário atingiu o limite de empréstimos em aberto.")
+            # Baixa atômica: só decrementa se ainda houver estoque
+            restante = decrementar_estoque_obra(obra.id)
+            if restante is None:
+                if not buscar_obra(obra.id):
+                    raise ValueError("Obra não existe, tente outra.")
+                raise ValueError("Obra não tem estoque")
+            obra.quantidade = restante
+
+            data_emprestimo = datetime.now().date()
+            data_prev_dev = data_emprestimo + timedelta(days=dias)
+            emprestimo = Emprestimo(
+                obra=obra,
+                usuario=usuario,
+                data_emprestimo=data_emprestimo,
+                data_prev_dev=data_prev_dev
+            )
 
-        data_emprestimo = datetime.now().date()
-        data_prev_dev = data_emprestimo + timedelta(days=dias)
-        emprestimo = Emprestimo(
-            obra=obra,
-            usuario=usuario,
-            data_emprestimo=data_emprestimo,
-            data_prev_dev=data_prev_dev
-        )
-
-        salvar_emprestimo(emprestimo)
+            salvar_emprestimo(emprestimo)
         return emprestimo
     
     def emprestar_por_id(self, id_obra, id_usuario, dias=7):
@@ -158,6 +221,72 @@ class Acervo:
         
         return self.emprestar(obra, usuario, dias)
 
+    def emprestar_lote(self, id_usuario, ids_obras, dias=7):
+        """
+        Empresta várias obras a um mesmo usuário em uma única transação.
+
+        O usuário é buscado uma vez, as obras com uma única consulta e cada item
+        tem sua própria baixa atômica de estoque; os itens sem estoque ou
+        inexistentes não impedem os demais. Com limite de empréstimos em aberto,
+        os itens são tentados na ordem pedida até o usuário chegar ao limite;
+        os que falham por falta de estoque não contam.
+
+        :param id_usuario: UUID do usuário.
+        :param ids_obras: Lista de UUIDs das obras, na ordem pedida (repetir um ID empresta mais de um exemplar).
+        :param dias: Número de dias até devolução.
+        :return: Lista, na ordem de ids_obras, de dicionários com "id_obra" e
+                 "emprestimo" (Instância de Emprestimo) ou "erro".
+        """
+        usuario = self.encontrar_usuario(id_usuario)
+        if not usuario:
+            raise ValueError("Usuário não encontrado.")
+
+        data_emprestimo = datetime.now().date()
+        data_prev_dev = data_emprestimo + timedelta(days=dias)
+        resultados = []
+        emprestimos = []
+
+        with transacao():
+            obras = {row[0]: Obra.de_row(row) for row in buscar_obras_por_ids(ids_obras)}
+            existentes = [str(id_obra) for id_obra in ids_obras if str(id_obra) in obras]
+            # O limite conta só as baixas bem-sucedidas: um item sem estoque não ocupa vaga
+            restantes = iter(decrementar_estoque_obras(existentes, maximo=self._vagas_de_emprestimo(usuario.id)))
+
+            for id_obra in map(str, ids_obras):
+                obra = obras.get(id_obra)
+                if obra is None:
+                    resultados.append({"id_obra": id_obra, "erro": "Obra não existe, tente outra."})
+                    continue
+                restante = next(restantes, _NAO_TENTADO)
+                if restante is _NAO_TENTADO:
+                    resultados.append({"id_obra": id_obra, "erro": "Usuário atingiu o limite de empréstimos em aberto."})
+                    continue
+                if restante is None:
+                    resultados.append({"id_obra": id_obra, "erro": "Obra não tem estoque"})
+                    continue
+                obra.quantidade = restante
+                emprestimo = Emprestimo(
+                    obra=obra,
+                    usuario=usuario,
+                    data_emprestimo=data_emprestimo,
+                    data_prev_dev=data_prev_dev
+                )
+                emprestimos.append(emprestimo)
+                resultados.append({"id_obra": id_obra, "emprestimo": emprestimo})
+
+            if emprestimos:
+                salvar_emprestimos(emprestimos)
+        return resultados
+
+    def _vagas_de_emprestimo(self, id_usuario):
+        # Quantos empréstimos o usuário ainda pode abrir (None se não há limite).
+        # Lê o contador do resumo, sem percorrer os empréstimos do usuário.
+        if self.max_emprestimos_abertos is None:
+            return None
+        resumo = buscar_resumo_usuario(id_usuario)
+        abertos = resumo[1] if resumo else 0
+        return max(self.max_emprestimos_abertos - abertos, 0)
+
     # Devolução
     def devolver(self, emprestimo, data_dev):
         """
@@ -165,10 +294,13 @@ class Acervo:
 
         :param emprestimo: Instância de Emprestimo.
         :param data_dev: Data da devolução.
+        :raises ValueError: Se o empréstimo já foi devolvido.
         """
+        with transacao():
+            if not registrar_devolucao(emprestimo.id, data_dev):
+                raise ValueError("Empréstimo já devolvido.")
+            ajustar_quantidade_obra(emprestimo.obra.id, 1)
         emprestimo.marcar_devolucao(data_dev)
-        registrar_devolucao(emprestimo.id, data_dev)
-        ajustar_quantidade_obra(emprestimo.obra.id, 1)
 
     def devolver_por_id(self, id_emprestimo, data_devolucao=None):
         """
@@ -177,6 +309,7 @@ class Acervo:
         :param id_emprestimo: UUID do empréstimo.
         :param data_devolucao: Data da devolução, ou data atual por padrão.
         :return: Emprestimo atualizado ou None.
+        :raises ValueError: Se o empréstimo já foi devolvido.
         """
         emprestimo = self.encontrar_emprestimo(id_emprestimo)
 
@@ -184,185 +317,305 @@ class Acervo:
             return None
         
         self.devolver(emprestimo, data_devolucao or date.today())
-        return self
+        return emprestimo
 
     # Multa
     def valor_multa(self, emprestimo, data_ref):
         """
-        Calcula o valor da multa por atraso e atualiza a dívida do usuário.
+        Cobra a multa por atraso de um empréstimo e atualiza a dívida do usuário.
+
+        Usa a mesma marca de aplicar_multas_em_lote (até que dia o empréstimo já
+        foi multado), então os dias já cobrados por qualquer um dos dois não são
+        cobrados de novo.
 
         :param emprestimo: Instância de Emprestimo.
         :param data_ref: Data de referência (ex: hoje).
-        :return: Valor da multa em float.
+        :return: Valor cobrado agora, em float (0.0 se não havia dias a cobrar).
         """
-        dias_atrasados = emprestimo.dias_atraso(data_ref)
-        multa_por_dia = 1
-        valor_total = dias_atrasados * multa_por_dia
-
-        if valor_total > 0:
-            nova_divida = emprestimo.usuario.divida + valor_total
-            atualizar_usuario(emprestimo.usuario.id, nova_divida)
-            emprestimo.usuario.divida = nova_divida
-            
+        rows = aplicar_multas(data_ref, MULTA_POR_DIA, emprestimo_id=emprestimo.id)
+        valor_total = sum(dias for _, _, dias in rows) * MULTA_POR_DIA
+        emprestimo.usuario.divida += valor_total
         return float(valor_total)
-    
-    # Listagem
-    def listar_obras(self):
+
+    def aplicar_multas_em_lote(self, data_ref=None):
         """
-        Lista todas as obras do acervo.
+        Cobra as multas de atraso de todos os empréstimos de uma vez.
 
-        :return: Lista de dicionários com dados das obras.
+        Cada empréstimo guarda até que dia já foi multado, então rodar de novo
+        na mesma data não cobra nada e rodar no dia seguinte cobra só o novo dia.
+        Empréstimos devolvidos com atraso são cobrados até a data da devolução.
+
+        :param data_ref: Data de referência (padrão: hoje).
+        :return: Dicionário {id_usuario: {"emprestimos": n, "dias": d, "valor": v}}.
         """
-        rows = listar_todas_obras()
-        obras = []
-        for row in rows:
-            obras.append({
-                "id": row[0],
-                "titulo": row[1],
-                "autor": row[2],
-                "ano": row[3],
-                "categoria": row[4],
-                "quantidade": row[5]
-            })
-        return obras
+        resumo = {}
+        for usuario_id, emprestimos, dias in aplicar_multas(data_ref or date.today(), MULTA_POR_DIA):
+            resumo[usuario_id] = {
+                "emprestimos": emprestimos,
+                "dias": dias,
+                "valor": float(dias * MULTA_POR_DIA)
+            }
+        return resumo
 
-    # Relatórios
-    def relatorio_inventario(self):
+    def emprestimos_atrasados(self, limite=50, depois=None, id_usuario=None, data_ref=None):
         """
-        Gera um relatório Rich com todas as obras do acervo.
+        Lista os empréstimos em aberto com devolução atrasada, dos mais atrasados aos menos.
 
-        :return: Instância de rich.Table.
+        :param limite: Quantidade máxima de empréstimos na página.
+        :param depois: Cursor "proximo" da página anterior (None para a primeira).
+        :param id_usuario: Restringe a um usuário (opcional).
+        :param data_ref: Data de referência do atraso (padrão: hoje).
+        :return: Dicionário com os empréstimos e o cursor da próxima página.
+        :raises ValueError: Se o cursor for inválido.
         """
-        builder = self._relatorio_builder("Todos os Livros")
-        builder.add_colunas(
-            ("ID", "cyan", "center"),
-            ("Título", "magenta", "center"),
-            ("Autor", "green", "center"),
-            ("Ano", "blue", "center"),
-            ("Categoria", "white", "center"),
-            ("Quantidade", "bold yellow", "center")
-        )
+        data_ref = data_ref or date.today()
+        chave = tuple(depois.split(",", 1)) if depois else None
+        if chave is not None and len(chave) != 2:
+            raise ValueError("Cursor inválido.")
+        rows = listar_emprestimos_atrasados(data_ref, limite, chave, id_usuario)
 
-        rows = listar_todas_obras()
+        emprestimos = []
         for row in rows:
-            builder.add_linha(
-                row[0],  
-                row[1],  
-                row[2],  
-                str(row[3]), 
-                row[4], 
-                str(row[5])   
-            )
-        return builder.build()
+            emprestimo = self._emprestimo_de_row(row)
+            emprestimos.append({
+                "id": emprestimo.id,
+                "obra": {"id": row[1], "titulo": emprestimo.obra.titulo if emprestimo.obra else None},
+                "usuario": {"id": row[2], "nome": emprestimo.usuario.nome if emprestimo.usuario else None},
+                "data_emprestimo": str(emprestimo.data_emprestimo),
+                "data_prevista": str(emprestimo.previsao),
+                "dias_atraso": emprestimo.dias_atraso(data_ref)
+            })
+        proximo = f"{rows[-1][4]},{rows[-1][0]}" if len(rows) == limite else None
+        return {"emprestimos": emprestimos, "proximo": proximo}
 
-    def relatorio_debitos(self):
-        """
-        Gera um relatório com os usuários que possuem dívidas.
+    async def emprestimos_atrasados_async(self, limite=50, depois=None, id_usuario=None, data_ref=None):
+        """Versão assíncrona de emprestimos_atrasados."""
+        return await executar(self.emprestimos_atrasados, limite, depois, id_usuario, data_ref)
 
-        :return: Instância de rich.Table.
+    def resumo_usuario(self, id_usuario, data_ref=None):
         """
-        builder = self._relatorio_builder("Débitos de Usuários")
-        builder.add_colunas(
-            ("ID", "cyan", "center"),
-            ("Nome", "magenta", "center"),
-            ("Email", "green", "center"),
-            ("Dívida (R$)", "bold red", "center")
-        )
+        Resume a situação de um usuário sem percorrer o seu histórico.
 
-        rows = listar_usuarios_com_divida()
-        for row in rows:
-            builder.add_linha(
-                row[0],
-                row[1],
-                row[2],
-                row[3]
-            )
-
-        return builder.build()
+        :param id_usuario: UUID do usuário.
+        :param data_ref: Data de referência para os atrasos (padrão: hoje).
+        :return: Dicionário com empréstimos em aberto, atrasados e total, data do
+                 último empréstimo e dívida, ou None se o usuário não existe.
+        """
+        resumo = buscar_resumo_usuario(id_usuario)
+        if resumo is None:
+            return None
+        usuario_id, abertos, total, ultimo, divida = resumo
+        atrasados = contar_emprestimos_atrasados_usuario(usuario_id, data_ref or date.today()) if abertos else 0
+        return {
+            "id": usuario_id,
+            "emprestimos_abertos": abertos,
+            "emprestimos_atrasados": atrasados,
+            "emprestimos_total": total,
+            "ultimo_emprestimo": ultimo,
+            "divida": divida,
+        }
+
+    async def resumo_usuario_async(self, id_usuario, data_ref=None):
+        """Versão assíncrona de resumo_usuario."""
+        return await executar(self.resumo_usuario, id_usuario, data_ref)
+
+    # Estatísticas
+    def populares(self, janela="30d", categoria=None, limite=10, data_ref=None):
+        """
+        Lista as obras e categorias mais emprestadas nos últimos dias.
+
+        :param janela: Quantidade de dias no formato "30d" (inclui o dia de referência).
+        :param categoria: Restringe o ranking a uma categoria (opcional).
+        :param limite: Quantidade máxima de obras e de categorias.
+        :param data_ref: Último dia da janela (padrão: hoje).
+        :return: Dicionário com o início da janela e os rankings de obras e categorias.
+        :raises ValueError: Se a janela for inválida.
+        """
+        encontrado = re.fullmatch(r"(\d+)d", janela or "")
+        if not encontrado or not 1 <= int(encontrado.group(1)) <= 3660:
+            raise ValueError("Janela inválida, use dias como em '30d'.")
+        ate = data_ref or date.today()
+        desde = ate - timedelta(days=int(encontrado.group(1)) - 1)
+
+        return {
+            "janela": janela,
+            "desde": str(desde),
+            "obras": [
+                {"id": row[0], "titulo": row[1], "autor": row[2], "ano": row[3], "categoria": row[4], "emprestimos": row[5]}
+                for row in listar_obras_populares(desde, ate, limite, categoria)
+            ],
+            "categorias": [
+                {"categoria": row[0], "emprestimos": row[1]}
+                for row in listar_categorias_populares(desde, ate, limite, categoria)
+            ],
+        }
+
+    async def populares_async(self, janela="30d", categoria=None, limite=10, data_ref=None):
+        """Versão assíncrona de populares."""
+        return await executar(self.populares, janela, categoria, limite, data_ref)
+
+    # Sincronização
+    def mudancas(self, desde=0, limite=100):
+        """
+        Lista as mudanças registradas após um número de sequência, para
+        sincronização incremental de clientes.
+
+        Cada mudança traz o estado completo da entidade ("dados"), ou None
+        quando ela foi removida; basta ao cliente aplicá-las em ordem.
+
+        :param desde: Último seq já aplicado pelo cliente (0 para começar do início).
+        :param limite: Quantidade máxima de mudanças.
+        :return: Dicionário com as mudanças, o seq a usar na próxima chamada e se há mais.
+        """
+        mudancas = [
+            {"seq": seq, "entidade": entidade, "id": chave, "tipo": tipo,
+             "dados": json.loads(dados) if dados is not None else None}
+            for seq, entidade, chave, tipo, dados in listar_mudancas(desde, limite)
+        ]
+        proximo = mudancas[-1]["seq"] if mudancas else desde
+        return {"mudancas": mudancas, "proximo": proximo, "tem_mais": len(mudancas) == limite}
+
+    async def mudancas_async(self, desde=0, limite=100):
+        """Versão assíncrona de mudancas."""
+        return await executar(self.mudancas, desde, limite)
 
-    def historico_usuario(self, usuario):
+    # Listagem
+    def listar_obras(self):
         """
-        Gera um relatório com o histórico de empréstimos de um usuário.
+        Lista todas as obras do acervo.
 
-        :param usuario: Instância de Usuario.
-        :return: Instância de rich.Table.
-        """
-        builder = self._relatorio_builder(f"Histórico de Empréstimos - {usuario.nome}")
-        builder.add_colunas(
-            ("Título da Obra", "magenta", "center"),
-            ("Empréstimo", "cyan", "center"),
-            ("Previsão", "cyan", "center"),
-            ("Devolução", "yellow", "center"),
-            ("Status", "green", "center")
-        )
-
-        emprestimos = buscar_emprestimos_por_usuario(usuario.id)  
-        for row in emprestimos:
-            titulo_obra = row[5]
-            data_emp = row[2]
-            previsao = row[3]
-            data_dev = row[4]
-            status = "Devolvido" if data_dev else "Em andamento"
-
-            builder.add_linha(
-                titulo_obra,
-                str(data_emp),
-                str(previsao),
-                str(data_dev) if data_dev else "-",
-                status
-            )
+        :return: Lista de dicionários com dados das obras.
+        """
+        return [self._obra_para_dict(row) for row in listar_todas_obras()]
 
-        return builder.build()
+    def paginar_obras(self, limite=100, depois=None):
+        """
+        Lista uma página de obras, ordenadas por ID.
 
-    def __valida_obra(self, obra):
+        :param limite: Quantidade máxima de obras na página.
+        :param depois: ID da última obra da página anterior (None para a primeira).
+        :return: Dicionário com as obras e o cursor da próxima página (None se acabou).
+        :raises ValueError: Se o cursor não for um UUID.
         """
-        Valida se o objeto fornecido é uma instância de Obra.
+        obras = [self._obra_para_dict(row) for row in listar_obras_pagina(limite, depois)]
+        proximo = obras[-1]["id"] if len(obras) == limite else None
+        return {"obras": obras, "proximo": proximo}
 
-        :param obra: Objeto a ser validado.
-        :raises TypeError: Se o objeto não for uma Obra.
+    def iterar_obras(self):
         """
-        from models import Obra as ObraClass
-        if not isinstance(obra, ObraClass):
-            raise TypeError(f'Esperado tipo obra, mas recebeu {type(obra).__name__}.')
+        Percorre todas as obras do acervo sem carregá-las de uma vez na memória.
 
-    def _relatorio_builder(self, titulo):
+        :return: Gerador de dicionários com dados das obras.
         """
-        Cria e retorna um construtor de relatório.
+        for row in iterar_obras():
+            yield self._obra_para_dict(row)
 
-        :param titulo: Título do relatório.
-        :return: Instância de _RelatorioBuilder.
+    def buscar_obras(self, texto, limite=20, deslocamento=0):
         """
-        return self._RelatorioBuilder(titulo)
+        Busca obras por trechos do título ou do autor, das mais relevantes às menos.
 
-    class _RelatorioBuilder:
+        Cada palavra do texto casa como prefixo (ex: "orw 198" encontra "1984", de George Orwell).
+
+        :param texto: Texto digitado pelo usuário.
+        :param limite: Quantidade máxima de resultados.
+        :param deslocamento: Quantidade de resultados a pular (paginação).
+        :return: Lista de dicionários com dados das obras.
         """
-        Classe auxiliar interna para construir tabelas Rich formatadas.
+        palavras = re.findall(r"\w+", texto)
+        if not palavras:
+            return []
+        consulta = " ".join(f'"{palavra}"*' for palavra in palavras)
+        return [self._obra_para_dict(row) for row in buscar_obras_por_texto(consulta, limite, deslocamento)]
+
+    async def buscar_obras_async(self, texto, limite=20, deslocamento=0):
+        """Versão assíncrona de buscar_obras."""
+        return await executar(self.buscar_obras, texto, limite, deslocamento)
+
+    @staticmethod
+    def _obra_para_dict(row):
+        return {
+            "id": row[0],
+            "titulo": row[1],
+            "autor": row[2],
+            "ano": row[3],
+            "categoria": row[4],
+            "quantidade": row[5]
+        }
+
+    # Versões assíncronas (executadas nas threads do banco, ver database.executar)
+    async def adicionar_async(self, obra):
+        """Versão assíncrona de adicionar."""
+        return await executar_escrita(self.adicionar, obra)
+
+    async def cadastrar_usuario_async(self, usuario):
+        """Versão assíncrona de cadastrar_usuario."""
+        return await executar_escrita(self.cadastrar_usuario, usuario)
+
+    async def encontrar_usuario_async(self, id_usuario):
+        """Versão assíncrona de encontrar_usuario."""
+        return await executar(self.encontrar_usuario, id_usuario)
+
+    async def encontrar_obra_async(self, id_obra):
+        """Versão assíncrona de encontrar_obra."""
+        return await executar(self.encontrar_obra, id_obra)
+
+    async def emprestar_por_id_async(self, id_obra, id_usuario, dias=7):
+        """Versão assíncrona de emprestar_por_id."""
+        return await executar_escrita(self.emprestar_por_id, id_obra, id_usuario, dias)
+
+    async def emprestar_lote_async(self, id_usuario, ids_obras, dias=7):
+        """Versão assíncrona de emprestar_lote."""
+        return await executar_escrita(self.emprestar_lote, id_usuario, ids_obras, dias)
+
+    async def devolver_por_id_async(self, id_emprestimo, data_devolucao=None):
+        """Versão assíncrona de devolver_por_id."""
+        return await executar_escrita(self.devolver_por_id, id_emprestimo, data_devolucao)
+
+    async def listar_obras_async(self):
+        """Versão assíncrona de listar_obras."""
+        return await executar(self.listar_obras)
+
+    async def paginar_obras_async(self, limite=100, depois=None):
+        """Versão assíncrona de paginar_obras."""
+        return await executar(self.paginar_obras, limite, depois)
+
+    # Relatórios (módulo relatorios, importado só quando usado)
+    def relatorio_inventario(self):
         """
+        Gera um relatório com todas as obras do acervo.
 
-        def __init__(self, titulo):
-            self.tabela = Table(title=titulo, show_lines=True)
+        :return: Instância de relatorios.Relatorio (CSV, JSON ou tabela Rich).
+        """
+        import relatorios
+        return relatorios.inventario()
 
-        def add_colunas(self, *colunas):
-            """
-            Adiciona colunas à tabela.
+    def relatorio_debitos(self):
+        """
+        Gera um relatório com os usuários que possuem dívidas.
 
-            :param colunas: Tuplas (nome, estilo, alinhamento).
-            """
-            for nome, estilo, alinhamento in colunas:
-                self.tabela.add_column(nome, style=estilo, justify=alinhamento)
+        :return: Instância de relatorios.Relatorio (CSV, JSON ou tabela Rich).
+        """
+        import relatorios
+        return relatorios.debitos()
 
-        def add_linha(self, *valores):
-            """
-            Adiciona uma linha à tabela.
+    def historico_usuario(self, usuario, completo=False):
+        """
+        Gera um relatório com o histórico de empréstimos de um usuário.
 
-            :param valores: Valores a serem convertidos para string e exibidos.
-            """
-            self.tabela.add_row(*[str(v) for v in valores])
+        :param usuario: Instância de Usuario.
+        :param completo: Se True, inclui os empréstimos já arquivados.
+        :return: Instância de relatorios.Relatorio (CSV, JSON ou tabela Rich).
+        """
+        import relatorios
+        return relatorios.historico_usuario(usuario, completo=completo)
 
-        def build(self):
-            """
-            Constrói e retorna a tabela Rich.
+    def __valida_obra(self, obra):
+        """
+        Valida se o objeto fornecido é uma instância de Obra.
 
-            :return: Instância de rich.Table.
-            """
-            return self.tabela
+        :param obra: Objeto a ser validado.
+        :raises TypeError: Se o objeto não for uma Obra.
+        """
+        from models import Obra as ObraClass
+        if not isinstance(obra, ObraClass):
+            raise TypeError(f'Esperado tipo obra, mas recebeu {type(obra).__name__}.')
@@ -1,68 +1,781 @@
+import asyncio
+import functools
+import os
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from models import Obra, Usuario
+from cache import cache_obras, cache_usuarios, cache_respostas
+from replica import ReplicaCatalogo
+import metricas
+import re
 import uuid
 
+# Configuração do pool de conexões (pode ser sobrescrita por variáveis de ambiente
+# ou pela função configurar).
+CAMINHO_BANCO = os.environ.get("ACERVO_DB", "acervo.db")
+TIMEOUT_BANCO = float(os.environ.get("ACERVO_DB_TIMEOUT", "5.0"))
+CACHE_STATEMENTS = int(os.environ.get("ACERVO_DB_CACHE_STATEMENTS", "128"))
+THREADS_BANCO = int(os.environ.get("ACERVO_DB_THREADS", "4"))
+# NORMAL basta com WAL; FULL sincroniza o disco a cada COMMIT (mais durável, mais lento)
+SINCRONIZACAO = os.environ.get("ACERVO_DB_SYNCHRONOUS", "NORMAL")
+# Réplica em memória do catálogo para as leituras (ver replica.py)
+REPLICA = os.environ.get("ACERVO_REPLICA", "0") == "1"
+
+
+class _ConexaoInstrumentada(sqlite3.Connection):
+    # Guarda o último comando executado, para o log de consultas lentas
+    ultimo_sql = None
+    ultimos_parametros = None
+
+    def execute(self, sql, parametros=()):
+        self.ultimo_sql, self.ultimos_parametros = sql, parametros
+        return super().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        self.ultimo_sql, self.ultimos_parametros = sql, None
+        return super().executemany(sql, parametros)
+
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_conexoes_abertas = []
+_geracao = 0
+_executor = None
+_replica = ReplicaCatalogo(CAMINHO_BANCO, fabrica=_ConexaoInstrumentada) if REPLICA else None
+
+
+def _uuid_texto(valor):
+    # Conversor das colunas declaradas "UUID BLOB", que só guardam os 16 bytes
+    # de um UUID (ver _chave): voltam como o texto canônico do UUID
+    h = valor.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+# IDs são gravados como BLOB de 16 bytes (adaptador de uuid.UUID) e lidos como
+# texto (conversor aplicado às colunas "UUID BLOB" pelas conexões com PARSE_DECLTYPES)
+sqlite3.register_adapter(uuid.UUID, lambda valor: valor.bytes)
+sqlite3.register_converter("UUID", _uuid_texto)
+
+# Chaves antigas que não são UUID viram um UUID derivado delas (uuid5 neste
+# espaço de nomes), sempre o mesmo: as colunas de ID só guardam UUIDs, e a
+# chave antiga continua encontrando o registro
+_ESPACO_CHAVES_ANTIGAS = uuid.uuid5(uuid.NAMESPACE_URL, "acervo:chaves-antigas")
+
+
+def _chave(valor):
+    # Parâmetro de ID nas consultas: sempre um uuid.UUID (vira BLOB pelo adaptador)
+    if isinstance(valor, uuid.UUID):
+        return valor
+    try:
+        return uuid.UUID(valor)
+    except (TypeError, ValueError, AttributeError):
+        return uuid.uuid5(_ESPACO_CHAVES_ANTIGAS, str(valor))
+
+
+def configurar(caminho=None, timeout=None, cache_statements=None, sincronizacao=None, replica=None):
+    """
+    Altera a configuração do banco e descarta as conexões e os caches.
+
+    :param caminho: Caminho do arquivo SQLite.
+    :param timeout: Tempo máximo (s) de espera por um lock de escrita.
+    :param cache_statements: Tamanho do cache de statements por conexão.
+    :param sincronizacao: Valor de PRAGMA synchronous das conexões (ex: "NORMAL", "FULL").
+    :param replica: Liga ou desliga a réplica em memória do catálogo.
+    """
+    global CAMINHO_BANCO, TIMEOUT_BANCO, CACHE_STATEMENTS, SINCRONIZACAO, REPLICA, _replica
+    if caminho is not None:
+        CAMINHO_BANCO = str(caminho)
+    if timeout is not None:
+        TIMEOUT_BANCO = timeout
+    if cache_statements is not None:
+        CACHE_STATEMENTS = cache_statements
+    if sincronizacao is not None:
+        SINCRONIZACAO = sincronizacao
+    if replica is not None:
+        REPLICA = replica
+    fechar_conexoes()
+    if _replica is not None:
+        _replica.descartar()
+    _replica = ReplicaCatalogo(CAMINHO_BANCO, fabrica=_ConexaoInstrumentada) if REPLICA else None
+    cache_obras.limpar()
+    cache_usuarios.limpar()
+    cache_respostas.limpar()
+
+
+def _abrir_conexao():
+    conn = sqlite3.connect(
+        CAMINHO_BANCO,
+        timeout=TIMEOUT_BANCO,
+        cached_statements=CACHE_STATEMENTS,
+        check_same_thread=False,
+        factory=_ConexaoInstrumentada,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SINCRONIZACAO}")
+    conn.execute(f"PRAGMA busy_timeout={int(TIMEOUT_BANCO * 1000)}")
+    return conn
+
+
 def conectar():
-    return sqlite3.connect("acervo.db")
+    """
+    Retorna a conexão persistente da thread atual, abrindo-a na primeira chamada.
+
+    Cada thread mantém uma única conexão, reaproveitada por todas as funções
+    deste módulo; não feche a conexão retornada.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.geracao != _geracao:
+        conn = _abrir_conexao()
+        with _pool_lock:
+            _conexoes_abertas.append(conn)
+            _local.geracao = _geracao
+        _local.conn = conn
+    return conn
+
+
+def fechar_conexoes():
+    """Fecha todas as conexões do pool (ex: ao trocar de banco ou encerrar o servidor)."""
+    global _geracao
+    with _pool_lock:
+        _geracao += 1
+        for conn in _conexoes_abertas:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        _conexoes_abertas.clear()
+    _local.conn = None
 
-def criar_tabelas():
+
+def _obter_executor():
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=THREADS_BANCO, thread_name_prefix="acervo-db")
+    return _executor
+
+
+async def executar(funcao, *args, **kwargs):
+    """
+    Executa uma função bloqueante de acesso ao banco nas threads dedicadas ao
+    banco, sem travar o event loop.
+
+    A função inteira roda em uma única thread, então transacao() e a conexão
+    da thread continuam valendo dentro dela.
+
+    :return: O retorno de funcao(*args, **kwargs).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obter_executor(), functools.partial(funcao, *args, **kwargs))
+
+
+@contextmanager
+def conexao():
+    """
+    Empresta a conexão da thread atual, confirmando ao final ou desfazendo em caso de erro.
+
+    Dentro de uma transacao() aberta, não confirma nada: o commit fica a cargo dela.
+    """
     conn = conectar()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS usuarios (
-        id TEXT PRIMARY KEY,
-        nome TEXT NOT NULL,
-        email TEXT NOT NULL UNIQUE,
-        divida REAL DEFAULT 0)
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS obras (
-        id TEXT PRIMARY KEY,
-        titulo TEXT NOT NULL,
-        autor TEXT NOT NULL,
-        ano INTEGER,
-        categoria TEXT,
-        quantidade INTEGER  
-    )
-    """)
+    if em_transacao():
+        yield conn
+        return
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+@contextmanager
+def transacao():
+    """
+    Unidade de trabalho: agrupa várias funções deste módulo em um único
+    BEGIN IMMEDIATE ... COMMIT na conexão da thread atual.
+
+    Em caso de exceção tudo é desfeito. Chamadas aninhadas reaproveitam a
+    transação mais externa.
+    """
+    conn = conectar()
+    if em_transacao():
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    _local.em_transacao = True
+    _local.invalidacoes = []
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+    finally:
+        _local.em_transacao = False
+        # Repete as invalidações depois do commit: uma leitura concorrente feita
+        # entre a escrita e o commit pode ter recolocado o valor antigo no cache
+        for cache, chave in _local.invalidacoes:
+            cache.invalidar(chave)
+        _local.invalidacoes = []
+
+
+@contextmanager
+def _conexao_catalogo():
+    """
+    Conexão para leituras do catálogo: a réplica em memória, se ativa, ou a
+    conexão da thread. Dentro de uma transacao() vai sempre ao primário, para
+    enxergar as escritas ainda não confirmadas.
+    """
+    if _replica is None or em_transacao():
+        with conexao() as conn:
+            yield conn
+        return
+    with _replica.ler(cache_obras.versao()) as conn:
+        try:
+            yield conn
+        finally:
+            # A réplica não é a conexão da thread (conectar()): o último comando
+            # fica guardado na thread para o log de consultas lentas
+            _local.consulta_replica = (conn.ultimo_sql, conn.ultimos_parametros)
+
+
+def em_transacao():
+    """Indica se há uma transacao() aberta na thread atual."""
+    return getattr(_local, "em_transacao", False)
+
+
+def _invalidar(cache, chave):
+    cache.invalidar(str(chave))
+    if em_transacao():
+        _local.invalidacoes.append((cache, str(chave)))
+
+
+def _explicar(conn, sql, parametros):
+    return [linha[3] for linha in conn.execute("EXPLAIN QUERY PLAN " + sql, parametros)]
+
+
+def _registrar_consulta_lenta(nome, segundos):
+    # O comando e o plano vêm da conexão que executou a consulta: a réplica, se
+    # a consulta passou por ela, ou a conexão da thread
+    consulta_replica = getattr(_local, "consulta_replica", None)
+    if consulta_replica is not None and _replica is not None:
+        (sql, parametros), explicar = consulta_replica, _replica.explicar
+    else:
+        conn = conectar()
+        sql, parametros = conn.ultimo_sql, conn.ultimos_parametros
+        explicar = functools.partial(_explicar, conn)
+    plano = None
+    if sql and parametros is not None:
+        try:
+            plano = explicar(sql, parametros)
+        except sqlite3.Error:
+            pass
+    metricas.registrar_consulta_lenta(nome, segundos, sql, plano)
 
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS emprestimos (
-        id TEXT PRIMARY KEY,
-        obra_id TEXT,
-        usuario_id TEXT,
-        data_emprestimo TEXT,
-        data_prevista TEXT,
-        data_devolucao TEXT
+
+def consulta(funcao):
+    """
+    Decorador que mede cada chamada de uma função de acesso ao banco, usando o
+    nome da função como nome da consulta nas métricas.
+    """
+    nome = funcao.__name__
+
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        if not metricas.ATIVO:
+            return funcao(*args, **kwargs)
+        _local.consulta_replica = None
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            segundos = time.perf_counter() - inicio
+            metricas.registrar_consulta(nome, segundos)
+            if segundos >= metricas.LIMITE_CONSULTA_LENTA:
+                _registrar_consulta_lenta(nome, segundos)
+    return medida
+
+
+def criar_tabelas(ate=None):
+    with conexao() as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            divida REAL DEFAULT 0)
+        """)
+
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS obras (
+            id TEXT PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            autor TEXT NOT NULL,
+            ano INTEGER,
+            categoria TEXT,
+            quantidade INTEGER
         )
         """)
 
-    conn.commit()
-    conn.close()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS emprestimos (
+            id TEXT PRIMARY KEY,
+            obra_id TEXT,
+            usuario_id TEXT,
+            data_emprestimo TEXT,
+            data_prevista TEXT,
+            data_devolucao TEXT
+            )
+            """)
 
-def atualizar_usuario(usuario_id, nova_divida):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE usuarios
-        SET divida = ?
-        WHERE id = ?
-    """, (nova_divida, str(usuario_id)))
+    aplicar_migracoes(ate)
+
+
+def _mesclar_obras_duplicadas(conn):
+    # O índice único em (titulo, autor, ano, categoria) exige que obras repetidas
+    # sejam fundidas antes: soma as quantidades na mais antiga e repassa os empréstimos.
+    duplicadas = conn.execute("""
+        SELECT titulo, autor, ano, categoria, SUM(quantidade), MIN(rowid)
+        FROM obras
+        GROUP BY titulo, autor, ano, categoria
+        HAVING COUNT(*) > 1
+    """).fetchall()
+    for titulo, autor, ano, categoria, total, rowid_mantida in duplicadas:
+        id_mantida = conn.execute("SELECT id FROM obras WHERE rowid = ?", (rowid_mantida,)).fetchone()[0]
+        repetidas = conn.execute("""
+            SELECT id FROM obras
+            WHERE titulo IS ? AND autor IS ? AND ano IS ? AND categoria IS ? AND rowid != ?
+        """, (titulo, autor, ano, categoria, rowid_mantida)).fetchall()
+        conn.executemany("UPDATE emprestimos SET obra_id = ? WHERE obra_id = ?",
+                         [(id_mantida, id_repetida) for (id_repetida,) in repetidas])
+        conn.executemany("DELETE FROM obras WHERE id = ?", repetidas)
+        conn.execute("UPDATE obras SET quantidade = ? WHERE id = ?", (total, id_mantida))
+
+
+def _migracao_indices(conn):
+    _mesclar_obras_duplicadas(conn)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_usuario_data
+        ON emprestimos (usuario_id, data_emprestimo DESC)
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_obras_dados
+        ON obras (titulo, autor, ano, categoria)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_usuarios_com_divida
+        ON usuarios (divida) WHERE divida > 0
+    """)
+
+
+def _migracao_busca_textual(conn):
+    # Índice FTS5 de conteúdo externo sobre obras (ligado pelo rowid), mantido por triggers
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS obras_busca USING fts5(
+            titulo, autor,
+            content='obras', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS obras_busca_insert AFTER INSERT ON obras BEGIN
+            INSERT INTO obras_busca (rowid, titulo, autor) VALUES (new.rowid, new.titulo, new.autor);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS obras_busca_delete AFTER DELETE ON obras BEGIN
+            INSERT INTO obras_busca (obras_busca, rowid, titulo, autor) VALUES ('delete', old.rowid, old.titulo, old.autor);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS obras_busca_update AFTER UPDATE OF titulo, autor ON obras BEGIN
+            INSERT INTO obras_busca (obras_busca, rowid, titulo, autor) VALUES ('delete', old.rowid, old.titulo, old.autor);
+            INSERT INTO obras_busca (rowid, titulo, autor) VALUES (new.rowid, new.titulo, new.autor);
+        END
+    """)
+    conn.execute("INSERT INTO obras_busca (obras_busca) VALUES ('rebuild')")
+
+
+@consulta
+def reconstruir_busca():
+    """
+    Reindexa a busca textual a partir da tabela obras.
 
-    conn.commit()
-    conn.close()
+    Necessário após um VACUUM, que pode renumerar os rowids de obras.
+    """
+    with conexao() as conn:
+        conn.execute("INSERT INTO obras_busca (obras_busca) VALUES ('rebuild')")
 
+
+def _migracao_multas(conn):
+    # Marca até que data cada empréstimo já foi multado, para que o cálculo em
+    # lote seja incremental e possa ser repetido sem cobrar duas vezes
+    conn.execute("ALTER TABLE emprestimos ADD COLUMN multado_ate TEXT")
+
+
+def _migracao_arquivo_emprestimos(conn):
+    # Empréstimos devolvidos há muito tempo saem de emprestimos (ver arquivar_emprestimos)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS emprestimos_arquivo (
+            id TEXT PRIMARY KEY,
+            obra_id TEXT,
+            usuario_id TEXT,
+            data_emprestimo TEXT,
+            data_prevista TEXT,
+            data_devolucao TEXT,
+            multado_ate TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_arquivo_usuario_data
+        ON emprestimos_arquivo (usuario_id, data_emprestimo DESC)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_devolvidos
+        ON emprestimos (data_devolucao) WHERE data_devolucao IS NOT NULL
+    """)
+
+
+def _migracao_emprestimos_abertos(conn):
+    # Índice parcial só com empréstimos em aberto: a listagem de atrasados não toca no histórico
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_abertos_previsao
+        ON emprestimos (data_prevista, id) WHERE data_devolucao IS NULL
+    """)
+
+
+def _uuid_texto_sql(coluna):
+    # Texto canônico de um UUID guardado como BLOB, em SQL puro: o JSON não aceita
+    # BLOBs, e os triggers não podem depender de funções registradas pelo Python
+    h = f"hex({coluna})"
+    return (f"CASE WHEN typeof({coluna}) = 'blob' THEN lower(substr({h}, 1, 8) || '-' || substr({h}, 9, 4) "
+            f"|| '-' || substr({h}, 13, 4) || '-' || substr({h}, 17, 4) || '-' || substr({h}, 21)) "
+            f"ELSE {coluna} END")
+
+
+_JSON_OBRA = (f"json_object('id', {_uuid_texto_sql('new.id')}, 'titulo', new.titulo, 'autor', new.autor, "
+              "'ano', new.ano, 'categoria', new.categoria, 'quantidade', new.quantidade)")
+_JSON_EMPRESTIMO = (f"json_object('id', {_uuid_texto_sql('new.id')}, 'obra_id', {_uuid_texto_sql('new.obra_id')}, "
+                    f"'usuario_id', {_uuid_texto_sql('new.usuario_id')}, "
+                    "'data_emprestimo', new.data_emprestimo, 'data_prevista', new.data_prevista, "
+                    "'data_devolucao', new.data_devolucao)")
+_JSON_DIVIDA = f"json_object('id', {_uuid_texto_sql('new.id')}, 'divida', new.divida)"
+
+
+def _migracao_mudancas(conn):
+    # Registro de mudanças (outbox) só de inserção, preenchido por triggers para
+    # que toda escrita entre nele, inclusive importações e operações em lote.
+    # Cada entrada traz o estado completo da entidade, então só a mais recente
+    # de cada uma importa (ver compactar_mudancas).
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mudancas (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entidade TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            dados TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mudancas_entidade ON mudancas (entidade, chave, seq)")
+    _criar_triggers_mudancas(conn)
+
+
+def _criar_triggers_mudancas(conn):
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mudancas_obra_insert AFTER INSERT ON obras BEGIN
+            INSERT INTO mudancas (entidade, chave, tipo, dados) VALUES ('obra', new.id, 'criada', {_JSON_OBRA});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mudancas_obra_update AFTER UPDATE ON obras
+        WHEN old.quantidade IS NOT new.quantidade OR old.titulo IS NOT new.titulo OR old.autor IS NOT new.autor
+             OR old.ano IS NOT new.ano OR old.categoria IS NOT new.categoria
+        BEGIN
+            INSERT INTO mudancas (entidade, chave, tipo, dados) VALUES (
+                'obra', new.id,
+                CASE WHEN old.quantidade IS NOT new.quantidade THEN 'quantidade' ELSE 'atualizada' END,
+                {_JSON_OBRA}
+            );
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mudancas_obra_delete AFTER DELETE ON obras BEGIN
+            INSERT INTO mudancas (entidade, chave, tipo, dados) VALUES ('obra', old.id, 'removida', NULL);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mudancas_emprestimo_insert AFTER INSERT ON emprestimos BEGIN
+            INSERT INTO mudancas (entidade, chave, tipo, dados) VALUES (
+                'emprestimo', new.id,
+                CASE WHEN new.data_devolucao IS NULL THEN 'aberto' ELSE 'devolvido' END,
+                {_JSON_EMPRESTIMO}
+            );
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mudancas_emprestimo_devolucao AFTER UPDATE OF data_devolucao ON emprestimos
+        WHEN old.data_devolucao IS NOT new.data_devolucao
+        BEGIN
+            INSERT INTO mudancas (entidade, chave, tipo, dados) VALUES ('emprestimo', new.id, 'devolvido', {_JSON_EMPRESTIMO});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mudancas_usuario_divida AFTER UPDATE OF divida ON usuarios
+        WHEN old.divida IS NOT new.divida
+        BEGIN
+            INSERT INTO mudancas (entidade, chave, tipo, dados)
+            VALUES ('usuario', new.id, 'divida', {_JSON_DIVIDA});
+        END
+    """)
+
+
+def _migracao_resumo_usuarios(conn):
+    # Contadores por usuário mantidos por triggers, para consultas O(1) sem
+    # percorrer o histórico. Empréstimos que vão para o arquivo continuam no total.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios_resumo (
+            usuario_id TEXT PRIMARY KEY,
+            emprestimos_abertos INTEGER NOT NULL DEFAULT 0,
+            emprestimos_total INTEGER NOT NULL DEFAULT 0,
+            ultimo_emprestimo TEXT,
+            divida REAL NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS resumo_usuario_insert AFTER INSERT ON usuarios BEGIN
+            INSERT INTO usuarios_resumo (usuario_id, divida) VALUES (new.id, new.divida)
+            ON CONFLICT (usuario_id) DO UPDATE SET divida = excluded.divida;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS resumo_usuario_divida AFTER UPDATE OF divida ON usuarios BEGIN
+            UPDATE usuarios_resumo SET divida = new.divida WHERE usuario_id = new.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS resumo_usuario_delete AFTER DELETE ON usuarios BEGIN
+            DELETE FROM usuarios_resumo WHERE usuario_id = old.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS resumo_emprestimo_insert AFTER INSERT ON emprestimos BEGIN
+            INSERT INTO usuarios_resumo (usuario_id, emprestimos_abertos, emprestimos_total, ultimo_emprestimo)
+            VALUES (new.usuario_id, new.data_devolucao IS NULL, 1, new.data_emprestimo)
+            ON CONFLICT (usuario_id) DO UPDATE SET
+                emprestimos_abertos = emprestimos_abertos + (new.data_devolucao IS NULL),
+                emprestimos_total = emprestimos_total + 1,
+                ultimo_emprestimo = max(coalesce(ultimo_emprestimo, ''), new.data_emprestimo);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS resumo_emprestimo_devolucao AFTER UPDATE OF data_devolucao ON emprestimos
+        WHEN (old.data_devolucao IS NULL) IS NOT (new.data_devolucao IS NULL)
+        BEGIN
+            UPDATE usuarios_resumo
+            SET emprestimos_abertos = emprestimos_abertos + (new.data_devolucao IS NULL) - (old.data_devolucao IS NULL)
+            WHERE usuario_id = new.usuario_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS resumo_emprestimo_delete AFTER DELETE ON emprestimos BEGIN
+            UPDATE usuarios_resumo
+            SET emprestimos_abertos = emprestimos_abertos - (old.data_devolucao IS NULL),
+                emprestimos_total = emprestimos_total
+                    - NOT EXISTS (SELECT 1 FROM emprestimos_arquivo WHERE id = old.id)
+            WHERE usuario_id = old.usuario_id;
+        END
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO usuarios_resumo
+            (usuario_id, emprestimos_abertos, emprestimos_total, ultimo_emprestimo, divida)
+        SELECT u.id,
+               (SELECT COUNT(*) FROM emprestimos e WHERE e.usuario_id = u.id AND e.data_devolucao IS NULL),
+               (SELECT COUNT(*) FROM emprestimos e WHERE e.usuario_id = u.id)
+                 + (SELECT COUNT(*) FROM emprestimos_arquivo a WHERE a.usuario_id = u.id),
+               max(
+                   coalesce((SELECT MAX(data_emprestimo) FROM emprestimos e WHERE e.usuario_id = u.id), ''),
+                   coalesce((SELECT MAX(data_emprestimo) FROM emprestimos_arquivo a WHERE a.usuario_id = u.id), '')
+               ),
+               u.divida
+        FROM usuarios u
+    """)
+    conn.execute("UPDATE usuarios_resumo SET ultimo_emprestimo = NULL WHERE ultimo_emprestimo = ''")
+    # Atrasos dependem da data, então não cabem no resumo: contados pelos empréstimos em aberto do usuário
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_abertos_usuario
+        ON emprestimos (usuario_id, data_prevista) WHERE data_devolucao IS NULL
+    """)
+
+
+def _migracao_circulacao(conn):
+    # Contadores diários de empréstimos por obra e por categoria, para rankings
+    # de popularidade que só leem os dias da janela. A categoria é a da obra no
+    # momento do empréstimo; arquivar ou devolver não mexe nos contadores.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS circulacao_obras (
+            dia TEXT NOT NULL,
+            obra_id TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            emprestimos INTEGER NOT NULL,
+            PRIMARY KEY (dia, obra_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_circulacao_obras_categoria ON circulacao_obras (categoria, dia)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS circulacao_categorias (
+            dia TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            emprestimos INTEGER NOT NULL,
+            PRIMARY KEY (dia, categoria)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS circulacao_emprestimo_insert AFTER INSERT ON emprestimos BEGIN
+            INSERT INTO circulacao_obras (dia, obra_id, categoria, emprestimos)
+            VALUES (new.data_emprestimo, new.obra_id,
+                    coalesce((SELECT categoria FROM obras WHERE id = new.obra_id), ''), 1)
+            ON CONFLICT (dia, obra_id) DO UPDATE SET emprestimos = emprestimos + 1;
+            INSERT INTO circulacao_categorias (dia, categoria, emprestimos)
+            VALUES (new.data_emprestimo, coalesce((SELECT categoria FROM obras WHERE id = new.obra_id), ''), 1)
+            ON CONFLICT (dia, categoria) DO UPDATE SET emprestimos = emprestimos + 1;
+        END
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO circulacao_obras (dia, obra_id, categoria, emprestimos)
+        SELECT e.data_emprestimo, e.obra_id, coalesce(o.categoria, ''), COUNT(*)
+        FROM (
+            SELECT obra_id, data_emprestimo FROM emprestimos
+            UNION ALL
+            SELECT obra_id, data_emprestimo FROM emprestimos_arquivo
+        ) e
+        LEFT JOIN obras o ON o.id = e.obra_id
+        WHERE e.data_emprestimo IS NOT NULL AND e.obra_id IS NOT NULL
+        GROUP BY e.data_emprestimo, e.obra_id
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO circulacao_categorias (dia, categoria, emprestimos)
+        SELECT dia, categoria, SUM(emprestimos) FROM circulacao_obras GROUP BY dia, categoria
+    """)
+
+
+# Colunas com IDs (UUID) de cada tabela, guardadas como BLOB de 16 bytes
+_COLUNAS_UUID = {
+    "usuarios": ("id",),
+    "obras": ("id",),
+    "emprestimos": ("id", "obra_id", "usuario_id"),
+    "emprestimos_arquivo": ("id", "obra_id", "usuario_id"),
+    "mudancas": ("chave",),
+    "usuarios_resumo": ("usuario_id",),
+    "circulacao_obras": ("obra_id",),
+}
+
+
+def _uuid_bytes(valor):
+    # Usada só na migração: cada ID em texto vira os 16 bytes do UUID, com as
+    # chaves antigas que não são UUID convertidas como em _chave
+    return _chave(valor).bytes if isinstance(valor, str) else valor
+
+
+def _migracao_chaves_uuid(conn):
+    # Troca os IDs em texto (36 caracteres) por BLOBs de 16 bytes, no lugar.
+    # O SQLite não altera o tipo de uma coluna, então cada tabela é recriada com
+    # as colunas declaradas "UUID BLOB" (o que liga o conversor na leitura),
+    # preservando rowids (a busca textual depende deles), índices e triggers.
+    conn.create_function("uuid_bytes", 1, _uuid_bytes, deterministic=True)
+    # Sem reescrever os triggers de outras tabelas que citam a tabela recriada
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        for tabela, colunas in _COLUNAS_UUID.items():
+            sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).fetchone()[0]
+            dependentes = [row[0] for row in conn.execute("""
+                SELECT sql FROM sqlite_master
+                WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            """, (tabela,))]
+            todas = [row[1] for row in conn.execute(f"PRAGMA table_info({tabela})")]
+            for coluna in colunas:
+                sql = re.sub(rf"\b{coluna}\s+TEXT\b", f"{coluna} UUID BLOB", sql, count=1)
+            selecao = ", ".join(f"uuid_bytes({c})" if c in colunas else c for c in todas)
+            rowid = "" if "WITHOUT ROWID" in sql.upper() else "rowid, "
+
+            conn.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_antiga")
+            conn.execute(sql)
+            conn.execute(f"""
+                INSERT INTO {tabela} ({rowid}{", ".join(todas)})
+                SELECT {rowid}{selecao} FROM {tabela}_antiga
+            """)
+            # AUTOINCREMENT (mudancas): a sequência continua de onde estava, não do maior seq restante
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (tabela,))
+            conn.execute("UPDATE sqlite_sequence SET name = ? WHERE name = ?", (tabela, f"{tabela}_antiga"))
+            conn.execute(f"DROP TABLE {tabela}_antiga")
+            for comando in dependentes:
+                conn.execute(comando)
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+    # Os triggers do registro de mudanças passam a escrever os IDs do JSON como texto
+    for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'mudancas_%'").fetchall():
+        conn.execute(f"DROP TRIGGER {nome}")
+    _criar_triggers_mudancas(conn)
+
+
+# Migrações de esquema em ordem; a versão do banco (PRAGMA user_version) é a
+# quantidade de migrações já aplicadas. Novas migrações vão sempre no final.
+MIGRACOES = [
+    _migracao_indices,
+    _migracao_busca_textual,
+    _migracao_multas,
+    _migracao_arquivo_emprestimos,
+    _migracao_emprestimos_abertos,
+    _migracao_mudancas,
+    _migracao_resumo_usuarios,
+    _migracao_circulacao,
+    _migracao_chaves_uuid,
+]
+
+
+def aplicar_migracoes(ate=None):
+    """
+    Atualiza o esquema do banco no lugar, aplicando as migrações pendentes.
+
+    Cada migração roda em sua própria transação junto com o incremento de
+    user_version, então vários processos podem chamar esta função ao mesmo tempo.
+
+    :param ate: Versão em que parar (padrão: todas), para testar e medir uma migração.
+    :return: Versão final do esquema.
+    """
+    alvo = len(MIGRACOES) if ate is None else ate
+    while True:
+        with transacao() as conn:
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+            if versao >= alvo:
+                return versao
+            MIGRACOES[versao](conn)
+            conn.execute(f"PRAGMA user_version = {versao + 1}")
+
+@consulta
+def atualizar_usuario(usuario_id, nova_divida):
+    with conexao() as conn:
+        conn.execute("""
+            UPDATE usuarios
+            SET divida = ?
+            WHERE id = ?
+        """, (nova_divida, _chave(usuario_id)))
+    _invalidar(cache_usuarios, usuario_id)
+
+@consulta
 def salvar_usuario(usuario):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("""
-                   INSERT into usuarios (id, nome, email, divida)
-                   values (?, ?, ?, ?)""", (str(usuario.id), usuario.nome, usuario.email, usuario.divida))
-    conn.commit()
-    conn.close()
-    
+    with conexao() as conn:
+        conn.execute("""
+                       INSERT into usuarios (id, nome, email, divida)
+                       values (?, ?, ?, ?)""", (_chave(usuario.id), usuario.nome, usuario.email, usuario.divida))
+    _invalidar(cache_usuarios, usuario.id)
+
 def verificar_ou_criar_usuario(nome, email):
 
     usuario_existente = buscar_usuario_por_email(email)
@@ -73,196 +786,524 @@ def verificar_ou_criar_usuario(nome, email):
     salvar_usuario(novo_usuario)
     return novo_usuario
 
+@consulta
 def salvar_obra(obra):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO obras (id, titulo, autor, ano, categoria, quantidade)
-        values (?, ?, ?, ?, ?, ?)
-        """, (str(obra.id), obra.titulo, obra.autor, obra.ano, obra.categoria, obra.quantidade))
-    conn.commit()
-    conn.close()
+    with conexao() as conn:
+        conn.execute("""
+            INSERT INTO obras (id, titulo, autor, ano, categoria, quantidade)
+            values (?, ?, ?, ?, ?, ?)
+            """, (_chave(obra.id), obra.titulo, obra.autor, obra.ano, obra.categoria, obra.quantidade))
+    _invalidar(cache_obras, obra.id)
+
+@consulta
+def importar_obras_lote(obras):
+    # Obras já cadastradas (mesmo título, autor, ano e categoria) somam a quantidade
+    with transacao() as conn:
+        conn.executemany("""
+            INSERT INTO obras (id, titulo, autor, ano, categoria, quantidade)
+            values (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (titulo, autor, ano, categoria)
+            DO UPDATE SET quantidade = quantidade + excluded.quantidade
+            """, [(_chave(obra.id), obra.titulo, obra.autor, obra.ano, obra.categoria, obra.quantidade) for obra in obras])
+    # O upsert pode ter alterado obras já cadastradas com outros IDs
+    cache_obras.limpar()
 
+@consulta
 def salvar_emprestimo(emprestimo):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO emprestimos (id, obra_id, usuario_id, data_emprestimo, data_prevista, data_devolucao)
-                   values (?, ?, ?, ?, ?, ?)
-        """,
-        (
-            str(emprestimo.id),
-            str(emprestimo.obra.id),
-            str(emprestimo.usuario.id),
-            emprestimo.data_emprestimo.isoformat(),
-            emprestimo.previsao.isoformat(),
-            getattr(emprestimo, 'data_devolucao', None)
+    with conexao() as conn:
+        conn.execute("""
+            INSERT INTO emprestimos (id, obra_id, usuario_id, data_emprestimo, data_prevista, data_devolucao)
+                       values (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                _chave(emprestimo.id),
+                _chave(emprestimo.obra.id),
+                _chave(emprestimo.usuario.id),
+                emprestimo.data_emprestimo.isoformat(),
+                emprestimo.previsao.isoformat(),
+                emprestimo.data_devolucao.isoformat() if emprestimo.data_devolucao else None
+            )
+        )
+
+@consulta
+def salvar_emprestimos(emprestimos):
+    with conexao() as conn:
+        conn.executemany("""
+            INSERT INTO emprestimos (id, obra_id, usuario_id, data_emprestimo, data_prevista, data_devolucao)
+                       values (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    _chave(emprestimo.id),
+                    _chave(emprestimo.obra.id),
+                    _chave(emprestimo.usuario.id),
+                    emprestimo.data_emprestimo.isoformat(),
+                    emprestimo.previsao.isoformat(),
+                    emprestimo.data_devolucao.isoformat() if emprestimo.data_devolucao else None
+                )
+                for emprestimo in emprestimos
+            ]
         )
-    )
-    conn.commit()
-    conn.close()
 
+@consulta
 def registrar_devolucao(emprestimo_id, data_devolucao):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE emprestimos SET data_devolucao = ?
-        WHERE id = ?
-    """, (data_devolucao.isoformat(), str(emprestimo_id)))
-    conn.commit()
-    conn.close()
+    # Só fecha empréstimos em aberto: retorna False se já estava devolvido (ou não existe)
+    with conexao() as conn:
+        return conn.execute("""
+            UPDATE emprestimos SET data_devolucao = ?
+            WHERE id = ? AND data_devolucao IS NULL
+        """, (data_devolucao.isoformat(), _chave(emprestimo_id))).rowcount == 1
 
+@consulta
 def limpar_tabelas():
-    conn = conectar()
-    cursor = conn.cursor()
-
-    cursor.execute("DELETE FROM usuarios")
-    cursor.execute("DELETE FROM obras")
-    cursor.execute("DELETE FROM emprestimos")
-
-    conn.commit()
-    conn.close()
+    with conexao() as conn:
+        conn.execute("DELETE FROM usuarios")
+        conn.execute("DELETE FROM obras")
+        conn.execute("DELETE FROM emprestimos")
+        conn.execute("DELETE FROM emprestimos_arquivo")
+        conn.execute("DELETE FROM mudancas")
+        conn.execute("DELETE FROM usuarios_resumo")
+        conn.execute("DELETE FROM circulacao_obras")
+        conn.execute("DELETE FROM circulacao_categorias")
+    if _replica is not None:
+        _replica.descartar()
+    cache_obras.limpar()
+    cache_usuarios.limpar()
+    cache_respostas.limpar()
 
+@consulta
 def buscar_obra(id_obra):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM obras WHERE id = ?", (str(id_obra),))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    with _conexao_catalogo() as conn:
+        cursor = conn.execute("SELECT * FROM obras WHERE id = ?", (_chave(id_obra),))
+        return cursor.fetchone()
+
+@consulta
+def buscar_obras_por_ids(ids_obras):
+    ids = list(dict.fromkeys(_chave(id_obra) for id_obra in ids_obras))
+    rows = []
+    with conexao() as conn:
+        for inicio in range(0, len(ids), _TAMANHO_LOTE_IN):
+            lote = ids[inicio:inicio + _TAMANHO_LOTE_IN]
+            marcadores = ", ".join("?" * len(lote))
+            rows.extend(conn.execute(f"SELECT * FROM obras WHERE id IN ({marcadores})", lote).fetchall())
+    return rows
 
+@consulta
 def buscar_usuario(id_usuario):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM usuarios WHERE id = ?", (str(id_usuario),))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    with conexao() as conn:
+        cursor = conn.execute("SELECT * FROM usuarios WHERE id = ?", (_chave(id_usuario),))
+        return cursor.fetchone()
 
+@consulta
 def atualizar_quantidade_obra(obra_id, delta):
-    conn = sqlite3.connect("acervo.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        UPDATE obras
-        SET quantidade = ?
-        WHERE id = ?
-    """, (delta, str(obra_id)))  # delta pode ser positivo ou negativo
-
-    conn.commit()
-    conn.close()
+    with conexao() as conn:
+        conn.execute("""
+            UPDATE obras
+            SET quantidade = ?
+            WHERE id = ?
+        """, (delta, _chave(obra_id)))  # delta pode ser positivo ou negativo
+    _invalidar(cache_obras, obra_id)
 
+@consulta
 def ajustar_quantidade_obra(obra_id, delta):
-    conn = sqlite3.connect("acervo.db")
-    cursor = conn.cursor()
+    with conexao() as conn:
+        conn.execute("""
+            UPDATE obras
+            SET quantidade = quantidade + ?
+            WHERE id = ?
+        """, (delta, _chave(obra_id)))
+    _invalidar(cache_obras, obra_id)
 
-    cursor.execute("""
-        UPDATE obras
-        SET quantidade = quantidade + ?
-        WHERE id = ?
-    """, (delta, str(obra_id)))
+@consulta
+def decrementar_estoque_obra(obra_id):
+    with conexao() as conn:
+        cursor = conn.execute("""
+            UPDATE obras
+            SET quantidade = quantidade - 1
+            WHERE id = ? AND quantidade > 0
+            RETURNING quantidade
+        """, (_chave(obra_id),))
+        row = cursor.fetchone()
+    _invalidar(cache_obras, obra_id)
+    return row[0] if row else None
 
-    conn.commit()
-    conn.close()
+@consulta
+def decrementar_estoque_obras(ids_obras, maximo=None):
+    # Uma baixa atômica por item (IDs repetidos baixam um exemplar cada), na mesma conexão.
+    # Com maximo, para depois de tantas baixas bem-sucedidas: os itens seguintes
+    # não são tentados e ficam de fora da lista retornada.
+    restantes = []
+    baixas = 0
+    with conexao() as conn:
+        for obra_id in ids_obras:
+            if maximo is not None and baixas >= maximo:
+                break
+            row = conn.execute("""
+                UPDATE obras
+                SET quantidade = quantidade - 1
+                WHERE id = ? AND quantidade > 0
+                RETURNING quantidade
+            """, (_chave(obra_id),)).fetchone()
+            restantes.append(row[0] if row else None)
+            baixas += row is not None
+    for obra_id in set(map(str, ids_obras)):
+        _invalidar(cache_obras, obra_id)
+    return restantes
 
+@consulta
 def listar_todas_obras():
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM obras")
-    rows = cursor.fetchall()
-    conn.close()
+    with _conexao_catalogo() as conn:
+        return conn.execute("SELECT * FROM obras").fetchall()
+
+@consulta
+def listar_obras_pagina(limite, depois=None):
+    # Paginação por chave (keyset): continua a partir do último id visto, sem OFFSET.
+    # O cursor é comparado com a chave gravada, sem o mapeamento de _chave para IDs
+    # antigos: um cursor que não é UUID levanta ValueError em vez de pular linhas.
+    with _conexao_catalogo() as conn:
+        cursor = conn.execute("""
+            SELECT * FROM obras
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (uuid.UUID(str(depois)) if depois is not None else "", limite))
+        return cursor.fetchall()
+
+def iterar_obras(tamanho_lote=500):
+    # Conexão dedicada: o gerador pode ser consumido aos poucos e por threads
+    # diferentes (ex: StreamingResponse), então não usa a conexão da thread.
+    conn = _abrir_conexao()
+    try:
+        cursor = conn.execute("SELECT * FROM obras ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(tamanho_lote)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+@consulta
+def buscar_obras_por_texto(consulta, limite, deslocamento=0):
+    # consulta já no formato de MATCH do FTS5; título pesa mais que autor no bm25.
+    # Ordena e pagina só os rowids do índice e junta com obras apenas a página final.
+    with _conexao_catalogo() as conn:
+        cursor = conn.execute("""
+            SELECT o.id, o.titulo, o.autor, o.ano, o.categoria, o.quantidade
+            FROM (
+                SELECT rowid, bm25(obras_busca, 10.0, 5.0) AS relevancia
+                FROM obras_busca
+                WHERE obras_busca MATCH ?
+                ORDER BY relevancia
+                LIMIT ? OFFSET ?
+            ) b
+            JOIN obras o ON o.rowid = b.rowid
+            ORDER BY b.relevancia
+        """, (consulta, limite, deslocamento))
+        return cursor.fetchall()
+
+@consulta
+def aplicar_multas(data_ref, multa_por_dia, emprestimo_id=None):
+    # Cobra, em uma única transação, os dias de atraso ainda não multados de cada
+    # empréstimo: de max(data_prevista, multado_ate) até a data de referência
+    # (ou até a devolução, se ela ocorreu antes). Datas ISO comparam como texto.
+    # Com emprestimo_id, cobra só esse empréstimo (mesma marca multado_ate).
+    filtro = "AND id = :emprestimo" if emprestimo_id is not None else ""
+    with transacao() as conn:
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS multas_lote (
+                emprestimo_rowid INTEGER PRIMARY KEY,
+                usuario_id UUID BLOB,
+                dias INTEGER,
+                multado_ate TEXT
+            )
+        """)
+        conn.execute("DELETE FROM multas_lote")
+        conn.execute(f"""
+            INSERT INTO multas_lote (emprestimo_rowid, usuario_id, dias, multado_ate)
+            SELECT rowid, usuario_id, CAST(julianday(fim) - julianday(inicio) AS INTEGER), fim
+            FROM (
+                SELECT
+                    rowid,
+                    usuario_id,
+                    MAX(data_prevista, COALESCE(multado_ate, data_prevista)) AS inicio,
+                    MIN(:data_ref, COALESCE(data_devolucao, :data_ref)) AS fim
+                FROM emprestimos
+                WHERE (data_devolucao IS NULL OR data_devolucao > COALESCE(multado_ate, data_prevista))
+                  {filtro}
+            )
+            WHERE fim > inicio
+        """, {"data_ref": data_ref.isoformat(), "emprestimo": _chave(emprestimo_id) if emprestimo_id is not None else None})
+        conn.execute("""
+            UPDATE usuarios
+            SET divida = divida + t.dias * ?
+            FROM (SELECT usuario_id, SUM(dias) AS dias FROM multas_lote GROUP BY usuario_id) t
+            WHERE usuarios.id = t.usuario_id
+        """, (multa_por_dia,))
+        conn.execute("""
+            UPDATE emprestimos
+            SET multado_ate = m.multado_ate
+            FROM multas_lote m
+            WHERE emprestimos.rowid = m.emprestimo_rowid
+        """)
+        rows = conn.execute("""
+            SELECT usuario_id, COUNT(*), SUM(dias)
+            FROM multas_lote
+            GROUP BY usuario_id
+        """).fetchall()
+        conn.execute("DELETE FROM multas_lote")
+    cache_usuarios.limpar()
     return rows
 
+@consulta
+def arquivar_emprestimos(devolvidos_antes_de, tamanho_lote):
+    # Move um lote de empréstimos devolvidos antes da data para emprestimos_arquivo.
+    # Retorna quantos foram movidos (0 quando não há mais nada a arquivar).
+    with transacao() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS arquivar_lote (emprestimo_rowid INTEGER PRIMARY KEY)")
+        conn.execute("""
+            INSERT INTO arquivar_lote (emprestimo_rowid)
+            SELECT rowid FROM emprestimos
+            WHERE data_devolucao IS NOT NULL AND data_devolucao < ?
+            LIMIT ?
+        """, (devolvidos_antes_de.isoformat(), tamanho_lote))
+        conn.execute(f"""
+            INSERT INTO emprestimos_arquivo ({_COLUNAS_EMPRESTIMO})
+            SELECT {_COLUNAS_EMPRESTIMO} FROM emprestimos
+            WHERE rowid IN (SELECT emprestimo_rowid FROM arquivar_lote)
+        """)
+        movidos = conn.execute("""
+            DELETE FROM emprestimos WHERE rowid IN (SELECT emprestimo_rowid FROM arquivar_lote)
+        """).rowcount
+        conn.execute("DELETE FROM arquivar_lote")
+    return movidos
+
+@consulta
+def listar_mudancas(desde, limite):
+    with conexao() as conn:
+        cursor = conn.execute("""
+            SELECT seq, entidade, chave, tipo, dados FROM mudancas
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        """, (desde, limite))
+        return cursor.fetchall()
+
+@consulta
+def versao_dados():
+    # Versão dos dados: o último seq entregue ao registro de mudanças. Como toda
+    # escrita em obras, empréstimos e dívidas passa pelos triggers, ela cresce a
+    # cada escrita (inclusive de outros processos) e nunca volta, nem após compactar.
+    if _replica is not None and not em_transacao():
+        # Com a réplica, vale o seq que ela já aplicou: as leituras seguintes (da
+        # réplica ou do primário) nunca são mais antigas que a versão devolvida
+        return _replica.versao(cache_obras.versao())
+    with conexao() as conn:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'mudancas'").fetchone()
+    return row[0] if row else 0
+
+@consulta
+def compactar_mudancas():
+    # Descarta as entradas superadas por uma mais recente da mesma entidade.
+    # A última de cada entidade (inclusive remoções) nunca sai, então um cliente
+    # que sincronize a partir de qualquer seq continua vendo o estado final.
+    with transacao() as conn:
+        return conn.execute("""
+            DELETE FROM mudancas
+            WHERE seq < (
+                SELECT MAX(m.seq) FROM mudancas m
+                WHERE m.entidade = mudancas.entidade AND m.chave = mudancas.chave
+            )
+        """).rowcount
+
+@consulta
+def buscar_resumo_usuario(usuario_id):
+    with conexao() as conn:
+        cursor = conn.execute("""
+            SELECT usuario_id, emprestimos_abertos, emprestimos_total, ultimo_emprestimo, divida
+            FROM usuarios_resumo WHERE usuario_id = ?
+        """, (_chave(usuario_id),))
+        return cursor.fetchone()
+
+@consulta
+def contar_emprestimos_atrasados_usuario(usuario_id, data_ref):
+    with conexao() as conn:
+        cursor = conn.execute("""
+            SELECT COUNT(*) FROM emprestimos
+            WHERE usuario_id = ? AND data_devolucao IS NULL AND data_prevista < ?
+        """, (_chave(usuario_id), data_ref.isoformat()))
+        return cursor.fetchone()[0]
+
+@consulta
+def listar_obras_populares(desde, ate, limite, categoria=None):
+    # Soma os contadores diários de "desde" até "ate" (inclusive): o custo
+    # depende dos dias da janela, não do tamanho do histórico de empréstimos.
+    filtro, params = ("AND categoria = ?", [categoria]) if categoria is not None else ("", [])
+    with conexao() as conn:
+        cursor = conn.execute(f"""
+            SELECT o.id, o.titulo, o.autor, o.ano, o.categoria, t.total
+            FROM (
+                SELECT obra_id, SUM(emprestimos) AS total FROM circulacao_obras
+                WHERE dia >= ? AND dia <= ? {filtro}
+                GROUP BY obra_id
+            ) t
+            JOIN obras o ON o.id = t.obra_id
+            ORDER BY t.total DESC, o.id
+            LIMIT ?
+        """, [desde.isoformat(), ate.isoformat(), *params, limite])
+        return cursor.fetchall()
+
+@consulta
+def listar_categorias_populares(desde, ate, limite, categoria=None):
+    filtro, params = ("AND categoria = ?", [categoria]) if categoria is not None else ("", [])
+    with conexao() as conn:
+        cursor = conn.execute(f"""
+            SELECT categoria, SUM(emprestimos) AS total FROM circulacao_categorias
+            WHERE dia >= ? AND dia <= ? {filtro}
+            GROUP BY categoria
+            ORDER BY total DESC, categoria
+            LIMIT ?
+        """, [desde.isoformat(), ate.isoformat(), *params, limite])
+        return cursor.fetchall()
+
+@consulta
 def listar_usuarios_com_divida():
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM usuarios WHERE divida > 0")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with conexao() as conn:
+        return conn.execute("SELECT * FROM usuarios WHERE divida > 0").fetchall()
 
-def historico_por_usuario(usuario_id):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM emprestimos WHERE usuario_id = ?", (str(usuario_id),))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+@consulta
+def historico_por_usuario(usuario_id, completo=False):
+    with conexao() as conn:
+        cursor = conn.execute(f"SELECT * FROM {_origem_emprestimos(completo)} WHERE usuario_id = ?",
+                              (_chave(usuario_id),))
+        return cursor.fetchall()
 
+@consulta
 def buscar_emprestimo(id_emprestimo):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM emprestimos WHERE id = ?", (str(id_emprestimo),))
-    row = cursor.fetchone()
-    conn.close()
-    return row
-
-def buscar_emprestimos_por_usuario(id_usuario):
-    conn = sqlite3.connect("acervo.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT 
-            e.id, 
-            e.obra_id, 
-            e.data_emprestimo, 
-            e.data_prevista, 
-            e.data_devolucao,
-            o.titulo
-        FROM emprestimos e
-        JOIN obras o ON e.obra_id = o.id
-        WHERE e.usuario_id = ?
-        ORDER BY e.data_emprestimo DESC
-    """, (str(id_usuario),))
-
-    resultados = cursor.fetchall()
-    conn.close()
-    return resultados
+    with conexao() as conn:
+        cursor = conn.execute("SELECT * FROM emprestimos WHERE id = ?", (_chave(id_emprestimo),))
+        return cursor.fetchone()
 
-def buscar_obra_por_dados(titulo, autor, ano, categoria):
-    conn = sqlite3.connect("acervo.db")
-    cursor = conn.cursor()
+# Empréstimo com obra e usuário na mesma linha:
+# e.id, e.obra_id, e.usuario_id, e.data_emprestimo, e.data_prevista, e.data_devolucao,
+# o.titulo, o.autor, o.ano, o.categoria, o.quantidade, u.nome, u.email, u.divida
+_SELECT_EMPRESTIMO_COMPLETO = """
+    SELECT
+        e.id, e.obra_id, e.usuario_id, e.data_emprestimo, e.data_prevista, e.data_devolucao,
+        o.titulo, o.autor, o.ano, o.categoria, o.quantidade,
+        u.nome, u.email, u.divida
+    FROM {origem} e
+    LEFT JOIN obras o ON o.id = e.obra_id
+    LEFT JOIN usuarios u ON u.id = e.usuario_id
+"""
+
+# Empréstimos ativos + arquivados, para consultas de histórico completo
+_COLUNAS_EMPRESTIMO = "id, obra_id, usuario_id, data_emprestimo, data_prevista, data_devolucao, multado_ate"
+_EMPRESTIMOS_COM_ARQUIVO = f"""(
+    SELECT {_COLUNAS_EMPRESTIMO} FROM emprestimos
+    UNION ALL
+    SELECT {_COLUNAS_EMPRESTIMO} FROM emprestimos_arquivo
+)"""
 
-    cursor.execute("""
-        SELECT id, titulo, autor, ano, categoria, quantidade FROM obras
-        WHERE titulo = ? AND autor = ? AND ano = ? AND categoria = ?
-    """, (titulo, autor, ano, categoria))
 
-    row = cursor.fetchone()
-    conn.close()
+def _origem_emprestimos(completo):
+    return _EMPRESTIMOS_COM_ARQUIVO if completo else "emprestimos"
+
+# Limite seguro de parâmetros por consulta com IN (...)
+_TAMANHO_LOTE_IN = 500
+
+@consulta
+def buscar_emprestimo_completo(id_emprestimo):
+    with conexao() as conn:
+        cursor = conn.execute(_SELECT_EMPRESTIMO_COMPLETO.format(origem="emprestimos") + "WHERE e.id = ?",
+                              (_chave(id_emprestimo),))
+        return cursor.fetchone()
+
+@consulta
+def buscar_emprestimos_completos(ids_emprestimos):
+    ids = [_chave(id_emprestimo) for id_emprestimo in ids_emprestimos]
+    rows = []
+    with conexao() as conn:
+        for inicio in range(0, len(ids), _TAMANHO_LOTE_IN):
+            lote = ids[inicio:inicio + _TAMANHO_LOTE_IN]
+            marcadores = ", ".join("?" * len(lote))
+            cursor = conn.execute(
+                _SELECT_EMPRESTIMO_COMPLETO.format(origem="emprestimos") + f"WHERE e.id IN ({marcadores})", lote
+            )
+            rows.extend(cursor.fetchall())
+    return rows
+
+@consulta
+def buscar_emprestimos_completos_por_usuario(id_usuario, completo=False):
+    with conexao() as conn:
+        cursor = conn.execute(
+            _SELECT_EMPRESTIMO_COMPLETO.format(origem=_origem_emprestimos(completo))
+            + "WHERE e.usuario_id = ? ORDER BY e.data_emprestimo DESC",
+            (_chave(id_usuario),)
+        )
+        return cursor.fetchall()
+
+@consulta
+def listar_emprestimos_atrasados(data_ref, limite, depois=None, usuario_id=None):
+    # Paginação por chave em (data_prevista, id): depois = (data_prevista, id) do último item visto
+    filtros = ["e.data_devolucao IS NULL", "e.data_prevista < ?"]
+    parametros = [data_ref.isoformat()]
+    if depois is not None:
+        filtros.append("(e.data_prevista, e.id) > (?, ?)")
+        parametros.extend((depois[0], _chave(depois[1])))
+    if usuario_id is not None:
+        filtros.append("e.usuario_id = ?")
+        parametros.append(_chave(usuario_id))
+    parametros.append(limite)
+    with conexao() as conn:
+        cursor = conn.execute(
+            _SELECT_EMPRESTIMO_COMPLETO.format(origem="emprestimos")
+            + f"WHERE {' AND '.join(filtros)} ORDER BY e.data_prevista, e.id LIMIT ?",
+            parametros
+        )
+        return cursor.fetchall()
+
+@consulta
+def buscar_emprestimos_por_usuario(id_usuario, completo=False):
+    with conexao() as conn:
+        cursor = conn.execute(f"""
+            SELECT
+                e.id,
+                e.obra_id,
+                e.data_emprestimo,
+                e.data_prevista,
+                e.data_devolucao,
+                o.titulo
+            FROM {_origem_emprestimos(completo)} e
+            JOIN obras o ON e.obra_id = o.id
+            WHERE e.usuario_id = ?
+            ORDER BY e.data_emprestimo DESC
+        """, (_chave(id_usuario),))
+        return cursor.fetchall()
+
+@consulta
+def buscar_obra_por_dados(titulo, autor, ano, categoria):
+    with conexao() as conn:
+        cursor = conn.execute("""
+            SELECT id, titulo, autor, ano, categoria, quantidade FROM obras
+            WHERE titulo = ? AND autor = ? AND ano = ? AND categoria = ?
+        """, (titulo, autor, ano, categoria))
+        row = cursor.fetchone()
 
     if row:
-        obra = Obra(titulo=row[1], autor=row[2], ano=row[3], categoria=row[4], quantidade=row[5], id=row[0])
-        return obra
+        return Obra.de_row(row)
     return None
 
+@consulta
 def buscar_usuario_por_email(email):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM usuarios WHERE email = ?", (email,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
-
-def buscar_usuario_por_email(email):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, nome, email, divida
-        FROM usuarios
-        WHERE email = ?
-    """, (email,))
-    row = cursor.fetchone()
-    conn.close()
+    with conexao() as conn:
+        cursor = conn.execute("""
+            SELECT id, nome, email, divida
+            FROM usuarios
+            WHERE email = ?
+        """, (email,))
+        row = cursor.fetchone()
 
     if row:
-        usuario = Usuario(nome=row[1], email=row[2], divida = row[3], id=row[0])
-        return usuario
+        return Usuario.de_row(row)
     return None
-
-def remover_emprestimo(emprestimo_id):
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM emprestimos WHERE id = ?", (str(emprestimo_id),))
-    conn.commit()
-    conn.close()
\ No newline at end of file
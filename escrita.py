@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import database
+
+# Modo coordenador de escrita: desligado por padrão, as escritas vão direto para executar()
+ATIVO = os.environ.get("ACERVO_ESCRITA_EM_GRUPO", "0") == "1"
+TAMANHO_LOTE = int(os.environ.get("ACERVO_ESCRITA_LOTE", "64"))
+# Quanto o escritor espera por mais operações depois da primeira de um lote
+LATENCIA = float(os.environ.get("ACERVO_ESCRITA_LATENCIA_MS", "0")) / 1000
+
+logger = logging.getLogger("acervo.escrita")
+
+_PARAR = object()
+
+
+class EscritorEmGrupo:
+    """
+    Escritor único com commit em grupo: as operações de escrita entram em uma
+    fila e uma só thread as executa, várias por transação.
+
+    Cada operação roda dentro de um SAVEPOINT, então a falha de uma (ex: obra
+    sem estoque) desfaz só ela; o futuro de cada chamador recebe o retorno ou a
+    exceção da sua operação depois do COMMIT do lote.
+    """
+
+    def __init__(self, tamanho_lote=TAMANHO_LOTE, latencia=LATENCIA):
+        """
+        :param tamanho_lote: Máximo de operações por transação.
+        :param latencia: Segundos que o escritor espera por mais operações após
+                         a primeira de um lote (0 junta só as que já estão na fila).
+        """
+        self.tamanho_lote = tamanho_lote
+        self.latencia = latencia
+        self.lotes = 0
+        self.operacoes = 0
+        self._fila = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submeter(self, funcao, *args, **kwargs):
+        """
+        Enfileira uma operação de escrita.
+
+        :param funcao: Função bloqueante que usa as funções de database.
+        :return: concurrent.futures.Future com o retorno de funcao(*args, **kwargs).
+        """
+        futuro = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="acervo-escritor", daemon=True)
+                self._thread.start()
+            self._fila.put((funcao, args, kwargs, futuro))
+        return futuro
+
+    def executar(self, funcao, *args, **kwargs):
+        """Enfileira uma operação e espera o seu resultado."""
+        return self.submeter(funcao, *args, **kwargs).result()
+
+    async def executar_async(self, funcao, *args, **kwargs):
+        """Versão assíncrona de executar, sem travar o event loop."""
+        return await asyncio.wrap_future(self.submeter(funcao, *args, **kwargs))
+
+    def parar(self):
+        """Processa o que já está na fila e encerra a thread do escritor."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._fila.put(_PARAR)
+        if thread is not None:
+            thread.join()
+
+    def estatisticas(self):
+        """
+        :return: Dicionário com lotes confirmados, operações e média de operações por lote.
+        """
+        return {
+            "lotes": self.lotes,
+            "operacoes": self.operacoes,
+            "media_por_lote": self.operacoes / self.lotes if self.lotes else 0.0,
+        }
+
+    def _coletar(self):
+        # Bloqueia pela primeira operação e junta as seguintes até o tamanho ou a latência limite
+        item = self._fila.get()
+        if item is _PARAR:
+            return [], True
+        lote = [item]
+        prazo = time.monotonic() + self.latencia
+        while len(lote) < self.tamanho_lote:
+            restante = prazo - time.monotonic()
+            try:
+                item = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is _PARAR:
+                return lote, True
+            lote.append(item)
+        return lote, False
+
+    def _executar(self):
+        parar = False
+        while not parar:
+            lote, parar = self._coletar()
+            if lote:
+                self._aplicar(lote)
+
+    def _aplicar(self, lote):
+        resultados = []
+        try:
+            with database.transacao() as conn:
+                for funcao, args, kwargs, futuro in lote:
+                    if not futuro.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT operacao")
+                    try:
+                        resultado = funcao(*args, **kwargs)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO operacao")
+                        conn.execute("RELEASE operacao")
+                        resultados.append((futuro, None, e))
+                    else:
+                        conn.execute("RELEASE operacao")
+                        resultados.append((futuro, resultado, None))
+        except Exception as e:
+            logger.exception("falha ao confirmar um lote de %d escritas", len(lote))
+            # Nada foi confirmado: todos os chamadores ainda pendentes recebem o erro
+            for *_, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.operacoes += len(resultados)
+        for futuro, resultado, erro in resultados:
+            if erro is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(erro)
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def obter_escritor():
+    """Retorna o escritor compartilhado do processo, criando-o na primeira chamada."""
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                _escritor = EscritorEmGrupo()
+    return _escritor
+
+
+def configurar(ativo=None, tamanho_lote=None, latencia=None):
+    """
+    Liga ou desliga o modo coordenador de escrita e ajusta os limites do lote.
+
+    :param ativo: Se True, executar_escrita passa pelo escritor único.
+    :param tamanho_lote: Máximo de operações por transação.
+    :param latencia: Espera máxima (s) por mais operações em um lote.
+    """
+    global ATIVO
+    if ativo is not None:
+        ATIVO = ativo
+    escritor = obter_escritor()
+    if tamanho_lote is not None:
+        escritor.tamanho_lote = tamanho_lote
+    if latencia is not None:
+        escritor.latencia = latencia
+
+
+async def executar_escrita(funcao, *args, **kwargs):
+    """
+    Executa uma operação de escrita sem travar o event loop: pelo escritor
+    único quando o modo coordenador está ligado, ou como executar() caso contrário.
+
+    :return: O retorno de funcao(*args, **kwargs).
+    """
+    if ATIVO:
+        return await obter_escritor().executar_async(funcao, *args, **kwargs)
+    return await database.executar(funcao, *args, **kwargs)
@@ -0,0 +1,104 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+from models import Obra
+from database import importar_obras_lote, criar_tabelas
+
+FORMATOS = ("csv", "ndjson")
+
+
+def ler_csv(arquivo):
+    """
+    Lê registros de obras de um CSV com cabeçalho.
+
+    :param arquivo: Arquivo texto aberto.
+    :return: Gerador de dicionários.
+    """
+    yield from csv.DictReader(arquivo)
+
+
+def ler_ndjson(arquivo):
+    """
+    Lê registros de obras em NDJSON (um objeto JSON por linha).
+
+    :param arquivo: Arquivo texto aberto.
+    :return: Gerador de dicionários.
+    """
+    for linha in arquivo:
+        if linha.strip():
+            yield json.loads(linha)
+
+
+def _para_obra(numero, registro):
+    try:
+        return Obra(
+            titulo=registro["titulo"],
+            autor=registro["autor"],
+            ano=int(registro["ano"]),
+            categoria=registro["categoria"],
+            quantidade=int(registro.get("quantidade") or 1)
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Registro {numero} inválido: {e!r}") from e
+
+
+def importar_obras(arquivo, formato="csv", tamanho_lote=1000):
+    """
+    Importa obras em massa, em lotes de uma transação cada.
+
+    Obras repetidas (no arquivo ou já no acervo) têm as quantidades somadas.
+    Se um registro for inválido, os lotes anteriores a ele permanecem gravados.
+
+    :param arquivo: Arquivo texto aberto em CSV ou NDJSON.
+    :param formato: "csv" ou "ndjson".
+    :param tamanho_lote: Quantidade de registros por transação.
+    :return: Dicionário com total de linhas, tempo gasto e linhas por segundo.
+    :raises ValueError: Se o formato ou algum registro for inválido.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato não suportado: {formato}")
+
+    leitor = ler_csv(arquivo) if formato == "csv" else ler_ndjson(arquivo)
+    obras = (_para_obra(numero, registro) for numero, registro in enumerate(leitor, start=1))
+
+    inicio = time.perf_counter()
+    linhas = 0
+    while True:
+        lote = list(islice(obras, tamanho_lote))
+        if not lote:
+            break
+        importar_obras_lote(lote)
+        linhas += len(lote)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "linhas": linhas,
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(linhas / segundos, 1) if segundos else None
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa obras em massa para o acervo.")
+    parser.add_argument("arquivo", help="Arquivo CSV ou NDJSON ('-' para a entrada padrão)")
+    parser.add_argument("--formato", choices=FORMATOS, help="Padrão: deduzido pela extensão")
+    parser.add_argument("--lote", type=int, default=1000, help="Registros por transação")
+    args = parser.parse_args(argv)
+
+    formato = args.formato or ("ndjson" if args.arquivo.endswith((".ndjson", ".jsonl")) else "csv")
+    criar_tabelas()
+    if args.arquivo == "-":
+        resultado = importar_obras(sys.stdin, formato, args.lote)
+    else:
+        with open(args.arquivo, newline="", encoding="utf-8") as arquivo:
+            resultado = importar_obras(arquivo, formato, args.lote)
+
+    print(f"{resultado['linhas']} obras importadas em {resultado['segundos']}s "
+          f"({resultado['linhas_por_segundo']} linhas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,50 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from uuid import UUID
 from core import Acervo
+from cache import cache_respostas
+from database import criar_tabelas, executar, fechar_conexoes, versao_dados
+from importacao import importar_obras
+from metricas import MiddlewareMetricas, exportar_prometheus
+import arquivamento
 from models import Usuario, Obra
 from datetime import date
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
+import io
+import json
+import os
+import sqlite3
+import tempfile
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    """
+    Prepara o banco ao subir o servidor e libera os recursos ao encerrá-lo.
+
+    Importar este módulo não toca no banco: o esquema só é criado/migrado aqui.
+    """
+    criar_tabelas()
+    parar_arquivamento = None
+    if os.environ.get("ACERVO_ARQUIVAR_A_CADA"):
+        # Intervalo em segundos entre execuções do arquivamento de empréstimos antigos
+        parar_arquivamento = arquivamento.iniciar_em_segundo_plano(float(os.environ["ACERVO_ARQUIVAR_A_CADA"]))
+    yield
+    if parar_arquivamento is not None:
+        parar_arquivamento.set()
+    fechar_conexoes()
 
 app = FastAPI(
     title="API de Biblioteca",
     description="Gerencia obras, usuários e empréstimos de uma biblioteca escolar.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=ciclo_de_vida
 )
+app.add_middleware(MiddlewareMetricas)
 
-acervo = Acervo()
+# Limite opcional de empréstimos em aberto por usuário (padrão 0: sem limite)
+acervo = Acervo(max_emprestimos_abertos=int(os.environ.get("ACERVO_MAX_EMPRESTIMOS", "0")) or None)
 
 # ------ Models Input ------
 
@@ -41,6 +73,14 @@ class EmprestimoInput(BaseModel):
     id_obra: UUID
     dias: int = 7
 
+class EmprestimoLoteInput(BaseModel):
+    """
+    Modelo de entrada para emprestar várias obras a um usuário de uma vez.
+    """
+    id_usuario: UUID
+    ids_obras: List[UUID] = Field(..., min_length=1, max_length=100)
+    dias: int = 7
+
 class DevolucaoInput(BaseModel):
     """
     Modelo de entrada para registrar devolução de um empréstimo.
@@ -48,10 +88,59 @@ class DevolucaoInput(BaseModel):
     emprestimo_id: UUID
     data_devolucao: Optional[date] = None
 
+# ------ Respostas condicionais ------
+
+def _etag_confere(if_none_match, etag):
+    """Compara o If-None-Match recebido com a ETag atual (comparação fraca)."""
+    if not if_none_match:
+        return False
+    etiquetas = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+    return "*" in etiquetas or etag.removeprefix("W/") in etiquetas
+
+async def _etag_atual(request, variante=""):
+    """
+    Calcula a ETag fraca de uma rota de leitura a partir da versão dos dados.
+
+    :param request: Requisição atual.
+    :param variante: Texto extra que também muda a resposta (ex: a data de hoje).
+    :return: Tupla (versão dos dados, ETag, se o cliente já tem esta versão).
+    """
+    versao = await executar(versao_dados)
+    etag = f'W/"{versao}{variante}"'
+    return versao, etag, _etag_confere(request.headers.get("if-none-match"), etag)
+
+async def _resposta_condicional(request, gerar, variante="", com_cabecalhos=False):
+    """
+    Responde uma leitura JSON com ETag, devolvendo 304 se o cliente já tem a
+    versão atual e reaproveitando o corpo serializado enquanto os dados não mudarem.
+
+    :param request: Requisição atual.
+    :param gerar: Função assíncrona sem argumentos que monta os dados da resposta.
+    :param variante: Texto extra que também muda a resposta.
+    :param com_cabecalhos: Se True, gerar devolve (dados, dicionário de cabeçalhos extras),
+                           guardados no cache junto com o corpo.
+    :return: Response com o corpo JSON ou 304.
+    """
+    # A versão é lida antes dos dados: uma escrita no meio só deixa o corpo mais novo que a ETag
+    versao, etag, nao_modificado = await _etag_atual(request, variante)
+    if nao_modificado:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    chave = f"{request.url.path}?{request.url.query}@{versao}{variante}"
+    resposta = cache_respostas.obter(chave)
+    if resposta is None:
+        versao_cache = cache_respostas.versao()
+        dados, cabecalhos = await gerar() if com_cabecalhos else (await gerar(), {})
+        corpo = json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        resposta = (corpo, cabecalhos)
+        cache_respostas.guardar(chave, resposta, versao_cache)
+    corpo, cabecalhos = resposta
+    return Response(content=corpo, media_type="application/json", headers={**cabecalhos, "ETag": etag})
+
 # ------ Rotas ------
 
 @app.post("/obras/", summary="Cadastrar nova obra")
-def criar_obra(obra: ObraInput):
+async def criar_obra(obra: ObraInput):
     """
     Cadastra uma nova obra no acervo.
 
@@ -68,11 +157,53 @@ def criar_obra(obra: ObraInput):
         categoria=obra.categoria,
         quantidade=obra.quantidade
     )
-    acervo.adicionar(nova_obra)
+    await acervo.adicionar_async(nova_obra)
     return {"mensagem": "Obra adicionada com sucesso", "id": str(nova_obra.id)}
 
+@app.post("/obras/importar", summary="Importar obras em massa")
+async def importar_obras_em_massa(request: Request, formato: Literal["csv", "ndjson"] = "csv", lote: int = Query(1000, ge=1)):
+    """
+    Importa um lote de obras enviado no corpo da requisição.
+
+    - **formato**: `csv` (com cabeçalho titulo,autor,ano,categoria,quantidade) ou `ndjson`
+    - **lote**: Quantidade de registros gravados por transação
+
+    Obras já cadastradas têm as quantidades somadas.
+    """
+    # O corpo é recebido em partes para um arquivo temporário, sem montá-lo inteiro na memória
+    arquivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for parte in request.stream():
+        arquivo.write(parte)
+    arquivo.seek(0)
+
+    try:
+        texto = io.TextIOWrapper(arquivo, encoding="utf-8", newline="")
+        return await executar(importar_obras, texto, formato, lote)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        arquivo.close()
+
+@app.get("/obras/busca", summary="Buscar obras por título ou autor")
+async def buscar_obras(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Busca obras por trechos do título ou do autor, ordenadas por relevância.
+
+    - **q**: Texto da busca (cada palavra casa como prefixo)
+    - **limit**: Quantidade máxima de resultados (padrão: 20)
+    - **offset**: Quantidade de resultados a pular
+    """
+    return await _resposta_condicional(
+        request, lambda: acervo.buscar_obras_async(q, limite=limit, deslocamento=offset)
+    )
+
 @app.post("/usuarios/", summary="Cadastrar novo usuário")
-def criar_usuario(usuario: UsuarioInput):
+async def criar_usuario(usuario: UsuarioInput):
     """
     Cadastra um novo usuário no sistema.
 
@@ -80,7 +211,10 @@ def criar_usuario(usuario: UsuarioInput):
     - **email**: Endereço de e-mail
     """
     novo_usuario = Usuario(usuario.nome, usuario.email)
-    acervo.usuarios.add(novo_usuario)  # Certifique-se que `acervo.usuarios` existe e é um set
+    try:
+        await acervo.cadastrar_usuario_async(novo_usuario)
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="E-mail já cadastrado")
 
     return {
         "id": str(novo_usuario.id),
@@ -89,8 +223,21 @@ def criar_usuario(usuario: UsuarioInput):
         "divida": novo_usuario.divida
     }
 
+@app.get("/usuarios/{id_usuario}/resumo", summary="Resumo de um usuário")
+async def resumo_usuario(id_usuario: UUID):
+    """
+    Mostra quantos empréstimos o usuário tem em aberto, quantos estão atrasados,
+    o total já feito, a data do último e a dívida atual.
+
+    - **id_usuario**: ID do usuário
+    """
+    resumo = await acervo.resumo_usuario_async(id_usuario)
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    return resumo
+
 @app.post("/emprestar/", summary="Realizar empréstimo")
-def emprestar_obra(dados: EmprestimoInput):
+async def emprestar_obra(dados: EmprestimoInput):
     """
     Realiza um empréstimo de uma obra para um usuário.
 
@@ -99,27 +246,64 @@ def emprestar_obra(dados: EmprestimoInput):
     - **dias**: Dias para devolução (padrão: 7)
     """
     try:
-        emprestimo = acervo.emprestar_por_id(
+        emprestimo = await acervo.emprestar_por_id_async(
             id_obra=dados.id_obra,
             id_usuario=dados.id_usuario,
             dias=dados.dias
         )
         return {
             "mensagem": "Empréstimo realizado com sucesso",
+            "id": str(emprestimo.id),
             "previsao_devolucao": str(emprestimo.previsao)
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/emprestar/lote", summary="Realizar vários empréstimos de uma vez")
+async def emprestar_obras_em_lote(dados: EmprestimoLoteInput):
+    """
+    Empresta várias obras a um usuário em uma única transação.
+
+    - **id_usuario**: ID do usuário
+    - **ids_obras**: IDs das obras (até 100)
+    - **dias**: Dias para devolução (padrão: 7)
+
+    Cada item é reportado com sucesso ou com o motivo da falha; um item sem
+    estoque não impede os demais.
+    """
+    try:
+        resultados = await acervo.emprestar_lote_async(dados.id_usuario, dados.ids_obras, dados.dias)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    itens = []
+    for resultado in resultados:
+        emprestimo = resultado.get("emprestimo")
+        if emprestimo is None:
+            itens.append({"id_obra": resultado["id_obra"], "sucesso": False, "erro": resultado["erro"]})
+        else:
+            itens.append({
+                "id_obra": resultado["id_obra"],
+                "sucesso": True,
+                "id": str(emprestimo.id),
+                "previsao_devolucao": str(emprestimo.previsao)
+            })
+    return {"emprestados": sum(item["sucesso"] for item in itens), "itens": itens}
+
 @app.post("/devolver/", summary="Registrar devolução")
-def devolver_obra(dados: DevolucaoInput):
+async def devolver_obra(dados: DevolucaoInput):
     """
     Registra a devolução de uma obra emprestada.
 
     - **emprestimo_id**: ID do empréstimo
     - **data_devolucao**: Data da devolução (padrão: hoje)
+
+    Um empréstimo já devolvido responde 409, sem alterar o estoque.
     """
-    emprestimo = acervo.devolver_por_id(dados.emprestimo_id, dados.data_devolucao)
+    try:
+        emprestimo = await acervo.devolver_por_id_async(dados.emprestimo_id, dados.data_devolucao)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not emprestimo:
         raise HTTPException(status_code=404, detail="Empréstimo não encontrado")
     
@@ -131,8 +315,115 @@ def devolver_obra(dados: DevolucaoInput):
     }
 
 @app.get("/obras/", summary="Listar obras")
-def listar_obras():
+async def listar_obras(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[UUID] = None,
+    formato: Literal["json", "ndjson"] = "json"
+):
+    """
+    Lista as obras cadastradas no acervo.
+
+    - **limit**: Pagina a listagem por cursor, com até esse número de obras por página.
+      Sem `limit` (e sem `after`), devolve o acervo inteiro
+    - **after**: Cursor da próxima página, recebido no cabeçalho `X-Next-Cursor`
+      (ou no `Link` com `rel="next"`) da página anterior
+    - **formato**: `ndjson` transmite o acervo inteiro, uma obra por linha, ignorando a paginação
+
+    O corpo é sempre a lista de obras; o cursor só aparece nos cabeçalhos, e
+    quando não há próxima página eles não são enviados.
+
+    Responde com ETag; com `If-None-Match` igual e nada alterado no acervo, devolve 304.
+    """
+    if formato == "ndjson":
+        # O acervo inteiro não vai para o cache de respostas, mas ainda pode ser um 304
+        _, etag, nao_modificado = await _etag_atual(request)
+        if nao_modificado:
+            return Response(status_code=304, headers={"ETag": etag})
+        linhas = (json.dumps(obra, ensure_ascii=False) + "\n" for obra in acervo.iterar_obras())
+        return StreamingResponse(linhas, media_type="application/x-ndjson", headers={"ETag": etag})
+    if limit is None and after is None:
+        return await _resposta_condicional(request, acervo.listar_obras_async)
+
+    limite = limit or 100
+
+    async def gerar_pagina():
+        pagina = await acervo.paginar_obras_async(limite=limite, depois=after)
+        cabecalhos = {}
+        if pagina["proximo"] is not None:
+            seguinte = request.url.include_query_params(after=pagina["proximo"], limit=limite)
+            cabecalhos = {"X-Next-Cursor": pagina["proximo"], "Link": f'<{seguinte}>; rel="next"'}
+        return pagina["obras"], cabecalhos
+
+    return await _resposta_condicional(request, gerar_pagina, com_cabecalhos=True)
+
+@app.get("/emprestimos/atrasados", summary="Listar empréstimos atrasados")
+async def listar_emprestimos_atrasados(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    after: Optional[str] = None,
+    id_usuario: Optional[UUID] = None
+):
+    """
+    Lista os empréstimos em aberto cuja devolução está atrasada, dos mais atrasados aos menos.
+
+    - **limit**: Quantidade máxima de empréstimos por página (padrão: 50)
+    - **after**: Cursor retornado em `proximo` pela página anterior
+    - **id_usuario**: Restringe a listagem a um usuário
+    """
+    try:
+        # O atraso depende do dia, então a data também entra na ETag
+        return await _resposta_condicional(
+            request,
+            lambda: acervo.emprestimos_atrasados_async(limite=limit, depois=after, id_usuario=id_usuario),
+            variante=f"-{date.today().isoformat()}"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/estatisticas/populares", summary="Obras e categorias mais emprestadas")
+async def listar_populares(
+    request: Request,
+    janela: str = "30d",
+    categoria: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Ranking das obras e categorias mais emprestadas na janela, a partir dos contadores diários.
+
+    - **janela**: Quantidade de dias, como `30d` (padrão), contando hoje
+    - **categoria**: Restringe o ranking a uma categoria
+    - **limit**: Quantidade máxima de obras e de categorias (padrão: 10)
+    """
+    try:
+        # A janela termina hoje, então a data também entra na ETag
+        return await _resposta_condicional(
+            request,
+            lambda: acervo.populares_async(janela=janela, categoria=categoria, limite=limit),
+            variante=f"-{date.today().isoformat()}"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/mudancas", summary="Listar mudanças para sincronização")
+async def listar_mudancas(
+    desde: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Lista as mudanças em obras, empréstimos e dívidas ocorridas após um número de sequência.
+
+    - **desde**: Valor de `proximo` da chamada anterior (0 na primeira sincronização)
+    - **limit**: Quantidade máxima de mudanças (padrão: 100)
+
+    Cada item traz o estado atual da entidade em `dados` (`null` quando removida).
+    Enquanto `tem_mais` for verdadeiro, há mais mudanças a buscar.
+    """
+    return await acervo.mudancas_async(desde=desde, limite=limit)
+
+@app.get("/metrics", include_in_schema=False)
+def metricas():
     """
-    Lista todas as obras cadastradas no acervo.
+    Métricas de consultas ao banco, rotas e caches no formato do Prometheus.
     """
-    return acervo.listar_obras()
+    return PlainTextResponse(exportar_prometheus(), media_type="text/plain; version=0.0.4")
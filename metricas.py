@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+
+import cache
+
+ATIVO = os.environ.get("ACERVO_METRICAS", "1") != "0"
+# Consultas mais lentas que isso (em segundos) são registradas no log com o plano de execução
+LIMITE_CONSULTA_LENTA = float(os.environ.get("ACERVO_CONSULTA_LENTA_MS", "100")) / 1000
+
+logger = logging.getLogger("acervo.consultas")
+
+_lock = threading.Lock()
+_consultas = {}
+_rotas = {}
+
+
+def _registrar(tabela, chave, segundos):
+    with _lock:
+        estatistica = tabela.get(chave)
+        if estatistica is None:
+            tabela[chave] = [1, segundos, segundos]
+        else:
+            estatistica[0] += 1
+            estatistica[1] += segundos
+            if segundos > estatistica[2]:
+                estatistica[2] = segundos
+
+
+def registrar_consulta(nome, segundos):
+    """
+    Contabiliza uma execução de uma consulta nomeada.
+
+    :param nome: Nome da consulta (ex: "buscar_obra").
+    :param segundos: Duração da execução.
+    """
+    _registrar(_consultas, nome, segundos)
+
+
+def registrar_consulta_lenta(nome, segundos, sql, plano):
+    """
+    Registra no log uma consulta acima de LIMITE_CONSULTA_LENTA.
+
+    :param nome: Nome da consulta.
+    :param segundos: Duração da execução.
+    :param sql: Último comando SQL executado pela consulta.
+    :param plano: Linhas do EXPLAIN QUERY PLAN (ou None se indisponível).
+    """
+    logger.warning(
+        "consulta lenta: %s levou %.1f ms\n%s\nplano:\n%s",
+        nome, segundos * 1000, (sql or "").strip(), "\n".join(plano) if plano else "(indisponível)"
+    )
+
+
+def registrar_rota(metodo, rota, segundos):
+    """Contabiliza uma requisição atendida por uma rota da API."""
+    _registrar(_rotas, (metodo, rota), segundos)
+
+
+def estatisticas():
+    """
+    :return: Cópia das estatísticas: {"consultas": {nome: (qtd, total_s, max_s)}, "rotas": {...}}.
+    """
+    with _lock:
+        return {
+            "consultas": {nome: tuple(valores) for nome, valores in _consultas.items()},
+            "rotas": {chave: tuple(valores) for chave, valores in _rotas.items()},
+        }
+
+
+def zerar():
+    """Descarta todas as estatísticas coletadas."""
+    with _lock:
+        _consultas.clear()
+        _rotas.clear()
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(**rotulos):
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos.items()) + "}"
+
+
+def exportar_prometheus():
+    """
+    Gera o texto das métricas no formato de exposição do Prometheus.
+
+    :return: String no formato text/plain; version=0.0.4.
+    """
+    dados = estatisticas()
+    linhas = []
+
+    def familia(nome, tipo, ajuda, amostras):
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        linhas.extend(f"{nome}{rotulos} {valor}" for rotulos, valor in amostras)
+
+    consultas = sorted(dados["consultas"].items())
+    familia("acervo_consulta_execucoes_total", "counter", "Execuções de cada consulta ao banco.",
+            [(_rotulos(consulta=nome), v[0]) for nome, v in consultas])
+    familia("acervo_consulta_segundos_total", "counter", "Tempo total gasto em cada consulta ao banco.",
+            [(_rotulos(consulta=nome), f"{v[1]:.6f}") for nome, v in consultas])
+    familia("acervo_consulta_segundos_max", "gauge", "Maior duração observada de cada consulta ao banco.",
+            [(_rotulos(consulta=nome), f"{v[2]:.6f}") for nome, v in consultas])
+
+    rotas = sorted(dados["rotas"].items())
+    familia("acervo_requisicoes_total", "counter", "Requisições atendidas por rota.",
+            [(_rotulos(metodo=m, rota=r), v[0]) for (m, r), v in rotas])
+    familia("acervo_requisicao_segundos_total", "counter", "Tempo total gasto por rota.",
+            [(_rotulos(metodo=m, rota=r), f"{v[1]:.6f}") for (m, r), v in rotas])
+    familia("acervo_requisicao_segundos_max", "gauge", "Maior duração observada por rota.",
+            [(_rotulos(metodo=m, rota=r), f"{v[2]:.6f}") for (m, r), v in rotas])
+
+    caches = sorted(cache.estatisticas().items())
+    familia("acervo_cache_acertos_total", "counter", "Leituras atendidas pelo cache.",
+            [(_rotulos(cache=nome), c["acertos"]) for nome, c in caches])
+    familia("acervo_cache_falhas_total", "counter", "Leituras que precisaram ir ao banco.",
+            [(_rotulos(cache=nome), c["falhas"]) for nome, c in caches])
+    familia("acervo_cache_entradas", "gauge", "Entradas atualmente no cache.",
+            [(_rotulos(cache=nome), c["tamanho"]) for nome, c in caches])
+
+    return "\n".join(linhas) + "\n"
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mede cada requisição HTTP e a atribui ao caminho da
+    rota (ex: "/obras/busca"), e não à URL concreta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ATIVO:
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rota = scope.get("route")
+            registrar_rota(scope["method"], getattr(rota, "path", "(sem rota)"), time.perf_counter() - inicio)
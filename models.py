@@ -1,11 +1,15 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
 class BaseEntity:
     """
     Classe base para entidades do sistema com ID único e data de criação.
+
+    As entidades usam __slots__ para ocupar menos memória em relatórios e caches.
     """
 
+    __slots__ = ("id", "data_criacao")
+
     def __init__(self, id=None):
         """
         Inicializa a entidade com um ID único e a data atual como data de criação.
@@ -44,6 +48,8 @@ class Obra(BaseEntity):
     Representa uma obra (livro, revista, etc.) disponível para empréstimo.
     """
 
+    __slots__ = ("titulo", "autor", "ano", "categoria", "quantidade")
+
     def __init__(self, titulo, autor, ano, categoria, quantidade=1, id=None):
         """
         Inicializa uma obra com título, autor, ano, categoria e quantidade.
@@ -60,6 +66,20 @@ class Obra(BaseEntity):
         self.ano = ano
         self.categoria = categoria
         self.quantidade = quantidade
+
+    @classmethod
+    def de_row(cls, row):
+        """
+        Monta uma obra já existente a partir de uma linha do banco, sem gerar ID
+        nem data de criação.
+
+        :param row: Tupla (id, titulo, autor, ano, categoria, quantidade).
+        :return: Instância de Obra.
+        """
+        obra = cls.__new__(cls)
+        obra.id, obra.titulo, obra.autor, obra.ano, obra.categoria, obra.quantidade = row
+        obra.data_criacao = None
+        return obra
     
     def disponivel(self, estoque):
         """
@@ -84,6 +104,8 @@ class Usuario(BaseEntity):
     Representa um usuário do sistema de empréstimos.
     """
 
+    __slots__ = ("nome", "email", "divida")
+
     def __init__(self, nome, email, divida=0, id=None):
         """
         Inicializa um usuário com nome, email e dívida (padrão: 0).
@@ -96,6 +118,20 @@ class Usuario(BaseEntity):
         self.nome = nome
         self.email = email
         self.divida = divida
+
+    @classmethod
+    def de_row(cls, row):
+        """
+        Monta um usuário já existente a partir de uma linha do banco, sem gerar ID
+        nem data de criação.
+
+        :param row: Tupla (id, nome, email, divida).
+        :return: Instância de Usuario.
+        """
+        usuario = cls.__new__(cls)
+        usuario.id, usuario.nome, usuario.email, usuario.divida = row
+        usuario.data_criacao = None
+        return usuario
     
     def __lt__(self, other):
         """
@@ -120,6 +156,8 @@ class Emprestimo(BaseEntity):
     Representa um empréstimo de uma obra feito por um usuário.
     """
 
+    __slots__ = ("obra", "usuario", "data_emprestimo", "previsao", "data_devolucao")
+
     def __init__(self, obra, usuario, data_emprestimo, data_prev_dev, id=None):
         """
         Inicializa um empréstimo com obra, usuário, data de empréstimo e data prevista de devolução.
@@ -134,6 +172,28 @@ class Emprestimo(BaseEntity):
         self.usuario = usuario
         self.data_emprestimo = data_emprestimo
         self.previsao = data_prev_dev
+        self.data_devolucao = None
+
+    @classmethod
+    def de_row(cls, row, obra, usuario):
+        """
+        Monta um empréstimo já existente a partir de uma linha do banco, sem gerar
+        ID nem data de criação. As datas ISO são convertidas para date.
+
+        :param row: Tupla (id, obra_id, usuario_id, data_emprestimo, data_prevista, data_devolucao).
+        :param obra: Instância da obra emprestada.
+        :param usuario: Instância do usuário.
+        :return: Instância de Emprestimo.
+        """
+        emprestimo = cls.__new__(cls)
+        emprestimo.id = row[0]
+        emprestimo.data_criacao = None
+        emprestimo.obra = obra
+        emprestimo.usuario = usuario
+        emprestimo.data_emprestimo = date.fromisoformat(row[3])
+        emprestimo.previsao = date.fromisoformat(row[4])
+        emprestimo.data_devolucao = date.fromisoformat(row[5]) if row[5] else None
+        return emprestimo
 
     def marcar_devolucao(self, data_devolucao):
         """
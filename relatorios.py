@@ -0,0 +1,184 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from database import listar_todas_obras, listar_usuarios_com_divida, buscar_emprestimos_por_usuario, buscar_usuario, criar_tabelas
+from models import Usuario
+
+# Relatórios do acervo. O módulo é importado só quando um relatório é pedido
+# (ver Acervo.relatorio_*), e o Rich só quando a saída é uma tabela Rich: os
+# workers da API, que não geram relatórios, não carregam nenhum dos dois.
+FORMATOS = ("csv", "json", "rich")
+
+
+class Relatorio:
+    """
+    Relatório em tabela, independente do formato de saída: CSV, JSON ou tabela Rich.
+
+    Pode ser passado direto para console.print() do Rich, que usa para_rich().
+    """
+
+    def __init__(self, titulo):
+        """
+        :param titulo: Título do relatório.
+        """
+        self.titulo = titulo
+        self.colunas = []
+        self.linhas = []
+
+    def add_colunas(self, *colunas):
+        """
+        Adiciona colunas ao relatório.
+
+        :param colunas: Tuplas (nome, estilo, alinhamento); estilo e alinhamento só valem para o Rich.
+        """
+        self.colunas.extend(colunas)
+
+    def add_linha(self, *valores):
+        """
+        Adiciona uma linha ao relatório.
+
+        :param valores: Valores a serem convertidos para string, na ordem das colunas.
+        """
+        self.linhas.append(tuple(str(v) for v in valores))
+
+    def para_csv(self):
+        """
+        :return: O relatório em CSV, com os nomes das colunas na primeira linha.
+        """
+        saida = io.StringIO()
+        escritor = csv.writer(saida)
+        escritor.writerow(nome for nome, _, _ in self.colunas)
+        escritor.writerows(self.linhas)
+        return saida.getvalue()
+
+    def para_json(self):
+        """
+        :return: O relatório em JSON: título e uma lista de objetos por linha, com os nomes das colunas como chaves.
+        """
+        nomes = [nome for nome, _, _ in self.colunas]
+        return json.dumps(
+            {"titulo": self.titulo, "linhas": [dict(zip(nomes, linha)) for linha in self.linhas]},
+            ensure_ascii=False
+        )
+
+    def para_rich(self):
+        """
+        :return: Instância de rich.Table.
+        :raises ImportError: Se o Rich não estiver instalado.
+        """
+        from rich.table import Table
+
+        tabela = Table(title=self.titulo, show_lines=True)
+        for nome, estilo, alinhamento in self.colunas:
+            tabela.add_column(nome, style=estilo, justify=alinhamento)
+        for linha in self.linhas:
+            tabela.add_row(*linha)
+        return tabela
+
+    def __rich__(self):
+        return self.para_rich()
+
+    def formatar(self, formato):
+        """
+        :param formato: Um de FORMATOS.
+        :return: Texto em CSV ou JSON, ou a tabela Rich.
+        """
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato inválido: {formato}.")
+        return getattr(self, f"para_{formato}")()
+
+
+def inventario():
+    """
+    Gera o relatório com todas as obras do acervo.
+
+    :return: Instância de Relatorio.
+    """
+    relatorio = Relatorio("Todos os Livros")
+    relatorio.add_colunas(
+        ("ID", "cyan", "center"),
+        ("Título", "magenta", "center"),
+        ("Autor", "green", "center"),
+        ("Ano", "blue", "center"),
+        ("Categoria", "white", "center"),
+        ("Quantidade", "bold yellow", "center")
+    )
+    for row in listar_todas_obras():
+        relatorio.add_linha(*row[:6])
+    return relatorio
+
+
+def debitos():
+    """
+    Gera o relatório com os usuários que possuem dívidas.
+
+    :return: Instância de Relatorio.
+    """
+    relatorio = Relatorio("Débitos de Usuários")
+    relatorio.add_colunas(
+        ("ID", "cyan", "center"),
+        ("Nome", "magenta", "center"),
+        ("Email", "green", "center"),
+        ("Dívida (R$)", "bold red", "center")
+    )
+    for row in listar_usuarios_com_divida():
+        relatorio.add_linha(*row[:4])
+    return relatorio
+
+
+def historico_usuario(usuario, completo=False):
+    """
+    Gera o relatório com o histórico de empréstimos de um usuário.
+
+    :param usuario: Instância de Usuario.
+    :param completo: Se True, inclui os empréstimos já arquivados.
+    :return: Instância de Relatorio.
+    """
+    relatorio = Relatorio(f"Histórico de Empréstimos - {usuario.nome}")
+    relatorio.add_colunas(
+        ("Título da Obra", "magenta", "center"),
+        ("Empréstimo", "cyan", "center"),
+        ("Previsão", "cyan", "center"),
+        ("Devolução", "yellow", "center"),
+        ("Status", "green", "center")
+    )
+    for _, _, data_emp, previsao, data_dev, titulo_obra in buscar_emprestimos_por_usuario(usuario.id, completo=completo):
+        relatorio.add_linha(
+            titulo_obra,
+            data_emp,
+            previsao,
+            data_dev if data_dev else "-",
+            "Devolvido" if data_dev else "Em andamento"
+        )
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios do acervo.")
+    parser.add_argument("relatorio", choices=("inventario", "debitos", "historico"))
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--usuario", help="ID do usuário (relatório historico)")
+    parser.add_argument("--completo", action="store_true", help="Inclui empréstimos arquivados (relatório historico)")
+    args = parser.parse_args(argv)
+
+    criar_tabelas()
+    if args.relatorio == "historico":
+        row = buscar_usuario(args.usuario) if args.usuario else None
+        if row is None:
+            parser.error("informe em --usuario o ID de um usuário cadastrado")
+        relatorio = historico_usuario(Usuario.de_row(row), completo=args.completo)
+    else:
+        relatorio = inventario() if args.relatorio == "inventario" else debitos()
+
+    if args.formato == "rich":
+        from rich.console import Console
+        Console().print(relatorio)
+    else:
+        texto = relatorio.formatar(args.formato)
+        sys.stdout.write(texto if texto.endswith("\n") else texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Segundos entre verificações de mudanças feitas por outros processos
+INTERVALO = float(os.environ.get("ACERVO_REPLICA_INTERVALO_MS", "200")) / 1000
+
+# O que fica na cópia: a tabela obras e o índice de busca textual (com suas tabelas internas)
+_TABELAS_CATALOGO = ("obras", "obras_busca")
+
+# Última mudança de cada obra no intervalo (seq anterior, seq atual]: como cada
+# entrada traz o estado completo, as intermediárias não importam. O "+" impede
+# o uso de idx_mudancas_entidade, que percorreria todo o histórico de obras em
+# vez de só o intervalo de seq.
+_ULTIMAS_MUDANCAS = """
+    SELECT chave, dados FROM primario.mudancas
+    WHERE seq IN (
+        SELECT MAX(seq) FROM primario.mudancas
+        WHERE seq > :desde AND seq <= :ate AND +entidade = 'obra'
+        GROUP BY chave
+    )
+"""
+
+
+class ReplicaCatalogo:
+    """
+    Cópia em memória do catálogo (obras e busca textual) para as leituras,
+    que assim não disputam o arquivo do banco com as escritas.
+
+    É criada com a API de backup do SQLite e depois atualizada a partir do
+    registro de mudanças (tabela mudancas), lido com o banco primário anexado
+    à cópia: cada atualização são poucos comandos, sem idas e vindas ao Python.
+
+    Cada thread lê da sua própria cópia, sem lock: uma leitura longa não
+    atrasa as das outras threads. As cópias se atualizam sozinhas, e nenhuma
+    serve uma leitura com versão anterior à mais nova já aplicada por outra
+    thread (ver versao()).
+    """
+
+    def __init__(self, caminho, intervalo=INTERVALO, fabrica=sqlite3.Connection):
+        """
+        :param caminho: Caminho do banco primário.
+        :param intervalo: Segundos entre verificações de mudanças de outros processos.
+        :param fabrica: Classe da conexão das cópias (parâmetro factory de sqlite3.connect).
+        """
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.fabrica = fabrica
+        self.atualizacoes = 0
+        self._modelo = None
+        self._copias = []
+        self._geracao = 0
+        self._versao_publicada = 0
+        self._local = threading.local()
+        # Protege o modelo, a lista de cópias e a versão publicada; nunca é mantido durante uma leitura
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        return sqlite3.connect(
+            ":memory:", check_same_thread=False, isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES,
+            factory=self.fabrica
+        )
+
+    def _copiar_primario(self):
+        # Copia o banco primário para a memória e descarta o que não é catálogo.
+        # Retorna (conexão, versão, momento da cópia).
+        memoria = self._conectar()
+        primaria = sqlite3.connect(self.caminho)
+        try:
+            primaria.backup(memoria)
+        finally:
+            primaria.close()
+        # A versão vem da própria cópia, então corresponde exatamente ao que foi copiado
+        row = memoria.execute("SELECT seq FROM sqlite_sequence WHERE name = 'mudancas'").fetchone()
+        versao = row[0] if row else 0
+
+        for (nome,) in memoria.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'trigger' AND name NOT LIKE 'obras_busca%'
+        """).fetchall():
+            memoria.execute(f"DROP TRIGGER {nome}")
+        for (nome,) in memoria.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'obras_busca_%'
+        """).fetchall():
+            if nome not in _TABELAS_CATALOGO:
+                memoria.execute(f"DROP TABLE {nome}")
+        # Na cópia quase toda atualização só mexe na quantidade: reindexa a busca só se o texto mudou
+        memoria.execute("DROP TRIGGER obras_busca_update")
+        memoria.execute("""
+            CREATE TRIGGER obras_busca_update AFTER UPDATE OF titulo, autor ON obras
+            WHEN old.titulo IS NOT new.titulo OR old.autor IS NOT new.autor
+            BEGIN
+                INSERT INTO obras_busca (obras_busca, rowid, titulo, autor) VALUES ('delete', old.rowid, old.titulo, old.autor);
+                INSERT INTO obras_busca (rowid, titulo, autor) VALUES (new.rowid, new.titulo, new.autor);
+            END
+        """)
+        memoria.execute("VACUUM")
+        return memoria, versao, time.monotonic()
+
+    def _usar(self, conn, versao, verificado_em):
+        # Passa a cópia a ser a da thread atual, ligada ao primário para as atualizações
+        conn.execute("ATTACH DATABASE ? AS primario", (self.caminho,))
+        copia = self._local
+        antiga = getattr(copia, "conn", None) if getattr(copia, "geracao", None) == self._geracao else None
+        with self._lock:
+            self._copias.append(conn)
+            if antiga is not None:
+                self._copias.remove(antiga)
+        if antiga is not None:
+            antiga.close()
+        copia.conn, copia.versao, copia.verificado_em, copia.geracao = conn, versao, verificado_em, self._geracao
+
+    def construir(self):
+        """
+        Cria a cópia da thread atual a partir do modelo, que é copiado do
+        primário uma vez e só tem o catálogo (por isso a cópia é rápida).
+        """
+        with self._lock:
+            if self._modelo is None:
+                self._modelo = self._copiar_primario()
+            modelo, versao, verificado_em = self._modelo
+            memoria = self._conectar()
+            modelo.backup(memoria)
+        self._usar(memoria, versao, verificado_em)
+
+    def atualizar(self):
+        """Aplica na cópia da thread as mudanças de obras registradas desde a última atualização."""
+        copia = self._local
+        conn = copia.conn
+        copia.verificado_em = time.monotonic()
+        # A leitura da versão e das mudanças acontece no mesmo snapshot do primário
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT seq FROM primario.sqlite_sequence WHERE name = 'mudancas'").fetchone()
+            versao = row[0] if row else 0
+            if versao == copia.versao:
+                conn.execute("COMMIT")
+                return
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS mudancas_obras (chave UUID BLOB PRIMARY KEY, dados TEXT)")
+            conn.execute(f"INSERT INTO mudancas_obras {_ULTIMAS_MUDANCAS}", {"desde": copia.versao, "ate": versao})
+            conn.execute("DELETE FROM obras WHERE id IN (SELECT chave FROM mudancas_obras WHERE dados IS NULL)")
+            # Quase toda mudança é só de quantidade, coluna fora dos índices: atualiza direto
+            conn.execute("""
+                UPDATE obras SET quantidade = json_extract(m.dados, '$.quantidade')
+                FROM mudancas_obras m
+                WHERE obras.id = m.chave AND m.dados IS NOT NULL
+            """)
+            # Obras novas ou com título/autor/ano/categoria alterados
+            conn.execute("""
+                INSERT INTO obras (id, titulo, autor, ano, categoria, quantidade)
+                SELECT chave, json_extract(dados, '$.titulo'), json_extract(dados, '$.autor'),
+                       json_extract(dados, '$.ano'), json_extract(dados, '$.categoria'),
+                       json_extract(dados, '$.quantidade')
+                FROM mudancas_obras WHERE dados IS NOT NULL
+                ON CONFLICT(id) DO UPDATE SET
+                    titulo = excluded.titulo, autor = excluded.autor, ano = excluded.ano, categoria = excluded.categoria
+                WHERE obras.titulo IS NOT excluded.titulo OR obras.autor IS NOT excluded.autor
+                   OR obras.ano IS NOT excluded.ano OR obras.categoria IS NOT excluded.categoria
+            """)
+            conn.execute("DELETE FROM mudancas_obras")
+            conn.execute("COMMIT")
+        except sqlite3.IntegrityError:
+            # Troca de dados entre obras (índice único) fora de ordem: recomeça do zero
+            conn.execute("ROLLBACK")
+            self._usar(*self._copiar_primario())
+            return
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        copia.versao = versao
+        with self._lock:
+            self._versao_publicada = max(self._versao_publicada, versao)
+            self.atualizacoes += 1
+
+    def descartar(self):
+        """Descarta todas as cópias; a próxima leitura de cada thread reconstrói a sua."""
+        with self._lock:
+            for conn in self._copias:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            if self._modelo is not None:
+                self._modelo[0].close()
+            self._copias.clear()
+            self._modelo = None
+            self._versao_publicada = 0
+            self._geracao += 1
+
+    def explicar(self, sql, parametros):
+        """
+        Plano de execução de um comando na cópia da thread, para o log de consultas lentas.
+
+        :return: Linhas do EXPLAIN QUERY PLAN, ou None se a thread não tem cópia válida.
+        """
+        copia = self._local
+        if getattr(copia, "geracao", None) != self._geracao:
+            return None
+        return [linha[3] for linha in copia.conn.execute("EXPLAIN QUERY PLAN " + sql, parametros)]
+
+    def versao(self, versao_local):
+        """
+        Versão dos dados já aplicada na cópia da thread (o seq do registro de
+        mudanças), atualizando-a antes se preciso, como em ler().
+
+        Nenhuma cópia serve uma leitura com versão anterior à mais nova já
+        aplicada em qualquer thread, então o que for lido depois, de qualquer
+        cópia, nunca é mais antigo que a versão devolvida.
+
+        :param versao_local: Versão do cache de obras deste processo (ver ler()).
+        """
+        with self.ler(versao_local):
+            return self._local.versao
+
+    @contextmanager
+    def ler(self, versao_local):
+        """
+        Empresta a conexão da cópia da thread atual, atualizando-a antes se preciso.
+
+        :param versao_local: Versão do cache de obras deste processo; quando muda,
+                             houve uma escrita aqui e a cópia é atualizada na hora,
+                             para que quem escreveu leia o que escreveu.
+        """
+        copia = self._local
+        if getattr(copia, "geracao", None) != self._geracao:
+            copia.versao_local = versao_local
+            self.construir()
+        if (versao_local != copia.versao_local or copia.versao < self._versao_publicada
+                or time.monotonic() - copia.verificado_em > self.intervalo):
+            copia.versao_local = versao_local
+            self.atualizar()
+        yield copia.conn
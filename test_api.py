@@ -0,0 +1,289 @@
+import json
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from main import app, acervo
+from models import Obra
+
+client = TestClient(app)
+
+
+def _cadastrar_obras(n):
+    for i in range(n):
+        acervo.adicionar(Obra(titulo=f"Livro {i}", autor="Autor", ano=2000, categoria="Livro", quantidade=1))
+
+
+def test_importar_main_nao_toca_no_banco(tmp_path):
+    # O esquema só é criado quando o servidor sobe (lifespan), nunca no import
+    banco = tmp_path / "novo.db"
+    codigo = (
+        "import os, main; from fastapi.testclient import TestClient\n"
+        "assert not os.path.exists(os.environ['ACERVO_DB'])\n"
+        "with TestClient(main.app): pass\n"
+        "import sqlite3; print(sqlite3.connect(os.environ['ACERVO_DB']).execute('PRAGMA user_version').fetchone()[0])"
+    )
+    ambiente = {**os.environ, "ACERVO_DB": str(banco), "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=tmp_path, env=ambiente, capture_output=True, text=True, check=True)
+    assert int(saida.stdout) > 0
+
+
+def test_listar_obras_paginado():
+    _cadastrar_obras(5)
+
+    vistos = []
+    resposta = client.get("/obras/", params={"limit": 2})
+    while True:
+        vistos += [obra["id"] for obra in resposta.json()]
+        if "x-next-cursor" not in resposta.headers:
+            assert "link" not in resposta.headers
+            break
+        # O Link aponta para a próxima página com o mesmo cursor do X-Next-Cursor
+        seguinte = resposta.links["next"]["url"]
+        assert f"after={resposta.headers['x-next-cursor']}" in seguinte
+        resposta = client.get(seguinte)
+
+    assert len(vistos) == 5
+    assert vistos == sorted(vistos)
+    # Sem limit, o corpo continua sendo a lista com o acervo inteiro
+    assert sorted(obra["id"] for obra in client.get("/obras/").json()) == vistos
+    # Um cursor que não é UUID é rejeitado em vez de pular obras
+    for cursor in ("", "abc", "1"):
+        assert client.get("/obras/", params={"limit": 2, "after": cursor}).status_code == 422
+
+
+def test_listar_obras_ndjson():
+    _cadastrar_obras(3)
+
+    resposta = client.get("/obras/", params={"formato": "ndjson"})
+    assert resposta.headers["content-type"].startswith("application/x-ndjson")
+    obras = [json.loads(linha) for linha in resposta.text.splitlines()]
+    assert sorted(obra["titulo"] for obra in obras) == ["Livro 0", "Livro 1", "Livro 2"]
+
+
+def test_importar_obras_em_massa():
+    corpo = "titulo,autor,ano,categoria,quantidade\n1984,George Orwell,1949,Ficção,3\n1984,George Orwell,1949,Ficção,1\n"
+
+    resposta = client.post("/obras/importar", params={"formato": "csv"}, content=corpo.encode())
+
+    assert resposta.status_code == 200
+    assert resposta.json()["linhas"] == 2
+    assert client.get("/obras/").json()[0]["quantidade"] == 4
+
+
+def test_importar_obras_registro_invalido():
+    resposta = client.post("/obras/importar", params={"formato": "csv"}, content=b"titulo,autor\n1984,George Orwell\n")
+    assert resposta.status_code == 400
+
+
+def test_fluxo_emprestimo_e_devolucao_pela_api():
+    usuario = client.post("/usuarios/", json={"nome": "Dezmetros", "email": "basquete@email.com"}).json()
+    assert client.post("/usuarios/", json={"nome": "Outro", "email": "basquete@email.com"}).status_code == 409
+    client.post("/obras/", json={"titulo": "1984", "autor": "George Orwell", "ano": 1949, "categoria": "Ficção"})
+    obra = client.get("/obras/").json()[0]
+
+    emprestimo = client.post("/emprestar/", json={"id_usuario": usuario["id"], "id_obra": obra["id"]})
+    assert emprestimo.status_code == 200
+    sem_estoque = client.post("/emprestar/", json={"id_usuario": usuario["id"], "id_obra": obra["id"]})
+    assert sem_estoque.status_code == 400
+
+    devolucao = client.post("/devolver/", json={"emprestimo_id": emprestimo.json()["id"]})
+    assert devolucao.status_code == 200
+    assert devolucao.json()["obra"] == "1984"
+    assert client.get("/obras/").json()[0]["quantidade"] == 1
+
+    # Devolver de novo o mesmo empréstimo não devolve outro exemplar ao estoque
+    repetida = client.post("/devolver/", json={"emprestimo_id": emprestimo.json()["id"]})
+    assert repetida.status_code == 409
+    assert client.get("/obras/").json()[0]["quantidade"] == 1
+
+
+def test_emprestar_lote_reporta_cada_item():
+    usuario = client.post("/usuarios/", json={"nome": "Aluno", "email": "aluno@email.com"}).json()
+    client.post("/obras/", json={"titulo": "Dom Casmurro", "autor": "Machado", "ano": 1899, "categoria": "Livro", "quantidade": 2})
+    client.post("/obras/", json={"titulo": "Iracema", "autor": "Alencar", "ano": 1865, "categoria": "Livro"})
+    obras = {o["titulo"]: o["id"] for o in client.get("/obras/").json()}
+    inexistente = "00000000-0000-4000-8000-000000000000"
+    pedido = [obras["Dom Casmurro"], obras["Iracema"], obras["Iracema"], inexistente, obras["Dom Casmurro"]]
+
+    resposta = client.post("/emprestar/lote", json={"id_usuario": usuario["id"], "ids_obras": pedido})
+
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["emprestados"] == 3
+    assert [item["sucesso"] for item in corpo["itens"]] == [True, True, False, False, True]
+    assert corpo["itens"][2]["erro"] == "Obra não tem estoque"
+    assert {o["titulo"]: o["quantidade"] for o in client.get("/obras/").json()} == {"Dom Casmurro": 0, "Iracema": 0}
+    assert client.post("/devolver/", json={"emprestimo_id": corpo["itens"][4]["id"]}).status_code == 200
+
+    sem_usuario = client.post("/emprestar/lote", json={"id_usuario": inexistente, "ids_obras": pedido})
+    assert sem_usuario.status_code == 404
+
+
+def test_resumo_e_limite_de_emprestimos_em_aberto(monkeypatch):
+    monkeypatch.setattr(acervo, "max_emprestimos_abertos", 2)
+    usuario = client.post("/usuarios/", json={"nome": "Aluno", "email": "aluno@email.com"}).json()
+    client.post("/obras/", json={"titulo": "Dom Casmurro", "autor": "Machado", "ano": 1899, "categoria": "Livro", "quantidade": 5})
+    obra = client.get("/obras/").json()[0]["id"]
+
+    lote = client.post("/emprestar/lote", json={"id_usuario": usuario["id"], "ids_obras": [obra] * 3}).json()
+    assert [item["sucesso"] for item in lote["itens"]] == [True, True, False]
+    assert "limite" in lote["itens"][2]["erro"]
+    assert client.post("/emprestar/", json={"id_usuario": usuario["id"], "id_obra": obra}).status_code == 400
+
+    resumo = client.get(f"/usuarios/{usuario['id']}/resumo").json()
+    assert resumo["emprestimos_abertos"] == resumo["emprestimos_total"] == 2
+    assert resumo["emprestimos_atrasados"] == 0
+
+    client.post("/devolver/", json={"emprestimo_id": lote["itens"][0]["id"]})
+    assert client.post("/emprestar/", json={"id_usuario": usuario["id"], "id_obra": obra}).status_code == 200
+    assert client.get(f"/usuarios/{usuario['id']}/resumo").json()["emprestimos_total"] == 3
+    assert client.get("/usuarios/00000000-0000-4000-8000-000000000000/resumo").status_code == 404
+
+
+def test_lote_com_limite_nao_gasta_vaga_em_obra_sem_estoque(monkeypatch):
+    monkeypatch.setattr(acervo, "max_emprestimos_abertos", 2)
+    usuario = client.post("/usuarios/", json={"nome": "Aluno", "email": "aluno@email.com"}).json()
+    for titulo, quantidade in (("Esgotado", 0), ("Duna", 1), ("Sapiens", 1), ("Neuromancer", 1)):
+        client.post("/obras/", json={"titulo": titulo, "autor": "Autor", "ano": 2000, "categoria": "Livro", "quantidade": quantidade})
+    ids = {obra["titulo"]: obra["id"] for obra in client.get("/obras/").json()}
+
+    lote = client.post("/emprestar/lote", json={
+        "id_usuario": usuario["id"],
+        "ids_obras": [ids["Esgotado"], ids["Duna"], ids["Sapiens"], ids["Neuromancer"]],
+    }).json()
+    assert [item["sucesso"] for item in lote["itens"]] == [False, True, True, False]
+    assert lote["itens"][0]["erro"] == "Obra não tem estoque"
+    assert "limite" in lote["itens"][3]["erro"]
+    # A obra barrada pelo limite não teve o estoque baixado
+    estoque = {obra["titulo"]: obra["quantidade"] for obra in client.get("/obras/").json()}
+    assert estoque == {"Esgotado": 0, "Duna": 0, "Sapiens": 0, "Neuromancer": 1}
+
+
+def test_estatisticas_populares_por_janela_e_categoria():
+    from datetime import date, timedelta
+    from database import salvar_usuario, salvar_emprestimo
+    from models import Emprestimo, Usuario
+
+    usuario = Usuario(nome="Aluno", email="aluno@email.com")
+    salvar_usuario(usuario)
+    obras = {
+        titulo: Obra(titulo=titulo, autor="Autor", ano=2000, categoria=categoria, quantidade=10)
+        for titulo, categoria in (("Duna", "Ficção"), ("Neuromancer", "Ficção"), ("Sapiens", "História"))
+    }
+    for obra in obras.values():
+        acervo.adicionar(obra)
+    # Os empréstimos de Duna de 40 dias atrás ficam fora da janela de 30 dias
+    for titulo, dias_atras in (("Duna", 0), ("Neuromancer", 0), ("Neuromancer", 3), ("Sapiens", 0),
+                               ("Sapiens", 1), ("Sapiens", 29)) + (("Duna", 40),) * 5:
+        dia = date.today() - timedelta(days=dias_atras)
+        salvar_emprestimo(Emprestimo(obras[titulo], usuario, dia, dia + timedelta(days=7)))
+
+    populares = client.get("/estatisticas/populares").json()
+    assert [(o["titulo"], o["emprestimos"]) for o in populares["obras"]] == [("Sapiens", 3), ("Neuromancer", 2), ("Duna", 1)]
+    assert [(c["categoria"], c["emprestimos"]) for c in populares["categorias"]] == [("Ficção", 3), ("História", 3)]
+
+    ficcao = client.get("/estatisticas/populares", params={"categoria": "Ficção", "janela": "90d", "limit": 1}).json()
+    assert [(o["titulo"], o["emprestimos"]) for o in ficcao["obras"]] == [("Duna", 6)]
+    assert client.get("/estatisticas/populares", params={"janela": "um mês"}).status_code == 400
+
+    # A janela termina no dia de referência: empréstimos posteriores ficam de fora
+    hoje = date.today()
+    assert acervo.populares("1d", data_ref=hoje - timedelta(days=10)) == {
+        "janela": "1d", "desde": str(hoje - timedelta(days=10)), "obras": [], "categorias": []}
+    ontem = acervo.populares("5d", data_ref=hoje - timedelta(days=1))
+    assert sorted((o["titulo"], o["emprestimos"]) for o in ontem["obras"]) == [("Neuromancer", 1), ("Sapiens", 1)]
+    assert [(o["titulo"], o["emprestimos"]) for o in acervo.populares("1d", data_ref=hoje - timedelta(days=40))["obras"]] == [("Duna", 5)]
+
+
+def test_buscar_obras_paginado():
+    _cadastrar_obras(5)
+
+    primeira = client.get("/obras/busca", params={"q": "livr", "limit": 3}).json()
+    segunda = client.get("/obras/busca", params={"q": "livr", "limit": 3, "offset": 3}).json()
+
+    assert len(primeira) == 3 and len(segunda) == 2
+    assert {o["id"] for o in primeira}.isdisjoint(o["id"] for o in segunda)
+    assert client.get("/obras/busca").status_code == 422
+
+
+def test_metricas_prometheus():
+    _cadastrar_obras(1)
+    client.get("/obras/busca", params={"q": "livro"})
+
+    resposta = client.get("/metrics")
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/plain")
+    assert 'acervo_consulta_execucoes_total{consulta="buscar_obras_por_texto"}' in resposta.text
+    assert 'acervo_requisicoes_total{metodo="GET",rota="/obras/busca"}' in resposta.text
+
+
+def test_listar_emprestimos_atrasados():
+    from database import salvar_usuario
+    from models import Usuario
+
+    usuarios = [Usuario(nome=f"Usuário {i}", email=f"u{i}@email.com") for i in range(2)]
+    for usuario in usuarios:
+        salvar_usuario(usuario)
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=10)
+    acervo.adicionar(obra)
+    for dias in (-5, -3, -1):
+        acervo.emprestar(obra, usuarios[0], dias=dias)
+    devolvido = acervo.emprestar(obra, usuarios[1], dias=-10)
+    acervo.devolver(devolvido, devolvido.previsao)
+    acervo.emprestar(obra, usuarios[1], dias=-2)
+    acervo.emprestar(obra, usuarios[1], dias=7)  # no prazo
+
+    primeira = client.get("/emprestimos/atrasados", params={"limit": 3}).json()
+    segunda = client.get("/emprestimos/atrasados", params={"limit": 3, "after": primeira["proximo"]}).json()
+    atrasos = [e["dias_atraso"] for e in primeira["emprestimos"] + segunda["emprestimos"]]
+    assert atrasos == [5, 3, 2, 1]
+    assert segunda["proximo"] is None
+
+    do_usuario = client.get("/emprestimos/atrasados", params={"id_usuario": str(usuarios[1].id)}).json()
+    assert [e["dias_atraso"] for e in do_usuario["emprestimos"]] == [2]
+    assert do_usuario["emprestimos"][0]["obra"]["titulo"] == "1984"
+    assert client.get("/emprestimos/atrasados", params={"after": "invalido"}).status_code == 400
+
+
+def test_mudancas_sincronizacao_incremental():
+    _cadastrar_obras(3)
+    inicio = client.get("/mudancas", params={"limit": 2}).json()
+    assert len(inicio["mudancas"]) == 2 and inicio["tem_mais"]
+    resto = client.get("/mudancas", params={"desde": inicio["proximo"]}).json()
+    assert len(resto["mudancas"]) == 1 and not resto["tem_mais"]
+    assert resto["mudancas"][0]["tipo"] == "criada" and resto["mudancas"][0]["dados"]["quantidade"] == 1
+
+    usuario = client.post("/usuarios/", json={"nome": "Aluno", "email": "sync@email.com"}).json()
+    obra_id = resto["mudancas"][0]["id"]
+    client.post("/emprestar/", json={"id_usuario": usuario["id"], "id_obra": obra_id})
+
+    delta = client.get("/mudancas", params={"desde": resto["proximo"]}).json()
+    assert [(m["entidade"], m["tipo"]) for m in delta["mudancas"]] == [("obra", "quantidade"), ("emprestimo", "aberto")]
+    assert delta["mudancas"][0]["dados"]["quantidade"] == 0
+    assert client.get("/mudancas", params={"desde": delta["proximo"]}).json()["mudancas"] == []
+
+
+def test_etag_e_resposta_em_cache():
+    import cache
+
+    _cadastrar_obras(2)
+    primeira = client.get("/obras/", params={"limit": 10})
+    etag = primeira.headers["etag"]
+    assert etag.startswith('W/"')
+
+    acertos = cache.cache_respostas.estatisticas()["acertos"]
+    repetida = client.get("/obras/", params={"limit": 10})
+    assert repetida.content == primeira.content
+    assert cache.cache_respostas.estatisticas()["acertos"] == acertos + 1
+
+    nao_modificada = client.get("/obras/", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert nao_modificada.status_code == 304 and nao_modificada.content == b""
+    assert client.get("/obras/", params={"formato": "ndjson"}, headers={"If-None-Match": etag}).status_code == 304
+
+    acervo.adicionar(Obra(titulo="Outro", autor="Autor", ano=2001, categoria="Livro"))
+    atualizada = client.get("/obras/", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert atualizada.status_code == 200
+    assert atualizada.headers["etag"] != etag
+    assert len(atualizada.json()) == 3
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+from core import Acervo
+from models import Usuario, Obra
+from database import salvar_usuario, historico_por_usuario, buscar_emprestimos_por_usuario, conectar
+from arquivamento import arquivar
+
+
+def test_arquiva_devolvidos_antigos_e_mantem_historico_completo():
+    acervo = Acervo()
+    usuario = Usuario(nome="Dezmetros", email="basquete@email.com")
+    salvar_usuario(usuario)
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=5)
+    acervo.adicionar(obra)
+    antigos = [acervo.emprestar(obra, usuario) for _ in range(3)]
+    recente = acervo.emprestar(obra, usuario)
+    aberto = acervo.emprestar(obra, usuario)
+    for emprestimo in antigos:
+        acervo.devolver(emprestimo, date.today() - timedelta(days=400))
+    acervo.devolver(recente, date.today())
+
+    assert arquivar(idade_dias=365, tamanho_lote=2, pausa=0) == 3
+
+    ativos = {row[0] for row in historico_por_usuario(usuario.id)}
+    assert ativos == {str(recente.id), str(aberto.id)}
+    assert len(historico_por_usuario(usuario.id, completo=True)) == 5
+    assert len(buscar_emprestimos_por_usuario(usuario.id, completo=True)) == 5
+    assert len(acervo.emprestimos_do_usuario(usuario.id, completo=True)) == 5
+    assert len(acervo.historico_usuario(usuario).linhas) == 2
+    assert arquivar(idade_dias=365, pausa=0) == 0
+
+
+def _consultas_emitidas(funcao, *args, **kwargs):
+    conn = conectar()
+    comandos = []
+    conn.set_trace_callback(comandos.append)
+    try:
+        funcao(*args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in comandos if sql.lstrip().startswith("SELECT")]
+
+
+def test_historico_so_consulta_arquivo_quando_completo():
+    assert not any("emprestimos_arquivo" in sql for sql in _consultas_emitidas(historico_por_usuario, "u1"))
+    assert not any("emprestimos_arquivo" in sql for sql in _consultas_emitidas(buscar_emprestimos_por_usuario, "u1"))
+
+    for sql in _consultas_emitidas(buscar_emprestimos_por_usuario, "u1", completo=True):
+        plano = " | ".join(linha[3] for linha in conectar().execute("EXPLAIN QUERY PLAN " + sql))
+        assert "idx_emprestimos_usuario_data" in plano
+        assert "idx_emprestimos_arquivo_usuario_data" in plano
+
+
+def test_linha_de_comando_compacta_mudancas(capsys):
+    import arquivamento
+    from database import listar_mudancas
+
+    acervo = Acervo()
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=1)
+    acervo.adicionar(obra)
+    acervo.adicionar(obra)  # mesma obra: soma a quantidade
+    assert len(listar_mudancas(0, 100)) == 2
+
+    arquivamento.main(["--so-compactar"])
+
+    assert [tipo for _, _, _, tipo, _ in listar_mudancas(0, 100)] == ["quantidade"]
+    assert "1 mudanças superadas removidas" in capsys.readouterr().out
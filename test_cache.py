@@ -0,0 +1,55 @@
+import cache
+from core import Acervo
+from models import Obra, Usuario
+from database import salvar_usuario, atualizar_usuario
+
+
+def test_cache_de_obras_invalidado_em_escrita():
+    acervo = Acervo()
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=2)
+    acervo.adicionar(obra)
+    usuario = Usuario(nome="Dezmetros", email="basquete@email.com")
+    salvar_usuario(usuario)
+
+    antes = cache.cache_obras.estatisticas()
+    acervo.encontrar_obra(obra.id)
+    acervo.encontrar_obra(obra.id).quantidade = 99  # cópia: não altera o cache
+    depois = cache.cache_obras.estatisticas()
+    assert depois["falhas"] - antes["falhas"] == 1
+    assert depois["acertos"] - antes["acertos"] == 1
+    assert acervo.encontrar_obra(obra.id).quantidade == 2
+
+    acervo.emprestar(obra, usuario)
+    assert acervo.encontrar_obra(obra.id).quantidade == 1
+
+    assert acervo.encontrar_usuario(usuario.id).divida == 0
+    atualizar_usuario(usuario.id, 10)
+    assert acervo.encontrar_usuario(usuario.id).divida == 10
+
+
+def test_cache_desligado():
+    cache.configurar(ativo=False)
+    try:
+        acervo = Acervo()
+        obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção")
+        acervo.adicionar(obra)
+        acervo.encontrar_obra(obra.id)
+        acervo.encontrar_obra(obra.id)
+        assert cache.cache_obras.estatisticas()["tamanho"] == 0
+    finally:
+        cache.configurar(ativo=True)
+
+
+def test_cache_lru_descarta_menos_usado():
+    lru = cache.CacheLRU(capacidade=2, ttl=60, ativo=True)
+    for chave in ("a", "b"):
+        lru.guardar(chave, chave.upper(), lru.versao())
+    lru.obter("a")
+    lru.guardar("c", "C", lru.versao())
+    assert lru.obter("b") is None
+    assert lru.obter("a") == "A"
+
+    versao = lru.versao()
+    lru.invalidar("a")
+    lru.guardar("a", "velho", versao)  # lido antes da invalidação: ignorado
+    assert lru.obter("a") is None
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+from core import Acervo
+from models import Usuario, Obra
+from database import salvar_usuario, conectar
+
+
+def test_emprestimos_paralelos_nunca_deixam_estoque_negativo():
+    acervo = Acervo()
+    usuario = Usuario(nome="Dezmetros", email="basquete@email.com")
+    salvar_usuario(usuario)
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=300)
+    acervo.adicionar(obra)
+
+    def tentar_emprestar(_):
+        try:
+            acervo.emprestar(Obra(obra.titulo, obra.autor, obra.ano, obra.categoria, id=obra.id), usuario)
+            return True
+        except ValueError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        resultados = list(executor.map(tentar_emprestar, range(2000)))
+
+    assert sum(resultados) == 300
+    assert acervo.encontrar_obra(obra.id).quantidade == 0
+    total = conectar().execute("SELECT COUNT(*) FROM emprestimos").fetchone()[0]
+    assert total == 300
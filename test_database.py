@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import uuid
+import pytest
+from datetime import date
+from models import Obra
+from database import (
+    conectar, configurar, aplicar_migracoes, criar_tabelas, MIGRACOES, salvar_obra, buscar_obras_por_texto,
+    historico_por_usuario, buscar_emprestimos_por_usuario, buscar_obra_por_dados,
+    listar_usuarios_com_divida, listar_emprestimos_atrasados,
+    buscar_resumo_usuario, contar_emprestimos_atrasados_usuario, arquivar_emprestimos,
+    listar_obras_populares, listar_categorias_populares, buscar_obra
+)
+
+
+def _planos(funcao, *args):
+    """Executa a função e retorna o EXPLAIN QUERY PLAN de cada SELECT que ela emitiu."""
+    conn = conectar()
+    comandos = []
+    conn.set_trace_callback(comandos.append)
+    try:
+        funcao(*args)
+    finally:
+        conn.set_trace_callback(None)
+    selects = [sql for sql in comandos if sql.lstrip().upper().startswith("SELECT")]
+    assert selects
+    return [
+        " | ".join(linha[3] for linha in conn.execute("EXPLAIN QUERY PLAN " + sql))
+        for sql in selects
+    ]
+
+
+@pytest.mark.parametrize("funcao, args, indice", [
+    (historico_por_usuario, ("u1",), "idx_emprestimos_usuario_data"),
+    (buscar_emprestimos_por_usuario, ("u1",), "idx_emprestimos_usuario_data"),
+    (buscar_obra_por_dados, ("1984", "George Orwell", 1949, "Ficção"), "idx_obras_dados"),
+    (listar_usuarios_com_divida, (), "idx_usuarios_com_divida"),
+    (listar_emprestimos_atrasados, (date(2024, 1, 1), 50), "idx_emprestimos_abertos_previsao"),
+    (listar_emprestimos_atrasados, (date(2024, 1, 1), 50, ("2023-12-01", "e1")), "idx_emprestimos_abertos_previsao"),
+    (buscar_resumo_usuario, ("u1",), "sqlite_autoindex_usuarios_resumo_1"),
+    (contar_emprestimos_atrasados_usuario, ("u1", date(2024, 1, 1)), "idx_emprestimos_abertos_usuario"),
+])
+def test_consultas_usam_indices(funcao, args, indice):
+    for plano in _planos(funcao, *args):
+        assert "SCAN" not in plano, plano
+        assert "TEMP B-TREE" not in plano, plano
+        assert indice in plano, plano
+
+
+def test_migracao_atualiza_banco_existente(tmp_path):
+    configurar(caminho=tmp_path / "antigo.db")
+    conn = conectar()
+    conn.execute("CREATE TABLE usuarios (id TEXT PRIMARY KEY, nome TEXT NOT NULL, email TEXT NOT NULL UNIQUE, divida REAL DEFAULT 0)")
+    conn.execute("CREATE TABLE obras (id TEXT PRIMARY KEY, titulo TEXT NOT NULL, autor TEXT NOT NULL, ano INTEGER, categoria TEXT, quantidade INTEGER)")
+    conn.execute("CREATE TABLE emprestimos (id TEXT PRIMARY KEY, obra_id TEXT, usuario_id TEXT, data_emprestimo TEXT, data_prevista TEXT, data_devolucao TEXT)")
+    conn.executemany("INSERT INTO obras VALUES (?, '1984', 'George Orwell', 1949, 'Ficção', ?)", [("a", 1), ("b", 2)])
+    conn.execute("INSERT INTO emprestimos VALUES ('e1', 'b', 'u1', '2024-01-01', '2024-01-08', NULL)")
+    conn.commit()
+
+    assert aplicar_migracoes() == len(MIGRACOES)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRACOES)
+
+    obra = buscar_obra_por_dados("1984", "George Orwell", 1949, "Ficção")
+    # Chaves antigas que não são UUID viram UUIDs derivados delas, e continuam encontrando o registro
+    assert (obra.id, obra.quantidade) == (buscar_obra("a")[0], 3)
+    assert conn.execute("SELECT obra_id FROM emprestimos").fetchone()[0] == obra.id
+    with pytest.raises(sqlite3.IntegrityError):
+        salvar_obra(Obra("1984", "George Orwell", 1949, "Ficção", id="c"))
+
+    # Rodar de novo não faz nada
+    assert aplicar_migracoes() == len(MIGRACOES)
+
+
+def test_busca_textual_acompanha_alteracoes_em_obras():
+    from core import Acervo
+    from database import conexao
+
+    acervo = Acervo()
+    acervo.adicionar(Obra("1984", "George Orwell", 1949, "Ficção"))
+    acervo.adicionar(Obra("A Revolução dos Bichos", "George Orwell", 1945, "Ficção"))
+    acervo.adicionar(Obra("Memórias Póstumas de Brás Cubas", "Machado de Assis", 1881, "Romance"))
+
+    assert [o["titulo"] for o in acervo.buscar_obras("orw 198")] == ["1984"]
+    assert len(acervo.buscar_obras("georg")) == 2
+    assert [o["titulo"] for o in acervo.buscar_obras("memorias postumas")] == ["Memórias Póstumas de Brás Cubas"]
+    assert acervo.buscar_obras('"*)') == []
+
+    with conexao() as conn:
+        conn.execute("UPDATE obras SET titulo = 'Dom Casmurro' WHERE titulo LIKE 'Memórias%'")
+        conn.execute("DELETE FROM obras WHERE titulo = '1984'")
+    assert acervo.buscar_obras("memorias") == []
+    assert [o["titulo"] for o in acervo.buscar_obras("casm")] == ["Dom Casmurro"]
+    assert [o["titulo"] for o in acervo.buscar_obras("orwell")] == ["A Revolução dos Bichos"]
+
+
+def test_consulta_lenta_registrada_com_plano(monkeypatch, caplog):
+    import metricas
+
+    monkeypatch.setattr(metricas, "LIMITE_CONSULTA_LENTA", 0)
+    with caplog.at_level("WARNING", logger="acervo.consultas"):
+        buscar_obra_por_dados("1984", "George Orwell", 1949, "Ficção")
+
+    assert "consulta lenta: buscar_obra_por_dados" in caplog.text
+    assert "idx_obras_dados" in caplog.text
+
+
+def test_registro_de_mudancas_e_compactacao():
+    from core import Acervo
+    from database import compactar_mudancas, listar_mudancas
+    from models import Usuario
+
+    acervo = Acervo()
+    obra = Obra("1984", "George Orwell", 1949, "Ficção", quantidade=2)
+    usuario = Usuario("Dezmetros", "basquete@email.com")
+    acervo.adicionar(obra)
+    acervo.cadastrar_usuario(usuario)
+    emprestimo = acervo.emprestar(obra, usuario, dias=-3)
+    acervo.devolver(emprestimo, date.today())
+    acervo.valor_multa(emprestimo, date.today())
+
+    mudancas = [(entidade, tipo) for _, entidade, _, tipo, _ in listar_mudancas(0, 100)]
+    assert mudancas == [
+        ("obra", "criada"), ("obra", "quantidade"), ("emprestimo", "aberto"),
+        ("emprestimo", "devolvido"), ("obra", "quantidade"), ("usuario", "divida"),
+    ]
+    ultimo_seq = listar_mudancas(0, 100)[-1][0]
+
+    assert compactar_mudancas() == 3
+    restantes = listar_mudancas(0, 100)
+    assert [(entidade, tipo) for _, entidade, _, tipo, _ in restantes] == [
+        ("emprestimo", "devolvido"), ("obra", "quantidade"), ("usuario", "divida"),
+    ]
+    assert '"quantidade":2' in restantes[1][4]
+    assert compactar_mudancas() == 0
+
+    acervo.adicionar(Obra("Dom Casmurro", "Machado de Assis", 1899, "Romance"))
+    assert [seq > ultimo_seq for seq, *_ in listar_mudancas(ultimo_seq, 100)] == [True]
+
+
+def test_resumo_de_usuario_mantido_por_triggers():
+    from core import Acervo
+    from models import Usuario
+
+    acervo = Acervo()
+    usuario = Usuario("Aluno", "aluno@email.com")
+    acervo.cadastrar_usuario(usuario)
+    obra = Obra("1984", "George Orwell", 1949, "Ficção", quantidade=5)
+    acervo.adicionar(obra)
+    assert buscar_resumo_usuario(usuario.id) == (str(usuario.id), 0, 0, None, 0)
+
+    emprestimos = [acervo.emprestar(obra, usuario, dias=dias) for dias in (-3, -1, 7)]
+    acervo.valor_multa(emprestimos[0], date.today())
+    acervo.devolver(emprestimos[0], date(2030, 1, 1))
+    assert buscar_resumo_usuario(usuario.id)[1:3] == (2, 3)
+    assert buscar_resumo_usuario(usuario.id)[4] > 0
+    assert contar_emprestimos_atrasados_usuario(usuario.id, date.today()) == 1
+
+    # O arquivamento tira o empréstimo da tabela, mas não do total
+    assert arquivar_emprestimos(date(2031, 1, 1), 10) == 1
+    assert buscar_resumo_usuario(usuario.id)[1:4] == (2, 3, str(date.today()))
+
+
+@pytest.mark.parametrize("funcao, args, busca", [
+    (listar_obras_populares, (date(2024, 1, 1), date(2024, 1, 30), 10), "SEARCH circulacao_obras USING PRIMARY KEY (dia>? AND dia<?)"),
+    (listar_obras_populares, (date(2024, 1, 1), date(2024, 1, 30), 10, "Ficção"), "idx_circulacao_obras_categoria (categoria=? AND dia>? AND dia<?)"),
+    (listar_categorias_populares, (date(2024, 1, 1), date(2024, 1, 30), 10), "SEARCH circulacao_categorias USING PRIMARY KEY (dia>? AND dia<?)"),
+])
+def test_populares_leem_so_a_janela_dos_contadores(funcao, args, busca):
+    # A agregação do top-K precisa de B-tree temporária, mas só sobre os dias da janela
+    for plano in _planos(funcao, *args):
+        assert busca in plano, plano
+        assert "emprestimos " not in plano and "SCAN circulacao" not in plano, plano
+
+
+def test_migracao_converte_ids_para_blob(tmp_path):
+    configurar(caminho=tmp_path / "texto.db")
+    criar_tabelas(ate=len(MIGRACOES) - 1)
+    id_obra, id_usuario, id_emprestimo = (str(uuid.uuid4()) for _ in range(3))
+    conn = conectar()
+    conn.execute("INSERT INTO obras VALUES (?, 'Dom Casmurro', 'Machado de Assis', 1899, 'Romance', 1)", (id_obra,))
+    conn.execute("INSERT INTO usuarios VALUES (?, 'Aluno', 'aluno@email.com', 0)", (id_usuario,))
+    conn.execute("INSERT INTO emprestimos (id, obra_id, usuario_id, data_emprestimo, data_prevista) VALUES (?, ?, ?, '2024-01-01', '2024-01-08')",
+                 (id_emprestimo, id_obra, id_usuario))
+    conn.commit()
+    versao = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'mudancas'").fetchone()[0]
+
+    assert aplicar_migracoes() == len(MIGRACOES)
+
+    assert conn.execute("SELECT typeof(id), length(id) FROM obras").fetchone() == ("blob", 16)
+    assert conn.execute("SELECT typeof(obra_id), typeof(usuario_id) FROM emprestimos").fetchone() == ("blob", "blob")
+    # As consultas continuam recebendo e devolvendo o texto canônico
+    assert historico_por_usuario(id_usuario)[0][:3] == (id_emprestimo, id_obra, id_usuario)
+    assert buscar_resumo_usuario(uuid.UUID(id_usuario))[1] == 1
+    assert [row[0] for row in buscar_obras_por_texto("casmurro", 10)] == [id_obra]
+
+    conn.execute("UPDATE usuarios SET divida = 2 WHERE id = ?", (uuid.UUID(id_usuario),))
+    seq, chave, dados = conn.execute("SELECT seq, chave, dados FROM mudancas ORDER BY seq DESC").fetchone()
+    assert (seq, chave) == (versao + 1, id_usuario)
+    assert json.loads(dados) == {"id": id_usuario, "divida": 2}
+
+
+def test_chave_antiga_de_16_caracteres_vira_uuid(tmp_path):
+    # Uma chave em texto com 16 bytes não pode ser confundida com os bytes de um UUID
+    configurar(caminho=tmp_path / "texto.db")
+    criar_tabelas(ate=len(MIGRACOES) - 1)
+    conn = conectar()
+    conn.execute("INSERT INTO obras VALUES ('livro-0000000001', 'Iracema', 'José de Alencar', 1865, 'Romance', 1)")
+    conn.commit()
+
+    aplicar_migracoes()
+    salvar_obra(Obra("1984", "George Orwell", 1949, "Ficção", id="obra-00000000002"))
+
+    assert conn.execute("SELECT DISTINCT typeof(id), length(id) FROM obras").fetchall() == [("blob", 16)]
+    for chave, titulo in (("livro-0000000001", "Iracema"), ("obra-00000000002", "1984")):
+        row = buscar_obra(chave)
+        assert row[1] == titulo
+        assert uuid.UUID(row[0]).version == 5
+        assert buscar_obra(row[0])[1] == titulo
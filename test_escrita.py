@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import escrita
+from core import Acervo
+from database import buscar_obra
+from escrita import EscritorEmGrupo
+from models import Obra, Usuario
+
+
+def test_lote_confirmado_em_uma_transacao_com_falha_isolada():
+    acervo = Acervo()
+    obra = Obra("1984", "George Orwell", 1949, "Ficção", quantidade=2)
+    usuario = Usuario("Aluno", "aluno@email.com")
+    acervo.adicionar(obra)
+    acervo.cadastrar_usuario(usuario)
+
+    # Latência longa: o lote só fecha ao atingir o tamanho, com as três operações juntas
+    escritor = EscritorEmGrupo(tamanho_lote=3, latencia=5.0)
+    futuros = [escritor.submeter(acervo.emprestar_por_id, obra.id, usuario.id) for _ in range(3)]
+
+    assert futuros[0].result(timeout=5).obra.quantidade == 1
+    assert futuros[1].result(timeout=5).obra.quantidade == 0
+    with pytest.raises(ValueError, match="estoque"):
+        futuros[2].result(timeout=5)
+    escritor.parar()
+
+    assert buscar_obra(obra.id)[5] == 0
+    assert len(acervo.emprestimos_do_usuario(usuario.id)) == 2
+    assert escritor.estatisticas() == {"lotes": 1, "operacoes": 3, "media_por_lote": 3.0}
+
+
+def test_rotas_assincronas_pelo_escritor():
+    acervo = Acervo()
+    escrita.configurar(ativo=True)
+    try:
+        async def fluxo():
+            obra = Obra("Dom Casmurro", "Machado de Assis", 1899, "Romance", quantidade=5)
+            usuario = Usuario("Aluno", "aluno@email.com")
+            await acervo.adicionar_async(obra)
+            await acervo.cadastrar_usuario_async(usuario)
+            return await asyncio.gather(*(acervo.emprestar_por_id_async(obra.id, usuario.id) for _ in range(5)))
+
+        emprestimos = asyncio.run(fluxo())
+    finally:
+        escrita.configurar(ativo=False)
+        escrita.obter_escritor().parar()
+
+    assert sorted(e.obra.quantidade for e in emprestimos) == [0, 1, 2, 3, 4]
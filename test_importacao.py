@@ -0,0 +1,31 @@
+import io
+from core import Acervo
+from models import Obra
+from database import buscar_obra_por_dados
+from importacao import importar_obras
+
+
+def test_importacao_csv_soma_obras_repetidas():
+    Acervo().adicionar(Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=2))
+    arquivo = io.StringIO(
+        "titulo,autor,ano,categoria,quantidade\n"
+        "1984,George Orwell,1949,Ficção,3\n"
+        "Dom Casmurro,Machado de Assis,1899,Romance,1\n"
+        "Dom Casmurro,Machado de Assis,1899,Romance,\n"
+    )
+
+    resultado = importar_obras(arquivo, "csv", tamanho_lote=2)
+
+    assert resultado["linhas"] == 3
+    assert buscar_obra_por_dados("1984", "George Orwell", 1949, "Ficção").quantidade == 5
+    assert buscar_obra_por_dados("Dom Casmurro", "Machado de Assis", 1899, "Romance").quantidade == 2
+
+
+def test_importacao_ndjson():
+    arquivo = io.StringIO(
+        '{"titulo": "1984", "autor": "George Orwell", "ano": 1949, "categoria": "Ficção", "quantidade": 4}\n'
+        "\n"
+    )
+
+    assert importar_obras(arquivo, "ndjson")["linhas"] == 1
+    assert buscar_obra_por_dados("1984", "George Orwell", 1949, "Ficção").quantidade == 4
@@ -52,10 +52,100 @@ def test_fluxo_completo_emprestimo_e_devolucao():
 
     # Verificar histórico do usuário (deve conter o título)
     tabela = acervo.historico_usuario(usuario)
-    linhas = list(tabela.rows)
+    linhas = tabela.linhas
     assert len(linhas) == 1
-    assert "1984" in linhas[0].cells[0]  # Título da obra
+    assert "1984" in linhas[0][0]  # Título da obra
 
     # Verificar relatório de débitos (não deve haver dívida)
     relatorio = acervo.relatorio_debitos()
-    assert len(list(relatorio.rows)) == 0
+    assert len(relatorio.linhas) == 0
+
+
+def test_emprestimo_desfeito_quando_falha_na_transacao(monkeypatch):
+    acervo = Acervo()
+    usuario = Usuario(nome="Dezmetros", email="basquete@email.com")
+    salvar_usuario(usuario)
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=2)
+    acervo.adicionar(obra)
+
+    def falhar(emprestimo):
+        raise RuntimeError("falha ao gravar empréstimo")
+
+    monkeypatch.setattr("core.salvar_emprestimo", falhar)
+    with pytest.raises(RuntimeError):
+        acervo.emprestar(obra, usuario)
+
+    # A baixa no estoque deve ter sido desfeita junto com o empréstimo
+    assert acervo.encontrar_obra(obra.id).quantidade == 2
+
+
+def test_encontrar_emprestimos_em_uma_consulta():
+    from database import conectar
+
+    acervo = Acervo()
+    usuario = Usuario(nome="Dezmetros", email="basquete@email.com")
+    salvar_usuario(usuario)
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=3)
+    acervo.adicionar(obra)
+    emprestimos = [acervo.emprestar(obra, usuario, dias=3) for _ in range(3)]
+    acervo.devolver(emprestimos[0], date.today())
+
+    comandos = []
+    conectar().set_trace_callback(comandos.append)
+    try:
+        emprestimo = acervo.encontrar_emprestimo(emprestimos[0].id)
+    finally:
+        conectar().set_trace_callback(None)
+    assert len([sql for sql in comandos if sql.lstrip().startswith("SELECT")]) == 1
+    assert emprestimo.obra.titulo == "1984"
+    assert emprestimo.usuario.email == "basquete@email.com"
+    assert emprestimo.data_devolucao == date.today()
+
+    lote = acervo.encontrar_emprestimos([e.id for e in emprestimos] + ["inexistente"])
+    assert {str(e.id) for e in lote} == {str(e.id) for e in emprestimos}
+    assert len(acervo.emprestimos_do_usuario(usuario.id)) == 3
+
+
+def test_multas_em_lote_incrementais_e_idempotentes():
+    from datetime import timedelta
+
+    acervo = Acervo()
+    usuario = Usuario(nome="Dezmetros", email="basquete@email.com")
+    salvar_usuario(usuario)
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=3)
+    acervo.adicionar(obra)
+    hoje = date.today()
+    atrasado = acervo.emprestar(obra, usuario, dias=-3)
+    acervo.emprestar(obra, usuario, dias=7)  # no prazo
+
+    resumo = acervo.aplicar_multas_em_lote(hoje)
+    assert resumo[str(usuario.id)] == {"emprestimos": 1, "dias": 3, "valor": 3.0}
+    assert acervo.aplicar_multas_em_lote(hoje) == {}
+    assert acervo.encontrar_usuario(usuario.id).divida == 3
+
+    # Devolvido amanhã, a multa seguinte vai só até a devolução
+    acervo.devolver(atrasado, hoje + timedelta(days=1))
+    acervo.aplicar_multas_em_lote(hoje + timedelta(days=5))
+    assert acervo.encontrar_usuario(usuario.id).divida == 4
+    assert atrasado.dias_atraso(hoje + timedelta(days=1)) == 4
+
+
+def test_valor_multa_e_lote_nao_cobram_os_mesmos_dias():
+    from datetime import timedelta
+
+    acervo = Acervo()
+    usuario = Usuario(nome="Dezmetros", email="basquete@email.com")
+    salvar_usuario(usuario)
+    obra = Obra(titulo="1984", autor="George Orwell", ano=1949, categoria="Ficção", quantidade=3)
+    acervo.adicionar(obra)
+    hoje = date.today()
+    atrasado = acervo.emprestar(obra, usuario, dias=-3)
+
+    assert acervo.valor_multa(atrasado, hoje) == 3.0
+    assert acervo.aplicar_multas_em_lote(hoje) == {}
+    assert acervo.valor_multa(atrasado, hoje) == 0.0
+    assert acervo.encontrar_usuario(usuario.id).divida == 3
+
+    acervo.aplicar_multas_em_lote(hoje + timedelta(days=2))
+    assert acervo.valor_multa(atrasado, hoje + timedelta(days=2)) == 0.0
+    assert acervo.encontrar_usuario(usuario.id).divida == 5
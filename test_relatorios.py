@@ -0,0 +1,35 @@
+import csv
+import io
+import json
+import subprocess
+import sys
+
+from core import Acervo
+from models import Obra, Usuario
+
+
+def test_relatorio_em_csv_json_e_rich():
+    acervo = Acervo()
+    acervo.adicionar(Obra("1984", "George Orwell", 1949, "Ficção", quantidade=2))
+    usuario = Usuario("Aluno", "aluno@email.com")
+    acervo.cadastrar_usuario(usuario)
+
+    relatorio = acervo.relatorio_inventario()
+    linhas = list(csv.reader(io.StringIO(relatorio.para_csv())))
+    assert linhas[0] == ["ID", "Título", "Autor", "Ano", "Categoria", "Quantidade"]
+    assert linhas[1][1:] == ["1984", "George Orwell", "1949", "Ficção", "2"]
+
+    dados = json.loads(relatorio.para_json())
+    assert dados["titulo"] == "Todos os Livros"
+    assert dados["linhas"][0]["Autor"] == "George Orwell"
+
+    tabela = relatorio.formatar("rich")
+    assert tabela.row_count == 1
+    assert [coluna.header for coluna in tabela.columns][:2] == ["ID", "Título"]
+    assert acervo.relatorio_debitos().linhas == []
+
+
+def test_api_nao_carrega_relatorios_nem_rich():
+    codigo = "import sys, main; print(sorted(m for m in sys.modules if m == 'relatorios' or m.startswith('rich')))"
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == "[]"
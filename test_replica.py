@@ -0,0 +1,125 @@
+import pytest
+
+import database
+from core import Acervo
+from database import conexao, transacao, buscar_obra
+from models import Obra, Usuario
+
+
+@pytest.fixture
+def replica():
+    database.configurar(replica=True)
+    yield database._replica
+    database.configurar(replica=False)
+
+
+def test_leituras_do_catalogo_vem_da_replica(replica):
+    acervo = Acervo()
+    obra = Obra("1984", "George Orwell", 1949, "Ficção", quantidade=2)
+    acervo.adicionar(obra)
+    assert [o["titulo"] for o in acervo.listar_obras()] == ["1984"]
+
+    # Escrita por fora das funções de database (como outro processo): só aparece após o intervalo
+    with conexao() as conn:
+        conn.execute("UPDATE obras SET quantidade = 9 WHERE id = ?", (obra.id,))
+    assert acervo.listar_obras()[0]["quantidade"] == 2
+    with transacao():
+        assert buscar_obra(obra.id)[5] == 9
+    replica.intervalo = 0
+    assert acervo.listar_obras()[0]["quantidade"] == 9
+
+
+def test_replica_acompanha_escritas_do_processo(replica):
+    acervo = Acervo()
+    usuario = Usuario("Aluno", "aluno@email.com")
+    acervo.cadastrar_usuario(usuario)
+    obra = Obra("Dom Casmurro", "Machado de Assis", 1899, "Romance", quantidade=1)
+    acervo.adicionar(obra)
+    outra = Obra("Iracema", "José de Alencar", 1865, "Romance")
+    acervo.adicionar(outra)
+    assert len(acervo.paginar_obras()["obras"]) == 2
+
+    acervo.emprestar(obra, usuario)
+    assert acervo.encontrar_obra(obra.id).quantidade == 0
+    assert [o["titulo"] for o in acervo.buscar_obras("casmurro")] == ["Dom Casmurro"]
+
+    acervo.remover(outra)
+    assert {o["titulo"]: o["quantidade"] for o in acervo.listar_obras()} == {"Dom Casmurro": 0, "Iracema": 0}
+
+    with conexao() as conn:
+        conn.execute("DELETE FROM obras WHERE id = ?", (outra.id,))
+    replica.intervalo = 0
+    assert [o["titulo"] for o in acervo.listar_obras()] == ["Dom Casmurro"]
+    assert acervo.buscar_obras("iracema") == []
+
+
+def test_etag_acompanha_a_versao_da_replica(replica):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    client.post("/obras/", json={"titulo": "1984", "autor": "George Orwell", "ano": 1949, "categoria": "Ficção", "quantidade": 2})
+    primeira = client.get("/obras/")
+
+    # Escrita de outro processo: enquanto a réplica não a aplica, nem corpo nem ETag mudam
+    with conexao() as conn:
+        conn.execute("UPDATE obras SET quantidade = 9")
+    antes = client.get("/obras/")
+    assert antes.json()[0]["quantidade"] == 2
+    assert antes.headers["etag"] == primeira.headers["etag"]
+
+    replica.intervalo = 0
+    depois = client.get("/obras/", headers={"If-None-Match": primeira.headers["etag"]})
+    assert depois.status_code == 200
+    assert depois.json()[0]["quantidade"] == 9
+    assert depois.headers["etag"] != primeira.headers["etag"]
+
+
+def test_consulta_lenta_na_replica_registra_comando_e_plano(replica, monkeypatch, caplog):
+    import metricas
+
+    acervo = Acervo()
+    acervo.adicionar(Obra("1984", "George Orwell", 1949, "Ficção"))
+    monkeypatch.setattr(metricas, "LIMITE_CONSULTA_LENTA", 0)
+    with caplog.at_level("WARNING", logger="acervo.consultas"):
+        assert [o["titulo"] for o in acervo.buscar_obras("orwell")] == ["1984"]
+
+    assert "consulta lenta: buscar_obras_por_texto" in caplog.text
+    assert "obras_busca MATCH" in caplog.text
+    assert "(indisponível)" not in caplog.text
+
+
+def test_cada_thread_le_da_sua_copia_sem_esperar_as_outras(replica):
+    import threading
+
+    acervo = Acervo()
+    obra = Obra("1984", "George Orwell", 1949, "Ficção", quantidade=2)
+    acervo.adicionar(obra)
+    assert acervo.listar_obras()[0]["quantidade"] == 2
+
+    # Uma leitura longa em outra thread não bloqueia as leituras desta
+    lendo, liberar = threading.Event(), threading.Event()
+
+    def leitura_longa():
+        with database._conexao_catalogo():
+            lendo.set()
+            liberar.wait(10)
+
+    longa = threading.Thread(target=leitura_longa)
+    longa.start()
+    try:
+        assert lendo.wait(5)
+        assert acervo.listar_obras()[0]["titulo"] == "1984"
+    finally:
+        liberar.set()
+        longa.join()
+
+    # Se outra thread já aplicou uma versão mais nova, esta cópia se atualiza antes de ler
+    with conexao() as conn:
+        conn.execute("UPDATE obras SET quantidade = 9 WHERE id = ?", (obra.id,))
+    replica.intervalo = 0
+    outra = threading.Thread(target=lambda: replica.versao(database.cache_obras.versao()))
+    outra.start()
+    outra.join()
+    replica.intervalo = 3600
+    assert acervo.listar_obras()[0]["quantidade"] == 9